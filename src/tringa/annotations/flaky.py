@@ -2,33 +2,49 @@
 Our definition of a flaky test will probably become more sophisticated over
 time. Our current working definition is:
 
-> A test is flaky if it has failed on more than one branch.
+> A test is flaky if it has both passed and failed at the same commit.
 
-This definition will give false positives if, for example, the test was
-introduced in feature branch b, and then branch b' was created as a fork of b,
-and it failed in both.
+Such a flip happens when a run is retried, when matrix jobs disagree, or when
+the same commit is tested by more than one branch or workflow. Since the code
+under test is the same, a flip is evidence of flakiness that does not depend on
+how branches relate to each other. (An earlier definition, "failed on more than
+one branch", flagged tests that were broken on a branch and on its forks.)
+
+The outcomes of each test at each commit are maintained in the sha_outcome
+table as results are stored, so this does not join the results with
+themselves. Only the latest attempt of a test in a run is stored, but the
+outcomes of all attempts and matrix jobs are counted: see fetch._latest_attempts.
 """
 
-from collections import defaultdict
+from datetime import date
+from typing import Optional
 
 from tringa.db import DB
-from tringa.models import TestResult
-from tringa.queries import EmptyParams, Query
 
 
-def annotate(from_db: DB, to_db: DB):
-    test_results = Query[TestResult, EmptyParams]("select * from test;").fetchall(
-        from_db, {}
+def annotate(db: DB, repo: str, since: Optional[date] = None):
+    """
+    Create the connection-local table `flaky_test` holding the test_id of each
+    flaky test in the repo, judged by the commits that it was tested at since the
+    given date, with
+
+    flips: the number of commits at which it both passed and failed
+    retried: the number of commits at which it has more than one outcome
+    """
+    where = f"t.repo = '{repo}'"
+    if since is not None:
+        where += f" and o.last_time >= DATE '{since}'"
+    db.connection.execute(
+        f"""
+        create or replace temp table flaky_test as
+        select
+            o.test_id,
+            count(*) filter (where o.passes > 0 and o.failures > 0) as flips,
+            count(*) filter (where o.passes + o.failures > 1) as retried
+        from "{db.catalog}".main.sha_outcome o
+        join "{db.catalog}".main.test_case t using (test_id)
+        where {where}
+        group by o.test_id
+        having flips > 0;
+        """
     )
-    fail_branches, flaky = defaultdict(set), set()
-    for tr in test_results:
-        key = (tr.repo, tr.classname, tr.name)
-        if not tr.passed and not tr.skipped:
-            fail_branches[key].add(tr.branch)
-            if len(fail_branches[key]) > 1:
-                flaky.add(key)
-    if any(flaky):
-        to_db.connection.executemany(
-            "UPDATE test SET flaky = true WHERE repo = ? AND classname = ? AND name = ?",
-            list(flaky),
-        )
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from datetime import timedelta
+from datetime import date, timedelta
 from pathlib import Path
 from typing import Annotated, Optional
 
@@ -20,8 +20,22 @@ class GlobalOptions:
     nosync: bool
     tui: bool
     verbose: int
+    # If set, reports and queries see only test results from this many days.
+    window: Optional[timedelta] = None
     table_row_limit: int = 20
 
+    @property
+    def window_start(self) -> Optional[date]:
+        return date.today() - self.window if self.window is not None else None
+
+    @property
+    def summary_limit(self) -> Optional[int]:
+        """
+        The number of rows that summaries need to hold: those that are shown, or
+        all of them if they are output as JSON.
+        """
+        return None if self.json else self.table_row_limit
+
 
 options: GlobalOptions
 
@@ -36,6 +50,25 @@ def set_options(
     ] = False,
     tui: bool = False,
     verbose: int = 1,
+    shared: Annotated[
+        bool,
+        typer.Option(
+            help=(
+                "Allow other tringa processes to use the DB concurrently. "
+                "Syncs write to a copy of the DB that replaces it when done; "
+                "other commands read a snapshot of the DB."
+            )
+        ),
+    ] = False,
+    window_days: Annotated[
+        Optional[int],
+        typer.Option(
+            help=(
+                "Restrict reports and queries to test results from the last N days. "
+                "Unlike --since-days, this does not affect what is fetched."
+            )
+        ),
+    ] = None,
 ):
     if tui and json:
         raise typer.BadParameter("--tui and --json cannot be used together")
@@ -50,11 +83,12 @@ def set_options(
     options = GlobalOptions(
         artifact_globs=artifact_globs,
         since=timedelta(days=since_days),
-        db_config=DBConfig(path=db_path),
+        db_config=DBConfig(path=db_path, shared=shared),
         json=json,
         nosync=nosync,
         tui=tui,
         verbose=verbose,
+        window=timedelta(days=window_days) if window_days is not None else None,
     )
 
 
@@ -1,11 +1,13 @@
 import warnings
+from typing import Annotated, Optional
 
 import duckdb
 import typer
 
 from tringa import cli
-from tringa.cli import internals, pr, repo
+from tringa.cli import db, internals, pr, repo, test
 from tringa.exceptions import TringaException
+from tringa.fetch import Sample, Shard
 from tringa.msg import error, info
 from tringa.utils import tee as tee
 
@@ -15,6 +17,8 @@ app.callback()(cli.set_options)
 
 app.add_typer(pr.app, name="pr")
 app.add_typer(repo.app, name="repo")
+app.add_typer(db.app, name="db")
+app.add_typer(test.app, name="test")
 app.add_typer(internals.app, name="internals")
 
 
@@ -35,11 +39,53 @@ def dropdb():
 
 
 @app.command()
-def sync(_repo: repo.RepoOption = None):
+def sync(
+    _repo: repo.RepoOption = None,
+    shard: Annotated[
+        Optional[Shard],
+        typer.Option(
+            parser=Shard.parse,
+            metavar="i/N",
+            help=(
+                "Fetch only the i-th of N disjoint shards of the runs, so that N "
+                "hosts can sync the repository into separate databases, to be "
+                "combined by `tringa db merge`."
+            ),
+        ),
+    ] = None,
+    sample: Annotated[
+        Optional[float],
+        typer.Option(
+            metavar="FRACTION",
+            help=(
+                "Fetch only this fraction of the runs, sampled in each workflow "
+                "and day, for estimating failure rates at a fraction of the cost."
+            ),
+        ),
+    ] = None,
+    max_runs_per_branch: Annotated[
+        Optional[int],
+        typer.Option(help="Fetch at most this many runs of each branch.", min=1),
+    ] = None,
+):
     """
     Fetch data for the current repository.
+
+    With --sample or --max-runs-per-branch, each fetched run is stored with the
+    number of runs that it stands for, and reports estimate failure rates from
+    them, with confidence intervals.
     """
-    repo.sync(_repo)
+    if sample is not None and not 0 < sample <= 1:
+        raise typer.BadParameter("--sample must be greater than 0, and at most 1")
+    repo.sync(
+        _repo,
+        shard=shard,
+        sample=(
+            Sample(sample or 1.0, max_runs_per_branch)
+            if sample is not None or max_runs_per_branch is not None
+            else None
+        ),
+    )
 
 
 warnings.filterwarnings(
@@ -0,0 +1 @@
+from tringa.cli.db.cli import app as app
@@ -0,0 +1,112 @@
+from pathlib import Path
+from typing import Annotated, Optional
+
+import typer
+
+from tringa import cli
+from tringa.cli.db import compact as _compact
+from tringa.cli.db import merge as _merge
+from tringa.cli.db import snapshot as _snapshot
+from tringa.cli.output import tringa_print
+from tringa.db import DBConfig
+from tringa.fetch import fetch_data_for_repo
+from tringa.msg import fatal
+
+app = typer.Typer(rich_markup_mode="rich")
+
+
+@app.command()
+def compact(
+    keep_days: Annotated[
+        Optional[int],
+        typer.Option(help="Delete passing and skipped results older than this."),
+    ] = None,
+    keep_failure_days: Annotated[
+        Optional[int],
+        typer.Option(
+            help="Delete failed results older than this. Defaults to --keep-days."
+        ),
+    ] = None,
+    drop_passing_text: Annotated[
+        bool,
+        typer.Option(help="Delete messages and output of passing tests."),
+    ] = False,
+) -> None:
+    """
+    Apply retention policies, and rebuild the database file to reclaim space.
+    """
+    tringa_print(
+        _compact.compact(
+            _get_db_config(), keep_days, keep_failure_days, drop_passing_text
+        )
+    )
+
+
+@app.command()
+def merge(
+    inputs: Annotated[
+        list[Path],
+        typer.Argument(
+            help="Database files to merge, e.g. from `tringa sync --shard`."
+        ),
+    ],
+    output: Annotated[
+        Path,
+        typer.Option("--output", "-o", help="Path of the merged database."),
+    ],
+) -> None:
+    """
+    Merge database files into one.
+    """
+    tringa_print(_merge.merge(inputs, output))
+
+
+@app.command("export")
+def export(
+    path: Annotated[
+        Path,
+        typer.Argument(help="Directory to write the snapshot to."),
+    ],
+) -> None:
+    """
+    Write a snapshot of the database, for others to load with `tringa db import`.
+    """
+    tringa_print(_snapshot.export(_get_db_config(), path))
+
+
+@app.command("import")
+def import_(
+    path: Annotated[
+        Path,
+        typer.Argument(help="Directory holding a snapshot from `tringa db export`."),
+    ],
+) -> None:
+    """
+    Load a snapshot into the database, then fetch the runs that are not in it.
+    """
+    db_config = cli.options.db_config
+    with db_config.batch():
+        report = _snapshot.import_(db_config, path)
+        if not cli.options.nosync:
+            with db_config.connect(read_only=True) as db:
+                run_ids = [
+                    run_id
+                    for (run_id,) in db.connection.execute(
+                        "SELECT run_id FROM run"
+                    ).fetchall()
+                ]
+            for repo in report.manifest.runs:
+                fetch_data_for_repo(repo, cli.options.since, skip_run_ids=run_ids)
+            with db_config.connect(read_only=True) as db:
+                (n_runs,) = db.fetchone("SELECT count(*) FROM run")
+            report.topped_up_runs = n_runs - len(run_ids)
+    tringa_print(report)
+
+
+def _get_db_config() -> DBConfig:
+    path = cli.options.db_config.path
+    if not path:
+        fatal("No database path configured")
+    if not path.exists():
+        fatal("Path does not exist:", path)
+    return cli.options.db_config
@@ -0,0 +1,167 @@
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+import humanize
+from rich.console import Console, ConsoleOptions, RenderResult
+from rich.table import Table
+
+from tringa.cli import reports
+from tringa.db import DBConfig
+from tringa.models import SerializableDict
+from tringa.msg import debug
+
+
+@dataclass
+class Report(reports.Report):
+    path: Path
+    size_before: int
+    size_after: int
+    results_deleted: int
+    texts_dropped: int
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "path": str(self.path),
+            "size_before": self.size_before,
+            "size_after": self.size_after,
+            "results_deleted": self.results_deleted,
+            "texts_dropped": self.texts_dropped,
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        table = Table(show_header=False)
+        table.add_row("DB", str(self.path))
+        table.add_row(
+            "Size",
+            f"{humanize.naturalsize(self.size_before)} -> "
+            f"[bold]{humanize.naturalsize(self.size_after)}[/]",
+        )
+        table.add_row("Results deleted", str(self.results_deleted))
+        table.add_row("Passing test texts dropped", str(self.texts_dropped))
+        yield table
+
+
+def compact(
+    db_config: DBConfig,
+    keep_days: Optional[int],
+    keep_failure_days: Optional[int],
+    drop_passing_text: bool,
+) -> Report:
+    """
+    Rebuild the DB, applying retention policies as it is copied.
+
+    The rebuilt file has no dead space, and its result rows are sorted by (repo,
+    suite_time), so that DuckDB can skip row groups outside a repo or time range.
+    The original file is only read, and is atomically replaced by the rebuilt file.
+    """
+    path = db_config.path
+    assert path is not None
+    if keep_failure_days is None:
+        keep_failure_days = keep_days
+
+    with db_config.write_lock():
+        size_before = _size(path)
+        compacted_path = path.with_name(f"{path.name}.compact")
+        compacted_path.unlink(missing_ok=True)
+        with DBConfig(compacted_path).connect() as db:
+            db.connection.execute(f"ATTACH '{path}' AS src (READ_ONLY)")
+            with db.transaction():
+                db.connection.execute(
+                    f"""
+                    CREATE TEMP VIEW kept_result AS
+                    SELECT * FROM src.result WHERE NOT (
+                        (not passed and not skipped
+                         and suite_time < {_cutoff(keep_failure_days)})
+                        OR ((passed or skipped) and suite_time < {_cutoff(keep_days)})
+                    )
+                    """
+                )
+                (results_deleted, texts_dropped) = db.fetchone(
+                    f"""
+                    SELECT
+                        (SELECT count(*) FROM src.result) - count(*),
+                        count(*) FILTER (
+                            WHERE {drop_passing_text} AND passed
+                            AND (message_hash IS NOT NULL OR text_hash IS NOT NULL)
+                        )
+                    FROM kept_result
+                    """
+                )
+                # Rows of the dimension tables that are no longer referenced are
+                # not copied.
+                db.connection.execute(
+                    f"""
+                    INSERT INTO result
+                    SELECT result.* REPLACE (
+                        CASE WHEN NOT ({drop_passing_text} AND passed)
+                            THEN message_hash END AS message_hash,
+                        CASE WHEN NOT ({drop_passing_text} AND passed)
+                            THEN text_hash END AS text_hash
+                    )
+                    FROM kept_result AS result
+                    JOIN src.run AS run USING (run_id)
+                    ORDER BY run.repo, result.suite_time;
+
+                    INSERT INTO run
+                    SELECT * FROM src.run WHERE run_id IN (SELECT run_id FROM result);
+
+                    INSERT INTO artifact
+                    SELECT * FROM src.artifact
+                    WHERE artifact_id IN (SELECT artifact_id FROM result);
+
+                    INSERT INTO suite
+                    SELECT * FROM src.suite
+                    WHERE suite_id IN (SELECT suite_id FROM result);
+
+                    INSERT INTO test_case
+                    SELECT * FROM src.test_case
+                    WHERE test_id IN (SELECT test_id FROM result);
+
+                    INSERT INTO blob
+                    SELECT * FROM src.blob WHERE hash IN (
+                        SELECT message_hash FROM result
+                        UNION
+                        SELECT text_hash FROM result
+                    );
+
+                    INSERT INTO blob_token
+                    SELECT * FROM src.blob_token WHERE hash IN (SELECT hash FROM blob);
+
+                    DROP VIEW kept_result;
+                    """
+                )
+                db.rebuild_rollups()
+            db.connection.execute("DETACH src")
+            db.connection.execute("VACUUM ANALYZE")
+            db.connection.execute("CHECKPOINT")
+
+        debug(f"Replacing {path} with {compacted_path}")
+        os.replace(compacted_path, path)
+        _wal(path).unlink(missing_ok=True)
+
+    return Report(
+        path=path,
+        size_before=size_before,
+        size_after=_size(path),
+        results_deleted=results_deleted,
+        texts_dropped=texts_dropped,
+    )
+
+
+def _cutoff(days: Optional[int]) -> str:
+    if days is None:
+        return "'-infinity'::TIMESTAMP"
+    return f"'{datetime.now() - timedelta(days=days)}'::TIMESTAMP"
+
+
+def _size(path: Path) -> int:
+    return sum(p.stat().st_size for p in [path, _wal(path)] if p.exists())
+
+
+def _wal(path: Path) -> Path:
+    return path.with_name(f"{path.name}.wal")
@@ -0,0 +1,135 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import humanize
+from rich.console import Console, ConsoleOptions, RenderResult
+from rich.table import Table
+
+from tringa.cli import reports
+from tringa.db import DBConfig
+from tringa.exceptions import TringaException
+from tringa.models import SerializableDict
+from tringa.msg import debug
+
+
+@dataclass
+class Report(reports.Report):
+    path: Path
+    inputs: list[Path]
+    runs: int
+    results: int
+    size: int
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "path": str(self.path),
+            "inputs": [str(p) for p in self.inputs],
+            "runs": self.runs,
+            "results": self.results,
+            "size": self.size,
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        table = Table(show_header=False)
+        table.add_row("DB", str(self.path))
+        table.add_row("Merged", "\n".join(map(str, self.inputs)))
+        table.add_row("Runs", str(self.runs))
+        table.add_row("Results", str(self.results))
+        table.add_row("Size", humanize.naturalsize(self.size))
+        yield table
+
+
+def merge(inputs: list[Path], output: Path) -> Report:
+    """
+    Merge DB files into one.
+
+    Runs are replaced as a whole, as by DB.insert_rows: a run stored in more than
+    one input is taken from the last of them. Dimension rows, blobs and their
+    search index entries are keyed by stable hashes, so rows with the same key
+    are identical in every input. The output may be one of the inputs, and is
+    atomically replaced by the merged DB.
+    """
+    for path in inputs:
+        if not path.exists():
+            raise TringaException(f"Path does not exist: {path}")
+        # Fail early on a DB created by an incompatible version of tringa.
+        with DBConfig(path).connect(read_only=True):
+            pass
+    if output.exists() and output.resolve() not in {p.resolve() for p in inputs}:
+        raise TringaException(f"Output path already exists: {output}")
+
+    merged_path = output.with_name(f"{output.name}.merge")
+    merged_path.unlink(missing_ok=True)
+    with DBConfig(merged_path).connect() as db:
+        sources = [f"src{i}" for i in range(len(inputs))]
+        for source, path in zip(sources, inputs):
+            db.connection.execute(f"ATTACH '{path}' AS {source} (READ_ONLY)")
+        with db.transaction():
+            # The input from which each run is taken.
+            db.connection.execute(
+                "CREATE TEMP TABLE run_source AS "
+                "SELECT run_id, max(source) AS source FROM ("
+                + " UNION ALL ".join(
+                    f"SELECT run_id, {i} AS source FROM {source}.run"
+                    for i, source in enumerate(sources)
+                )
+                + ") GROUP BY run_id"
+            )
+            db.connection.execute(
+                f"""
+                INSERT INTO run
+                {" UNION ALL ".join(
+                    f"SELECT run.* FROM {source}.run AS run "
+                    f"JOIN run_source USING (run_id) WHERE source = {i}"
+                    for i, source in enumerate(sources)
+                )};
+
+                INSERT INTO result
+                SELECT result.* FROM (
+                    {" UNION ALL ".join(
+                        f"SELECT result.* FROM {source}.result AS result "
+                        f"JOIN run_source USING (run_id) WHERE source = {i}"
+                        for i, source in enumerate(sources)
+                    )}
+                ) AS result
+                JOIN run USING (run_id)
+                ORDER BY run.repo, result.suite_time;
+                """
+            )
+            for table, key in [
+                ("artifact", "artifact_id"),
+                ("suite", "suite_id"),
+                ("test_case", "test_id"),
+                ("blob", "hash"),
+                ("blob_token", "token_id, hash"),
+            ]:
+                db.connection.execute(
+                    f"""
+                    INSERT INTO {table}
+                    SELECT DISTINCT ON ({key}) * FROM (
+                        {" UNION ALL ".join(f"SELECT * FROM {s}.{table}" for s in sources)}
+                    )
+                    """
+                )
+            db.connection.execute("DROP TABLE run_source")
+            db.rebuild_rollups()
+        for source in sources:
+            db.connection.execute(f"DETACH {source}")
+        (runs, results) = db.fetchone(
+            "SELECT (SELECT count(*) FROM run), (SELECT count(*) FROM result)"
+        )
+        db.connection.execute("CHECKPOINT")
+
+    debug(f"Replacing {output} with {merged_path}")
+    os.replace(merged_path, output)
+    output.with_name(f"{output.name}.wal").unlink(missing_ok=True)
+    return Report(
+        path=output,
+        inputs=inputs,
+        runs=runs,
+        results=results,
+        size=output.stat().st_size,
+    )
@@ -0,0 +1,188 @@
+"""
+Snapshots of the stored tables, for distributing synced data as files.
+
+A snapshot is a directory holding a zstd-compressed Parquet file for each stored
+table, and a manifest recording the schema version and the runs it contains.
+The rollups and the search index are not included; on import, they are updated
+for the imported runs and blobs.
+"""
+
+import json
+import shutil
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import humanize
+from rich.console import Console, ConsoleOptions, RenderResult
+from rich.table import Table
+
+from tringa.cli import reports
+from tringa.db import SCHEMA_VERSION, DBConfig
+from tringa.exceptions import TringaException
+from tringa.models import SerializableDict
+from tringa.msg import debug
+
+MANIFEST = "manifest.json"
+
+# The stored tables included in a snapshot.
+TABLES = ["run", "artifact", "suite", "test_case", "blob", "result"]
+
+
+@dataclass
+class Manifest:
+    schema_version: int
+    created_at: datetime
+    # Run IDs by repo.
+    runs: dict[str, list[int]]
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "schema_version": self.schema_version,
+            "created_at": self.created_at.isoformat(),
+            "runs": self.runs,
+        }
+
+    @staticmethod
+    def read(path: Path) -> "Manifest":
+        manifest_path = path / MANIFEST
+        if not manifest_path.exists():
+            raise TringaException(f"Not a tringa snapshot: {path}")
+        data = json.loads(manifest_path.read_text())
+        if data["schema_version"] != SCHEMA_VERSION:
+            raise TringaException(
+                f"Snapshot {path} has schema version {data['schema_version']}, but "
+                f"this version of tringa requires {SCHEMA_VERSION}."
+            )
+        return Manifest(
+            schema_version=data["schema_version"],
+            created_at=datetime.fromisoformat(data["created_at"]),
+            runs=data["runs"],
+        )
+
+    @property
+    def n_runs(self) -> int:
+        return sum(len(run_ids) for run_ids in self.runs.values())
+
+
+@dataclass
+class Report(reports.Report):
+    path: Path
+    manifest: Manifest
+    results: int
+    # Size of the snapshot files.
+    size: int
+    # Runs fetched after importing the snapshot.
+    topped_up_runs: Optional[int] = None
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "path": str(self.path),
+            "manifest": self.manifest.to_dict(),
+            "results": self.results,
+            "size": self.size,
+            "topped_up_runs": self.topped_up_runs,
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        table = Table(show_header=False)
+        table.add_row("Snapshot", str(self.path))
+        table.add_row("Created", humanize.naturaltime(self.manifest.created_at))
+        table.add_row("Repos", "\n".join(sorted(self.manifest.runs)))
+        table.add_row("Runs", str(self.manifest.n_runs))
+        table.add_row("Results", str(self.results))
+        table.add_row("Size", humanize.naturalsize(self.size))
+        if self.topped_up_runs is not None:
+            table.add_row("Runs fetched since snapshot", str(self.topped_up_runs))
+        yield table
+
+
+def export(db_config: DBConfig, path: Path) -> Report:
+    """
+    Write a snapshot of the DB to the directory at path.
+
+    The snapshot is written to a staging directory that then replaces any
+    earlier snapshot at path, so that the manifest always describes the files
+    next to it.
+    """
+    if path.exists() and not (path / MANIFEST).exists():
+        raise TringaException(f"Path exists and is not a tringa snapshot: {path}")
+    staging_path = path.with_name(f"{path.name}.staging")
+    shutil.rmtree(staging_path, ignore_errors=True)
+    staging_path.mkdir(parents=True)
+
+    with db_config.connect(read_only=True) as db:
+        for table in TABLES:
+            # Results are written sorted by (repo, suite_time), as by `db compact`,
+            # so that the imported table is clustered by time.
+            source = (
+                "SELECT result.* FROM result JOIN run USING (run_id) "
+                "ORDER BY run.repo, result.suite_time"
+                if table == "result"
+                else f"SELECT * FROM {table}"
+            )
+            db.connection.execute(
+                f"COPY ({source}) TO '{staging_path / f'{table}.parquet'}' "
+                "(FORMAT PARQUET, COMPRESSION ZSTD)"
+            )
+        runs: dict[str, list[int]] = {}
+        for repo, run_id in db.connection.execute(
+            "SELECT repo, run_id FROM run ORDER BY ALL"
+        ).fetchall():
+            runs.setdefault(repo, []).append(run_id)
+        (results,) = db.fetchone("SELECT count(*) FROM result")
+
+    manifest = Manifest(
+        schema_version=SCHEMA_VERSION, created_at=datetime.now(), runs=runs
+    )
+    (staging_path / MANIFEST).write_text(json.dumps(manifest.to_dict(), indent=2))
+    if path.exists():
+        shutil.rmtree(path)
+    debug(f"Moving {staging_path} to {path}")
+    staging_path.rename(path)
+    return Report(path=path, manifest=manifest, results=results, size=_size(path))
+
+
+def import_(db_config: DBConfig, path: Path) -> Report:
+    """
+    Load the snapshot at path into the DB.
+
+    Runs in the snapshot replace any stored results of the same runs, as in
+    DB.insert_rows.
+    """
+    manifest = Manifest.read(path)
+
+    def parquet(table: str) -> str:
+        return f"read_parquet('{path / f'{table}.parquet'}')"
+
+    with db_config.connect() as db:
+        with db.transaction():
+            # Only the rollups of the imported runs, and of those sharing their
+            # days and commits, are updated.
+            with db.replacing_runs(parquet("run"), parquet("result")):
+                db.connection.execute(
+                    f"""
+                    DELETE FROM result
+                    WHERE run_id IN (SELECT run_id FROM {parquet("run")});
+                    INSERT OR REPLACE INTO run BY NAME SELECT * FROM {parquet("run")};
+                    INSERT OR IGNORE INTO artifact BY NAME
+                    SELECT * FROM {parquet("artifact")};
+                    INSERT OR IGNORE INTO suite BY NAME
+                    SELECT * FROM {parquet("suite")};
+                    INSERT OR IGNORE INTO test_case BY NAME
+                    SELECT * FROM {parquet("test_case")};
+                    INSERT INTO result BY NAME SELECT * FROM {parquet("result")};
+                    """
+                )
+                db.insert_blobs(parquet("blob"))
+            (results,) = db.fetchone(f"SELECT count(*) FROM {parquet('result')}")
+            db.increment_data_version()
+
+    return Report(path=path, manifest=manifest, results=results, size=_size(path))
+
+
+def _size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.iterdir())
@@ -26,5 +26,5 @@ def repl(
     """
     Start an interactive REPL allowing execution of SQL queries against tests from the latest run for this PR.
     """
-    with cli.options.db_config.connect() as db:
+    with cli.options.db_config.connect(read_only=True) as db:
         tringa.repl.repl(db, repl)
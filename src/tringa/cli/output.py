@@ -1,5 +1,7 @@
+import json
+import sys
 from datetime import datetime
-from typing import Any, Union
+from typing import Any, Iterable, Union
 
 from duckdb import DuckDBPyRelation
 from rich.console import Console
@@ -42,3 +44,14 @@ def print_serializable(obj: Serializable) -> None:
         console.print_json(data=obj.to_dict(), sort_keys=True)
     else:
         console.print(obj)
+
+
+def print_json_lines(objs: Iterable[Serializable]) -> None:
+    """
+    Print one JSON object per line, as each is produced.
+    """
+    for obj in objs:
+        sys.stdout.write(
+            json.dumps(obj.to_dict(), sort_keys=True, default=_to_serializable) + "\n"
+        )
+        sys.stdout.flush()
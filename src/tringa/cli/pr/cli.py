@@ -7,7 +7,11 @@ import tringa.cli.run.cli
 import tringa.repl
 from tringa import cli, gh, queries
 from tringa.annotations import flaky as flaky
-from tringa.fetch import fetch_data_for_pr
+from tringa.cli.output import tringa_print
+from tringa.cli.pr import diff
+from tringa.cli.reports import cache
+from tringa.exceptions import TringaException
+from tringa.fetch import fetch_data_for_pr, fetch_latest_runs_for_branch
 from tringa.models import PR, Run
 
 app = typer.Typer(rich_markup_mode="rich")
@@ -28,6 +32,34 @@ def sync(pr_option: PrOption) -> PR:
     return pr
 
 
+@app.command("diff")
+def _diff(
+    pr: PrOption = None,
+    base_runs: Annotated[
+        int,
+        typer.Option(
+            help="Number of the latest runs of the base branch to compare with.",
+            min=1,
+        ),
+    ] = 2,
+) -> None:
+    """
+    Label the failed tests in the latest run for this PR as new or also failing on
+    the PR's base branch, and list the tests that it fixes.
+
+    Only the latest runs of the base branch are fetched.
+    """
+    with cli.options.db_config.batch():
+        pr_ = sync(pr)
+        if pr_.base_branch is None:
+            raise TringaException(f"Could not determine the base branch of {pr_.url}")
+        if not cli.options.nosync:
+            fetch_latest_runs_for_branch(pr_.repo, pr_.base_branch, base_runs)
+    run = _get_last_run(pr_)
+    with cli.options.db_config.connect(read_only=True) as db:
+        tringa_print(diff.make_report(db, run, pr_.base_branch, base_runs))
+
+
 @app.command()
 def failed(pr: PrOption = None) -> None:
     """Summarize failed tests in the latest run for this PR."""
@@ -37,7 +69,14 @@ def failed(pr: PrOption = None) -> None:
 @app.command()
 def flakes(pr: PrOption = None) -> None:
     """Summarize flaky tests in the latest run for this PR."""
-    tringa.cli.run.cli.flakes(_get_last_run(sync(pr)))
+    pr_ = sync(pr)
+    tringa_print(
+        cache.get(
+            cli.options.db_config,
+            ["pr flakes", pr_.repo, pr_.branch, cli.options.window_start],
+            lambda: tringa.cli.run.cli.flakes_report(_get_last_run(pr_)),
+        )
+    )
 
 
 @app.command()
@@ -70,7 +109,16 @@ def rerun(pr: PrOption = None) -> None:
 @app.command()
 def show(pr: PrOption = None) -> None:
     """Summarize tests in the latest run for this PR."""
-    tringa.cli.run.cli.show(_get_last_run(sync(pr)))
+    pr_ = sync(pr)
+    # The report includes the PR's status checks, which are fetched from GitHub
+    # rather than read from the DB, so they are part of the key.
+    tringa_print(
+        cache.get(
+            cli.options.db_config,
+            ["pr show", pr_, cli.options.window_start, cli.options.summary_limit],
+            lambda: tringa.cli.run.cli.show_report(_get_last_run(pr_)),
+        )
+    )
 
 
 @app.command()
@@ -86,5 +134,5 @@ def tui(pr: PrOption = None) -> NoReturn:
 
 
 def _get_last_run(pr: PR) -> Run:
-    with cli.options.db_config.connect() as db:
+    with cli.options.db_config.connect(read_only=True) as db:
         return queries.last_run(db, pr)
@@ -0,0 +1,144 @@
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Optional
+
+from rich.console import Console, ConsoleOptions, RenderResult
+from rich.table import Table
+
+from tringa.cli import reports
+from tringa.db import DB
+from tringa.models import Run, SerializableDict, run_url
+
+
+class Status(StrEnum):
+    # Failed in the PR, and passed, or did not run, on the base branch.
+    NEW = "new"
+    # Failed in the PR and on the base branch.
+    PRE_EXISTING = "pre-existing"
+    # Passed in the PR, and failed on the base branch.
+    FIXED = "fixed"
+
+
+@dataclass
+class TestDiff(reports.Report):
+    classname: str
+    name: str
+    status: Status
+    # The base run holding the latest result of the test on the base branch.
+    base_run_id: Optional[int]
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "classname": self.classname,
+            "name": self.name,
+            "status": str(self.status),
+            "base_run_id": self.base_run_id,
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        yield f"{self.name} {self.status}"
+
+
+@dataclass
+class Report(reports.Report):
+    run: Run
+    base_branch: str
+    base_run_ids: list[int]
+    tests: list[TestDiff]
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "run": self.run.to_dict(),
+            "base_branch": self.base_branch,
+            "base_run_ids": self.base_run_ids,
+            "tests": [t.to_dict() for t in self.tests],
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        base_runs = ", ".join(
+            f"[link={run_url(self.run.repo, run_id)}]{run_id}[/link]"
+            for run_id in self.base_run_ids
+        )
+        yield (
+            f"[link={self.run.url}]{self.run.title()}[/link] compared with "
+            f"{self.base_branch} ({base_runs or 'no runs'})"
+        )
+        for status, title, style in [
+            (Status.NEW, "New failures", "red"),
+            (Status.PRE_EXISTING, f"Also failing on {self.base_branch}", "yellow"),
+            (Status.FIXED, "Fixed", "green"),
+        ]:
+            tests = [t for t in self.tests if t.status == status]
+            if not tests:
+                continue
+            table = Table()
+            table.add_column(f"{title} ({len(tests)})", style=style)
+            for t in tests:
+                table.add_row(f"{t.classname}.{t.name}" if t.classname else t.name)
+            yield table
+
+
+def make_report(db: DB, run: Run, base_branch: str, base_runs: int = 2) -> Report:
+    """
+    Compare the failures of a PR's run with those on its base branch.
+
+    Each test of the run is matched by test_id with its latest result in the
+    latest base_runs stored runs of the base branch.
+    """
+    base_run_ids = [
+        run_id
+        for (run_id,) in db.connection.execute(
+            """
+            select run_id from run_summary
+            where repo = ? and branch = ?
+            order by started_at desc
+            limit ?
+            """,
+            [run.repo, base_branch, base_runs],
+        ).fetchall()
+    ]
+    rows = db.connection.execute(
+        f"""
+        with
+        pr as (
+            select test_id, passed from result
+            where run_id = {run.id} and not skipped
+        ),
+        base as (
+            select test_id, passed, run_id from result
+            where run_id in ({", ".join(map(str, base_run_ids)) or "null"})
+                and not skipped
+            qualify row_number() over (
+                partition by test_id order by suite_time desc
+            ) = 1
+        )
+        select t.classname, t.name, pr.passed, base.passed, base.run_id
+        from pr
+        left join base using (test_id)
+        join test_case t using (test_id)
+        where not pr.passed or not base.passed
+        order by t.classname, t.name
+        """
+    ).fetchall()
+    return Report(
+        run=run,
+        base_branch=base_branch,
+        base_run_ids=base_run_ids,
+        tests=[
+            TestDiff(
+                classname=classname,
+                name=name,
+                status=(
+                    Status.FIXED
+                    if passed
+                    else Status.PRE_EXISTING if base_passed is False else Status.NEW
+                ),
+                base_run_id=base_run_id,
+            )
+            for classname, name, passed, base_passed, base_run_id in rows
+        ],
+    )
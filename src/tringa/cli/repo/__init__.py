@@ -1,3 +1,4 @@
 from tringa.cli.repo.cli import RepoOption as RepoOption
 from tringa.cli.repo.cli import app as app
+from tringa.cli.repo.cli import resolve as resolve
 from tringa.cli.repo.cli import sync as sync
@@ -1,6 +1,7 @@
 import asyncio
 import re
-from typing import Annotated, NoReturn, Optional
+from pathlib import Path
+from typing import Annotated, ContextManager, NoReturn, Optional
 
 import typer
 
@@ -9,9 +10,20 @@ import tringa.tui.tui
 from tringa import cli, gh, scoped_db
 from tringa.annotations import flaky as flaky
 from tringa.cli.output import tringa_print
-from tringa.cli.repo import show
-from tringa.cli.reports import flaky_tests
-from tringa.fetch import fetch_data_for_repo
+from tringa.cli.repo import (
+    clusters,
+    cofailures,
+    cost,
+    failure_first,
+    grep,
+    regressions,
+    shard_plan,
+    show,
+)
+from tringa.cli.reports import cache, flaky_tests, slow_tests
+from tringa.db import DB
+from tringa.fetch import Sample, Shard, fetch_data_for_repo
+from tringa.msg import info
 from tringa.utils import execute  # Import the execute function
 
 app = typer.Typer(rich_markup_mode="rich")
@@ -35,8 +47,336 @@ def _flakes(
 ) -> None:
     """Show flaky tests in this repository."""
     repo = sync(repo, branch=branch, workflow_id=workflow_id)
-    with scoped_db.connect(cli.options.db_config, repo=repo) as db:
-        tringa_print(flaky_tests.make_report(db))
+
+    def make_report() -> flaky_tests.Report:
+        with _scoped_db(repo) as db:
+            return flaky_tests.make_report(db)
+
+    tringa_print(
+        cache.get(
+            cli.options.db_config,
+            ["repo flakes", repo, cli.options.window_start],
+            make_report,
+        )
+    )
+
+
+@app.command("slow")
+def _slow(
+    repo: RepoOption = None,
+    branch: Optional[str] = None,
+    workflow_id: Optional[int] = None,
+    limit: Annotated[int, typer.Option(help="Maximum number of tests to show.")] = 30,
+) -> None:
+    """
+    Show the tests that take the most CI time in this repository, with their
+    median, p95, p99 and maximum durations.
+    """
+    repo = sync(repo, branch=branch, workflow_id=workflow_id)
+
+    def make_report() -> slow_tests.Report:
+        with _scoped_db(repo) as db:
+            return slow_tests.make_report(db, limit=limit)
+
+    tringa_print(
+        cache.get(
+            cli.options.db_config,
+            ["repo slow", repo, limit, cli.options.window_start],
+            make_report,
+        )
+    )
+
+
+@app.command("cost")
+def _cost(
+    repo: RepoOption = None,
+    branch: Optional[str] = None,
+    workflow_id: Optional[int] = None,
+    limit: Annotated[
+        int, typer.Option(help="Maximum number of rows to show in each breakdown.")
+    ] = 10,
+) -> None:
+    """
+    Show where the test time of this repository goes: by week, and by artifact,
+    suite, file and test, with the change over the previous week.
+    """
+    repo = sync(repo, branch=branch, workflow_id=workflow_id)
+
+    def make_report() -> cost.Report:
+        with _scoped_db(repo) as db:
+            return cost.make_report(db, limit)
+
+    tringa_print(
+        cache.get(
+            cli.options.db_config,
+            ["repo cost", repo, limit, cli.options.window_start],
+            make_report,
+        )
+    )
+
+
+@app.command("clusters")
+def _clusters(
+    repo: RepoOption = None,
+    branch: Optional[str] = None,
+    workflow_id: Optional[int] = None,
+    limit: Annotated[
+        int, typer.Option(help="Maximum number of failure signatures to show.")
+    ] = 20,
+) -> None:
+    """
+    Show the most common causes of test failures in this repository.
+
+    Failures are grouped by signature: their message, or their output if they have
+    no message, with addresses, UUIDs, timestamps, temporary paths and numbers
+    normalized away.
+    """
+    repo = sync(repo, branch=branch, workflow_id=workflow_id)
+
+    def make_report() -> clusters.Report:
+        with cli.options.db_config.connect(read_only=True) as db:
+            return clusters.make_report(db, repo, limit, since=cli.options.window_start)
+
+    tringa_print(
+        cache.get(
+            cli.options.db_config,
+            ["repo clusters", repo, limit, cli.options.window_start],
+            make_report,
+        )
+    )
+
+
+@app.command("cofailures")
+def _cofailures(
+    repo: RepoOption = None,
+    branch: Optional[str] = None,
+    workflow_id: Optional[int] = None,
+    min_runs: Annotated[
+        int,
+        typer.Option(help="Minimum number of runs in which linked tests failed."),
+    ] = 3,
+    min_jaccard: Annotated[
+        float,
+        typer.Option(
+            help=(
+                "Minimum similarity of linked tests: runs in which both failed / "
+                "runs in which either failed."
+            )
+        ),
+    ] = 0.5,
+    max_run_failures: Annotated[
+        int,
+        typer.Option(
+            help="Leave out runs in which more tests failed, e.g. due to an outage."
+        ),
+    ] = 1000,
+    limit: Annotated[
+        int, typer.Option(help="Maximum number of clusters to show.")
+    ] = 20,
+) -> None:
+    """
+    Show clusters of tests that fail together in this repository, which often
+    share a cause such as a broken fixture or a flaky service.
+    """
+    repo = sync(repo, branch=branch, workflow_id=workflow_id)
+
+    def make_report() -> cofailures.Report:
+        with cli.options.db_config.connect(read_only=True) as db:
+            return cofailures.make_report(
+                db,
+                repo,
+                min_runs=min_runs,
+                min_jaccard=min_jaccard,
+                max_run_failures=max_run_failures,
+                limit=limit,
+                since=cli.options.window_start,
+            )
+
+    tringa_print(
+        cache.get(
+            cli.options.db_config,
+            [
+                "repo cofailures",
+                repo,
+                min_runs,
+                min_jaccard,
+                max_run_failures,
+                limit,
+                cli.options.window_start,
+            ],
+            make_report,
+        )
+    )
+
+
+@app.command("regressions")
+def _regressions(
+    repo: RepoOption = None,
+    branch: Optional[str] = None,
+    workflow_id: Optional[int] = None,
+    runs: Annotated[
+        int,
+        typer.Option(help="Number of latest passing runs of each test to examine."),
+    ] = 200,
+    min_ratio: Annotated[
+        float,
+        typer.Option(help="Minimum ratio of the test's durations after and before."),
+    ] = 1.5,
+    limit: Annotated[int, typer.Option(help="Maximum number of tests to show.")] = 30,
+) -> None:
+    """
+    Show tests in this repository that became slower, with the run in which they
+    did so.
+    """
+    repo = sync(repo, branch=branch, workflow_id=workflow_id)
+
+    def make_report() -> regressions.Report:
+        with cli.options.db_config.connect(read_only=True) as db:
+            return regressions.make_report(
+                db,
+                repo,
+                runs=runs,
+                min_ratio=min_ratio,
+                limit=limit,
+                since=cli.options.window_start,
+            )
+
+    tringa_print(
+        cache.get(
+            cli.options.db_config,
+            [
+                "repo regressions",
+                repo,
+                runs,
+                min_ratio,
+                limit,
+                cli.options.window_start,
+            ],
+            make_report,
+        )
+    )
+
+
+@app.command("shard-plan")
+def _shard_plan(
+    workers: Annotated[int, typer.Option(help="Number of CI workers.", min=1)],
+    repo: RepoOption = None,
+    branch: Optional[str] = None,
+    workflow_id: Optional[int] = None,
+    artifact: Annotated[
+        Optional[str],
+        typer.Option(
+            help=(
+                "Plan using only results from artifacts whose name matches this "
+                "glob, e.g. `junit-py312-*`."
+            )
+        ),
+    ] = None,
+    by: Annotated[
+        shard_plan.Unit,
+        typer.Option(help="Assign test modules, or individual tests, to workers."),
+    ] = shard_plan.Unit.MODULE,
+    pytest_dir: Annotated[
+        Optional[Path],
+        typer.Option(
+            help=(
+                "Write the pytest arguments of each worker to `worker-<index>.txt` "
+                "in this directory."
+            )
+        ),
+    ] = None,
+) -> None:
+    """
+    Split the tests in this repository between CI workers so that the workers
+    finish at about the same time, based on the tests' past durations.
+    """
+    repo = sync(repo, branch=branch, workflow_id=workflow_id)
+
+    def make_report() -> shard_plan.Report:
+        with cli.options.db_config.connect(read_only=True) as db:
+            return shard_plan.make_report(
+                db,
+                repo,
+                workers,
+                artifact=artifact,
+                unit=by,
+                since=cli.options.window_start,
+            )
+
+    report = cache.get(
+        cli.options.db_config,
+        ["repo shard-plan", repo, workers, artifact, by, cli.options.window_start],
+        make_report,
+    )
+    if pytest_dir is not None:
+        for path in report.write_pytest_args(pytest_dir):
+            info(f"Wrote {path}")
+    tringa_print(report)
+
+
+@app.command("failure-first")
+def _failure_first(
+    repo: RepoOption = None,
+    branch: Optional[str] = None,
+    workflow_id: Optional[int] = None,
+    half_life_days: Annotated[
+        float,
+        typer.Option(help="Age at which a result counts half as much as a new one."),
+    ] = 7.0,
+    output: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--output",
+            "-o",
+            help="Write the test IDs in order to this file, for `pytest @FILE`.",
+        ),
+    ] = None,
+) -> None:
+    """
+    Order the tests in this repository so that those most likely to fail, per
+    second of running time, run first.
+    """
+    repo = sync(repo, branch=branch, workflow_id=workflow_id)
+
+    def make_report() -> failure_first.Report:
+        with cli.options.db_config.connect(read_only=True) as db:
+            return failure_first.make_report(
+                db, repo, half_life_days, since=cli.options.window_start
+            )
+
+    report = cache.get(
+        cli.options.db_config,
+        ["repo failure-first", repo, half_life_days, cli.options.window_start],
+        make_report,
+    )
+    if output is not None:
+        report.write(output)
+        info(f"Wrote {len(report.tests)} tests to {output}")
+    tringa_print(report)
+
+
+@app.command("grep")
+def _grep(
+    query: Annotated[
+        str,
+        typer.Argument(
+            help=(
+                "Words to search for in the messages and output of failed tests, "
+                "e.g. an exception name. Matches contain all of the words."
+            )
+        ),
+    ],
+    repo: RepoOption = None,
+    branch: Optional[str] = None,
+    workflow_id: Optional[int] = None,
+    limit: Annotated[int, typer.Option(help="Maximum number of tests to show.")] = 50,
+) -> None:
+    """Search the failure messages and output of tests in this repository."""
+    repo = sync(repo, branch=branch, workflow_id=workflow_id)
+    with cli.options.db_config.connect(read_only=True) as db:
+        tringa_print(
+            grep.make_report(db, repo, query, limit, since=cli.options.window_start)
+        )
 
 
 @app.command()
@@ -59,7 +399,7 @@ def repl(
     Start an interactive REPL allowing execution of SQL queries against tests in this repository.
     """
     repo = sync(repo, branch=branch, workflow_id=workflow_id)
-    with scoped_db.connect(cli.options.db_config, repo=repo) as db:
+    with _scoped_db(repo) as db:
         tringa.repl.repl(db, repl)
 
 
@@ -71,8 +411,18 @@ def _show(
 ) -> None:
     """View a summary of tests in this repository."""
     repo = sync(repo, branch=branch, workflow_id=workflow_id)
-    with scoped_db.connect(cli.options.db_config, repo=repo) as db:
-        tringa_print(show.make_report(db, repo))
+
+    def make_report() -> show.Report:
+        with _scoped_db(repo) as db:
+            return show.make_report(db, repo, cli.options.summary_limit)
+
+    tringa_print(
+        cache.get(
+            cli.options.db_config,
+            ["repo show", repo, cli.options.window_start, cli.options.summary_limit],
+            make_report,
+        )
+    )
 
 
 @app.command()
@@ -87,21 +437,41 @@ def sql(
 ) -> None:
     """Execute a SQL query against tests in this repository."""
     repo = sync(repo, branch=branch, workflow_id=workflow_id)
-    with scoped_db.connect(cli.options.db_config, repo=repo) as db:
+    with _scoped_db(repo) as db:
         tringa_print(db.connection.sql(query))
 
 
 def sync(
-    repo: RepoOption, branch: Optional[str] = None, workflow_id: Optional[int] = None
+    repo: RepoOption,
+    branch: Optional[str] = None,
+    workflow_id: Optional[int] = None,
+    shard: Optional[Shard] = None,
+    sample: Optional[Sample] = None,
 ) -> str:
-    repo = _validate_repo_arg(repo) if repo else _infer_repo()
+    repo = resolve(repo)
     if not cli.options.nosync:
         fetch_data_for_repo(
-            repo, cli.options.since, branch=branch, workflow_id=workflow_id
+            repo,
+            cli.options.since,
+            branch=branch,
+            workflow_id=workflow_id,
+            shard=shard,
+            sample=sample,
         )
     return repo
 
 
+def resolve(repo: RepoOption) -> str:
+    """The repository to target, without fetching any of its data."""
+    return _validate_repo_arg(repo) if repo else _infer_repo()
+
+
+def _scoped_db(repo: str) -> ContextManager[DB]:
+    return scoped_db.connect(
+        cli.options.db_config, repo=repo, since=cli.options.window_start
+    )
+
+
 def _infer_repo() -> str:
     return _infer_repo_from_local_git_repo() or asyncio.run(gh.repo())
 
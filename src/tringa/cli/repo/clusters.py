@@ -0,0 +1,135 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Optional
+
+import humanize
+from rich.console import Console, ConsoleOptions, RenderResult
+from rich.table import Table
+
+from tringa import scoped_db
+from tringa.cli import reports
+from tringa.db import DB, normalize_failure_sql
+from tringa.models import SerializableDict, run_url
+
+
+@dataclass
+class Cluster(reports.Report):
+    repo: str
+    signature: int
+    failures: int
+    tests: int
+    branches: int
+    runs: int
+    last_failed: Optional[datetime]
+    last_run_id: int
+    # The test of the latest failure, and its message (or its text, if it has no
+    # message), normalized.
+    last_classname: str
+    last_name: str
+    example: str
+
+    @property
+    def last_run_url(self) -> str:
+        return run_url(self.repo, self.last_run_id)
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "signature": self.signature,
+            "failures": self.failures,
+            "tests": self.tests,
+            "branches": self.branches,
+            "runs": self.runs,
+            "last_failed": self.last_failed.isoformat() if self.last_failed else None,
+            "last_run_url": self.last_run_url,
+            "last_classname": self.last_classname,
+            "last_name": self.last_name,
+            "example": self.example,
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        yield self.example
+
+
+@dataclass
+class Report(reports.Report):
+    clusters: list[Cluster]
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "clusters": [c.to_dict() for c in self.clusters],
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        table = Table()
+        table.add_column("Failure", style="red", overflow="ellipsis", max_width=80)
+        table.add_column("Failures", justify="right")
+        table.add_column("Tests", justify="right")
+        table.add_column("Branches", justify="right")
+        table.add_column("Last failed")
+        for c in self.clusters:
+            last_test = (
+                f"{c.last_classname}.{c.last_name}" if c.last_classname else c.last_name
+            )
+            table.add_row(
+                c.example,
+                str(c.failures),
+                str(c.tests),
+                str(c.branches),
+                f"[link={c.last_run_url}]"
+                + (
+                    humanize.naturaltime(c.last_failed)
+                    if c.last_failed
+                    else "<unknown>"
+                )
+                + f"[/link] [blue]{last_test}[/]",
+            )
+        yield table
+
+
+def make_report(
+    db: DB, repo: str, limit: int = 20, since: Optional[date] = None
+) -> Report:
+    """
+    Group the failures in the repo by signature, ranked by the number of
+    failures, then by the number of tests and branches affected.
+
+    Signatures are computed when results are stored, so this is an aggregation
+    of integer columns of the result and run tables.
+    """
+    in_window = scoped_db.in_window("r.suite_time", since)
+    rows = db.connection.execute(
+        f"""
+        with top as (
+            select
+                r.signature,
+                count(*) as failures,
+                count(distinct r.test_id) as tests,
+                count(distinct run.branch) as branches,
+                count(distinct r.run_id) as runs,
+                max(r.suite_time) as last_failed,
+                arg_max(r.run_id, r.suite_time) as last_run_id,
+                arg_max(r.test_id, r.suite_time) as last_test_id,
+                arg_max(coalesce(r.message_hash, r.text_hash), r.suite_time) as hash
+            from result r
+            join run using (run_id)
+            where r.signature is not null and run.repo = ? and {in_window}
+            group by r.signature
+            order by failures desc, tests desc, branches desc
+            limit {limit}
+        )
+        select
+            top.signature, top.failures, top.tests, top.branches, top.runs,
+            top.last_failed, top.last_run_id, t.classname, t.name,
+            coalesce({normalize_failure_sql("b.content")}, '')
+        from top
+        join test_case t on t.test_id = top.last_test_id
+        left join blob b on b.hash = top.hash
+        order by top.failures desc, top.tests desc, top.branches desc
+        """,
+        [repo],
+    ).fetchall()
+    return Report(clusters=[Cluster(repo, *row) for row in rows])
@@ -0,0 +1,240 @@
+import math
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+
+from rich.console import Console, ConsoleOptions, RenderResult
+from rich.table import Table
+
+from tringa import scoped_db
+from tringa.cli import reports
+from tringa.db import DB
+from tringa.models import SerializableDict
+from tringa.msg import debug
+
+# The number of (run, test, test) rows that the co-failure counts are computed
+# from in one query. This bounds the memory used by the join.
+PAIRS_PER_CHUNK = 20_000_000
+
+
+@dataclass
+class Cluster(reports.Report):
+    # Names of the tests, as `classname.name`.
+    tests: list[str]
+    # The number of runs in which more than one of the tests failed.
+    runs: int
+    # The Jaccard similarity of the most and least similar linked pairs of tests:
+    # runs in which both failed / runs in which either failed.
+    max_jaccard: float
+    min_jaccard: float
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "tests": self.tests,
+            "runs": self.runs,
+            "max_jaccard": self.max_jaccard,
+            "min_jaccard": self.min_jaccard,
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        yield from self.tests
+
+
+@dataclass
+class Report(reports.Report):
+    clusters: list[Cluster]
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "clusters": [c.to_dict() for c in self.clusters],
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        table = Table()
+        table.add_column("Tests", style="blue")
+        table.add_column("Runs", justify="right")
+        table.add_column("Jaccard", justify="right")
+        for c in self.clusters:
+            table.add_row(
+                "\n".join(c.tests),
+                str(c.runs),
+                (
+                    f"{c.min_jaccard:.2f}"
+                    if c.min_jaccard == c.max_jaccard
+                    else f"{c.min_jaccard:.2f}-{c.max_jaccard:.2f}"
+                ),
+            )
+        yield table
+
+
+def make_report(
+    db: DB,
+    repo: str,
+    min_runs: int = 3,
+    min_jaccard: float = 0.5,
+    max_run_failures: int = 1000,
+    limit: int = 20,
+    since: Optional[date] = None,
+) -> Report:
+    """
+    Find clusters of tests in the repo that fail together.
+
+    Two tests are linked if they failed together in at least min_runs runs, and
+    the Jaccard similarity of the sets of runs in which they failed is at least
+    min_jaccard. The clusters are the connected components of the linked tests,
+    ranked by the number of runs in which more than one of their tests failed.
+
+    Runs in which more than max_run_failures tests failed, such as those broken by
+    an outage, are left out: they link every pair of the tests that failed, and a
+    run with k failed tests adds k² rows to the co-failure join.
+    """
+    in_window = scoped_db.in_window("r.suite_time", since)
+    # The failure matrix, as (run, test) pairs. Tests that failed in fewer than
+    # min_runs runs cannot be linked, so are left out.
+    db.connection.execute(
+        f"""
+        create or replace temp table _failure as
+        select distinct r.run_id, r.test_id
+        from result r
+        join run using (run_id)
+        where not r.passed and not r.skipped and run.repo = '{repo}' and {in_window};
+
+        delete from _failure where run_id in (
+            select run_id from _failure
+            group by run_id
+            having count(*) > {max_run_failures}
+        );
+
+        create or replace temp table _test_failures as
+        select test_id, count(*) as runs from _failure
+        group by test_id
+        having runs >= {min_runs};
+
+        delete from _failure
+        where test_id not in (select test_id from _test_failures);
+        """
+    )
+    links = _links(db, min_runs, min_jaccard)
+    clusters = _connected_components(links)
+    debug(f"Found {len(links)} links forming {len(clusters)} clusters")
+    if not clusters:
+        return Report(clusters=[])
+
+    db.connection.execute(
+        """
+        create or replace temp table _cluster as
+        select unnest(?)::INTEGER as cluster, unnest(?)::UBIGINT as test_id
+        """,
+        [
+            [i for i, tests in enumerate(clusters) for _ in tests],
+            [t for tests in clusters for t in tests],
+        ],
+    )
+    rows = db.connection.execute(
+        """
+        with runs as (
+            select cluster, count(*) as runs from (
+                select cluster, run_id from _failure join _cluster using (test_id)
+                group by cluster, run_id
+                having count(*) > 1
+            )
+            group by cluster
+        )
+        select
+            cluster,
+            runs,
+            list(
+                if(t.classname = '', t.name, t.classname || '.' || t.name)
+                order by t.classname, t.name
+            )
+        from _cluster
+        join runs using (cluster)
+        join test_case t using (test_id)
+        group by cluster, runs
+        order by runs desc, count(*) desc
+        limit ?
+        """,
+        [limit],
+    ).fetchall()
+    db.connection.execute(
+        "drop table _failure; drop table _test_failures; drop table _cluster"
+    )
+    cluster_of = {t: i for i, tests in enumerate(clusters) for t in tests}
+    jaccards = defaultdict(list)
+    for a, _, jaccard in links:
+        jaccards[cluster_of[a]].append(jaccard)
+    return Report(
+        clusters=[
+            Cluster(
+                tests=tests,
+                runs=runs,
+                max_jaccard=max(jaccards[i]),
+                min_jaccard=min(jaccards[i]),
+            )
+            for i, runs, tests in rows
+        ]
+    )
+
+
+def _links(db: DB, min_runs: int, min_jaccard: float) -> list[tuple[int, int, float]]:
+    """
+    The (test_id, test_id, jaccard) of each linked pair of tests in _failure.
+
+    The co-failure counts are the product of the sparse failure matrix with its
+    transpose: a join of _failure with itself on run_id. A run with k failed
+    tests contributes k² rows to the join, so the tests are split into chunks,
+    such that the join for each chunk holds about PAIRS_PER_CHUNK rows.
+    """
+    (pairs,) = db.fetchone(
+        """
+        select coalesce(sum(n * n), 0)::BIGINT
+        from (select count(*) as n from _failure group by run_id)
+        """
+    )
+    chunks = max(1, math.ceil(pairs / PAIRS_PER_CHUNK))
+    debug(f"Counting co-failures of {pairs} test pairs in {chunks} chunks")
+    links = []
+    for chunk in range(chunks):
+        links.extend(
+            db.connection.execute(
+                f"""
+                with co as (
+                    select a.test_id as a, b.test_id as b, count(*) as runs
+                    from _failure a
+                    join _failure b on a.run_id = b.run_id and a.test_id < b.test_id
+                    where a.test_id % {chunks} = {chunk}
+                    group by a.test_id, b.test_id
+                    having runs >= {min_runs}
+                )
+                select co.a, co.b, co.runs / (fa.runs + fb.runs - co.runs) as jaccard
+                from co
+                join _test_failures fa on fa.test_id = co.a
+                join _test_failures fb on fb.test_id = co.b
+                where jaccard >= {min_jaccard}
+                """
+            ).fetchall()
+        )
+    return links
+
+
+def _connected_components(links: list[tuple[int, int, float]]) -> list[list[int]]:
+    parent: dict[int, int] = {}
+
+    def find(x: int) -> int:
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b, _ in links:
+        parent[find(a)] = find(b)
+    components: dict[int, list[int]] = {}
+    for x in parent:
+        components.setdefault(find(x), []).append(x)
+    return list(components.values())
@@ -0,0 +1,234 @@
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from rich.console import Console, ConsoleOptions, RenderResult
+from rich.table import Table
+
+from tringa.cli import reports
+from tringa.db import DB
+from tringa.models import SerializableDict
+
+
+@dataclass
+class Cost(reports.Report):
+    name: str
+    # Test time in seconds: in the whole window, and in the 7 days up to the
+    # latest data and the 7 days before them.
+    total: float
+    this_week: float
+    last_week: float
+
+    @property
+    def delta(self) -> float:
+        return self.this_week - self.last_week
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "name": self.name,
+            "total": self.total,
+            "this_week": self.this_week,
+            "last_week": self.last_week,
+            "delta": self.delta,
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        yield f"{self.name} {_hours(self.total)}"
+
+
+@dataclass
+class Breakdown(reports.Report):
+    # What the test time is broken down by: workflow, artifact, suite, file or
+    # test.
+    dimension: str
+    # The largest costs, and the costs that grew the most week over week.
+    top: list[Cost]
+    growth: list[Cost]
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "dimension": self.dimension,
+            "top": [c.to_dict() for c in self.top],
+            "growth": [c.to_dict() for c in self.growth],
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        dimension = self.dimension.capitalize()
+        tables = [(f"{dimension}s", self.top)]
+        # The growth table is shown if it holds costs that the top table does not.
+        top = {c.name for c in self.top}
+        if any(c.name not in top for c in self.growth):
+            tables.append((f"{dimension}s that grew the most", self.growth))
+        for title, costs in tables:
+            table = Table(title=title, title_justify="left")
+            table.add_column(dimension, style="blue")
+            table.add_column("Total", justify="right", style="bold")
+            table.add_column("Last week", justify="right")
+            table.add_column("This week", justify="right")
+            table.add_column("Change", justify="right")
+            for c in costs:
+                table.add_row(
+                    c.name,
+                    _hours(c.total),
+                    _hours(c.last_week),
+                    _hours(c.this_week),
+                    _change(c.delta),
+                )
+            yield table
+
+
+@dataclass
+class Report(reports.Report):
+    # The time of the latest data, which the weeks of the breakdowns end at.
+    latest: Optional[datetime]
+    # Test time in seconds, by calendar week.
+    weekly: list[tuple[date, float]]
+    breakdowns: list[Breakdown]
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "latest": self.latest.isoformat() if self.latest else None,
+            "weekly": [
+                {"week": week.isoformat(), "total": total}
+                for week, total in self.weekly
+            ],
+            "breakdowns": [b.to_dict() for b in self.breakdowns],
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        table = Table(title="Test time by week", title_justify="left")
+        table.add_column("Week")
+        table.add_column("Total", justify="right", style="bold")
+        table.add_column("Change", justify="right")
+        previous = None
+        for week, total in self.weekly:
+            table.add_row(
+                week.isoformat(),
+                _hours(total),
+                _change(total - previous) if previous is not None else "",
+            )
+            previous = total
+        yield table
+        yield from self.breakdowns
+
+
+def make_report(db: DB, limit: int = 10) -> Report:
+    """
+    Where the test time of the scope goes: its total by week, and broken down by
+    workflow, artifact, suite, file and test, with the change in the latest 7
+    days of data over the 7 days before them.
+
+    The breakdowns are read from the suite_summary and test_daily rollups, rather
+    than from the results. Test time is the sum of test durations, so that the
+    breakdowns add up to the same total.
+    """
+    (latest,) = db.fetchone("select max(started_at) from suite_summary")
+    if latest is None:
+        return Report(latest=None, weekly=[], breakdowns=[])
+    weekly = db.connection.execute(
+        """
+        select date_trunc('week', started_at)::DATE as week, sum(duration)
+        from suite_summary
+        group by week
+        order by week
+        """
+    ).fetchall()
+
+    # Rows of test time, with the columns that the breakdowns group them by. The
+    # test_daily rollup is by day, so the weeks of the test breakdown end at the
+    # end of the day of the latest data.
+    suites = """
+        suite_summary s
+        join run r on r.run_id = s.run_id
+        join artifact a using (artifact_id)
+        join suite using (suite_id)
+    """
+    tests = "(select *, duration_sum as duration from test_daily)"
+    day_end = datetime.combine(latest.date(), datetime.min.time())
+
+    def breakdown(
+        dimension: str, key: str, name: str, source: str, time: str, end: datetime
+    ) -> Breakdown:
+        rows = db.connection.execute(
+            f"""
+            select
+                {name},
+                sum(duration),
+                coalesce(sum(duration) filter (where {time} > ?), 0),
+                coalesce(
+                    sum(duration) filter (where {time} > ? and {time} <= ?), 0
+                )
+            from {source}
+            group by {key}, {name}
+            """,
+            [
+                end - timedelta(days=7),
+                end - timedelta(days=14),
+                end - timedelta(days=7),
+            ],
+        ).fetchall()
+        costs = [Cost(*row) for row in rows]
+        return Breakdown(
+            dimension=dimension,
+            top=sorted(costs, key=lambda c: (-c.total, c.name))[:limit],
+            growth=[
+                c
+                for c in sorted(costs, key=lambda c: (-c.delta, c.name))[:limit]
+                if c.delta > 0
+            ],
+        )
+
+    return Report(
+        latest=latest,
+        weekly=weekly,
+        breakdowns=[
+            breakdown(
+                "workflow",
+                "r.workflow_id",
+                "coalesce(r.workflow_name, r.workflow_id::VARCHAR, '<unknown>')",
+                suites,
+                "started_at",
+                latest,
+            ),
+            breakdown(
+                "artifact", "artifact_id", "a.name", suites, "started_at", latest
+            ),
+            breakdown(
+                "suite",
+                "suite_id",
+                "if(suite.file = '', suite.name, suite.file || ':' || suite.name)",
+                suites,
+                "started_at",
+                latest,
+            ),
+            breakdown("file", "suite.file", "suite.file", suites, "started_at", latest),
+            breakdown(
+                "test",
+                "test_id",
+                "if(classname = '', name, classname || '.' || name)",
+                tests,
+                "day",
+                day_end,
+            ),
+        ],
+    )
+
+
+def _hours(seconds: float) -> str:
+    return f"{seconds / 3600:.1f}h" if seconds >= 360 else f"{seconds:.0f}s"
+
+
+def _change(seconds: float) -> str:
+    if abs(seconds) < 0.5:
+        return ""
+    return (
+        f"[red]+{_hours(seconds)}[/]"
+        if seconds > 0
+        else f"[green]-{_hours(-seconds)}[/]"
+    )
@@ -0,0 +1,163 @@
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Optional
+
+from rich.console import Console, ConsoleOptions, RenderResult
+from rich.table import Table
+
+from tringa import cli, scoped_db
+from tringa.cli import reports
+from tringa.cli.repo.shard_plan import pytest_module_and_node_id
+from tringa.db import DB
+from tringa.models import SerializableDict
+
+
+@dataclass
+class OrderedTest(reports.Report):
+    node_id: str
+    runs: int
+    failures: int
+    # The failure rate, with each result weighted by its age: see make_report.
+    failure_rate: float
+    median_duration: float
+
+    @property
+    def score(self) -> float:
+        return self.failure_rate / max(self.median_duration, 0.001)
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "node_id": self.node_id,
+            "runs": self.runs,
+            "failures": self.failures,
+            "failure_rate": self.failure_rate,
+            "median_duration": self.median_duration,
+            "score": self.score,
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        yield self.node_id
+
+
+@dataclass
+class Report(reports.Report):
+    # All tests, in the order in which they should run.
+    tests: list[OrderedTest]
+
+    def write(self, path: Path) -> None:
+        """
+        Write the node IDs of the tests to path, one per line, in order: pytest
+        runs them in that order with `pytest @path`.
+        """
+        path.write_text("".join(f"{t.node_id}\n" for t in self.tests))
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "tests": [t.to_dict() for t in self.tests],
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        table = Table()
+        table.add_column("Test", style="blue")
+        table.add_column("Runs", justify="right")
+        table.add_column("Failures", justify="right")
+        table.add_column("Recent failure rate", justify="right", style="red")
+        table.add_column("Median", justify="right")
+        limit = cli.options.table_row_limit
+        for t in self.tests[:limit]:
+            table.add_row(
+                t.node_id,
+                str(t.runs),
+                str(t.failures),
+                f"{t.failure_rate:.1%}",
+                f"{t.median_duration:.2f}s",
+            )
+        yield table
+        if len(self.tests) > limit:
+            yield f"...[{len(self.tests) - limit} more]"
+
+
+def make_report(
+    db: DB,
+    repo: str,
+    half_life_days: float = 7.0,
+    since: Optional[date] = None,
+) -> Report:
+    """
+    Order the repo's tests so that those most likely to fail per second of
+    running time come first.
+
+    A test's failure rate gives each of its results a weight that halves every
+    half_life_days before the latest result in the repo, so that a test that
+    was fixed, or has just started failing, moves quickly in the order. Tests
+    that have not failed come last, fastest first.
+    """
+    in_window = scoped_db.in_window("r.suite_time", since)
+    rows = db.connection.execute(
+        f"""
+        with
+        filtered as (
+            select r.test_id, r.suite_time, r.duration, r.passed
+            from result r
+            join run using (run_id)
+            where not r.skipped and run.repo = ? and {in_window}
+        ),
+        latest as (
+            select max(suite_time) as suite_time from filtered
+        ),
+        weighted as (
+            select
+                f.test_id,
+                f.duration,
+                f.passed,
+                pow(
+                    0.5,
+                    (epoch(latest.suite_time) - epoch(f.suite_time))
+                    / {half_life_days * 24 * 60 * 60}
+                ) as weight
+            from filtered f, latest
+        ),
+        rates as (
+            select
+                test_id,
+                count(*) as runs,
+                count(*) filter (where not passed) as failures,
+                sum(weight) filter (where not passed) / sum(weight) as failure_rate,
+                coalesce(median(duration), 0) as median_duration
+            from weighted
+            group by test_id
+        )
+        select
+            t.classname,
+            t.name,
+            runs,
+            failures,
+            coalesce(failure_rate, 0),
+            median_duration
+        from rates
+        join test_case t using (test_id)
+        order by
+            coalesce(failure_rate, 0) / greatest(median_duration, 0.001) desc,
+            median_duration,
+            t.classname,
+            t.name
+        """,
+        [repo],
+    ).fetchall()
+    return Report(
+        tests=[
+            OrderedTest(
+                node_id=pytest_module_and_node_id(classname, name)[1],
+                runs=runs,
+                failures=failures,
+                failure_rate=failure_rate,
+                median_duration=median_duration,
+            )
+            for classname, name, runs, failures, failure_rate, median_duration in rows
+        ]
+    )
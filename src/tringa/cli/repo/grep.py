@@ -0,0 +1,148 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Optional
+
+import humanize
+from rich.console import Console, ConsoleOptions, RenderResult
+from rich.table import Table
+
+from tringa import scoped_db, search
+from tringa.cli import reports
+from tringa.db import DB
+from tringa.models import SerializableDict, run_url
+
+
+@dataclass
+class Match(reports.Report):
+    repo: str
+    classname: str
+    name: str
+    score: float
+    # Number of failed results with a matching message or text.
+    failures: int
+    last_failed: Optional[datetime]
+    last_run_id: int
+    last_branch: str
+    snippet: str
+
+    @property
+    def last_run_url(self) -> str:
+        return run_url(self.repo, self.last_run_id)
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "classname": self.classname,
+            "name": self.name,
+            "score": self.score,
+            "failures": self.failures,
+            "last_failed": self.last_failed.isoformat() if self.last_failed else None,
+            "last_run_url": self.last_run_url,
+            "last_branch": self.last_branch,
+            "snippet": self.snippet,
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        yield self.name
+
+
+@dataclass
+class Report(reports.Report):
+    query: str
+    matches: list[Match]
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "query": self.query,
+            "matches": [m.to_dict() for m in self.matches],
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        table = Table()
+        table.add_column("Test", style="blue")
+        table.add_column("Failures", justify="right")
+        table.add_column("Last failed")
+        table.add_column("Match")
+        for m in self.matches:
+            table.add_row(
+                f"{m.classname}.{m.name}" if m.classname else m.name,
+                str(m.failures),
+                f"[link={m.last_run_url}]"
+                + (
+                    humanize.naturaltime(m.last_failed)
+                    if m.last_failed
+                    else "<unknown>"
+                )
+                + f"[/link] {m.last_branch}",
+                search.highlight(m.snippet, self.query),
+            )
+        yield table
+
+
+def make_report(
+    db: DB, repo: str, query: str, limit: int = 50, since: Optional[date] = None
+) -> Report:
+    """
+    Find the tests in the repo whose failure message or text matches the query,
+    ranked by the best-matching failure, then by number of failures.
+
+    The matching blobs are joined to the result table directly rather than to
+    the test view, which would join every result to its message and text.
+    """
+    match_sql = search.search_sql(query)
+    if match_sql is None:
+        return Report(query=query, matches=[])
+    in_window = scoped_db.in_window("r.suite_time", since)
+    rows = db.connection.execute(
+        f"""
+        with
+        match as ({match_sql}),
+        hit as (
+            select
+                r.test_id, r.run_id, r.suite_time,
+                -- The text is preferred to the message if both match equally
+                -- well. A score may be 0, if the query's words are in every blob.
+                case when m.hash is null or t.score >= m.score then t.hash
+                    else m.hash end as hash,
+                greatest(t.score, m.score) as score
+            from result r
+            left join match t on t.hash = r.text_hash
+            left join match m on m.hash = r.message_hash
+            where (t.hash is not null or m.hash is not null)
+                and not r.passed and not r.skipped and {in_window}
+        ),
+        top as (
+            select
+                test_id,
+                max(score) as score,
+                count(*) as failures,
+                max(suite_time) as last_failed,
+                arg_max(run_id, suite_time) as last_run_id,
+                arg_max(hash, score) as hash
+            from hit
+            where test_id in (select test_id from test_case where repo = ?)
+            group by test_id
+            order by score desc, failures desc
+            limit {limit}
+        )
+        select
+            t.repo, t.classname, t.name, top.score, top.failures, top.last_failed,
+            top.last_run_id, run.branch, top.hash
+        from top
+        join test_case t using (test_id)
+        join run on run.run_id = top.last_run_id
+        order by top.score desc, top.failures desc
+        """,
+        [repo],
+    ).fetchall()
+    contents = db.blobs(row[-1] for row in rows)
+    return Report(
+        query=query,
+        matches=[
+            Match(*row[:-1], snippet=search.snippet(contents.get(row[-1], ""), query))
+            for row in rows
+        ],
+    )
@@ -0,0 +1,227 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Optional
+
+import humanize
+from rich.console import Console, ConsoleOptions, RenderResult
+from rich.table import Table
+
+from tringa import scoped_db
+from tringa.cli import reports
+from tringa.db import DB
+from tringa.models import SerializableDict, run_url
+
+
+@dataclass
+class Regression(reports.Report):
+    repo: str
+    classname: str
+    name: str
+    # Geometric mean durations before and after the change point.
+    before: float
+    after: float
+    # The number of passing runs before and after the change point.
+    runs_before: int
+    runs_after: int
+    # The two-sample t statistic of log durations at the change point.
+    t: float
+    # The first run after the change point.
+    run_id: int
+    sha: str
+    branch: str
+    suite_time: Optional[datetime]
+
+    @property
+    def ratio(self) -> float:
+        return self.after / self.before
+
+    @property
+    def run_url(self) -> str:
+        return run_url(self.repo, self.run_id)
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "classname": self.classname,
+            "name": self.name,
+            "before": self.before,
+            "after": self.after,
+            "ratio": self.ratio,
+            "runs_before": self.runs_before,
+            "runs_after": self.runs_after,
+            "t": self.t,
+            "run_url": self.run_url,
+            "sha": self.sha,
+            "branch": self.branch,
+            "time": self.suite_time.isoformat() if self.suite_time else None,
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        yield f"{self.name} {self.ratio:.1f}x"
+
+
+@dataclass
+class Report(reports.Report):
+    regressions: list[Regression]
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "regressions": [r.to_dict() for r in self.regressions],
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        table = Table()
+        table.add_column("Test", style="blue")
+        table.add_column("Before", justify="right")
+        table.add_column("After", justify="right")
+        table.add_column("Change", justify="right", style="red")
+        table.add_column("First slow run")
+        for r in self.regressions:
+            table.add_row(
+                f"{r.classname}.{r.name}" if r.classname else r.name,
+                f"{r.before:.2f}s",
+                f"{r.after:.2f}s",
+                f"{r.ratio:.1f}x",
+                f"[link={r.run_url}]{r.sha[:8]}[/link] {r.branch} "
+                + (humanize.naturaltime(r.suite_time) if r.suite_time else ""),
+            )
+        yield table
+
+
+def make_report(
+    db: DB,
+    repo: str,
+    runs: int = 200,
+    min_ratio: float = 1.5,
+    min_t: float = 6.0,
+    min_segment: int = 5,
+    limit: int = 30,
+    since: Optional[date] = None,
+) -> Report:
+    """
+    Find tests in the repo whose duration has shifted upwards.
+
+    Each test's durations in its latest `runs` passing runs form a time series, in
+    which the single most likely change point is found: the split maximizing the
+    two-sample t statistic of the log durations before and after it, with at least
+    min_segment runs on each side. A test has regressed if that statistic is at
+    least min_t, and its geometric mean duration grew by at least min_ratio.
+
+    The series of all tests are held in one matrix, so that the statistics of
+    every split of every test are computed together from cumulative sums.
+    """
+    # numpy is imported here since it is slow to import, as in DB.insert_rows.
+    import numpy as np
+
+    in_window = scoped_db.in_window("r.suite_time", since)
+    # The results are ordered into series by numpy rather than by a window
+    # function, which is several times slower.
+    results = db.connection.execute(
+        f"""
+        select
+            r.test_id,
+            r.run_id,
+            epoch_us(r.suite_time) as time,
+            ln(greatest(r.duration, 0.001)) as x
+        from result r
+        join run using (run_id)
+        where r.passed and run.repo = '{repo}' and {in_window}
+        """
+    ).fetchnumpy()
+    if not len(results["test_id"]):
+        return Report(regressions=[])
+    order = np.lexsort((results["time"], results["test_id"]))
+    test_id = results["test_id"][order]
+    is_first = np.r_[True, test_id[1:] != test_id[:-1]]
+    test_ids = test_id[is_first]
+    starts = np.flatnonzero(is_first)
+    ends = np.r_[starts[1:], len(test_id)]
+    # One row per test, holding its latest `runs` durations, with the latest in
+    # the last column. Shorter series are padded on the left.
+    row = np.cumsum(is_first) - 1
+    age = ends[row] - np.arange(len(test_id))
+    keep = age <= runs
+    row, col = row[keep], runs - age[keep]
+    valid = np.zeros((len(test_ids), runs), dtype=bool)
+    x = np.zeros((len(test_ids), runs))
+    run_ids = np.zeros((len(test_ids), runs), dtype=np.int64)
+    valid[row, col] = True
+    x[row, col] = results["x"][order][keep]
+    run_ids[row, col] = results["run_id"][order][keep]
+
+    # Column k of the cumulative sums covers the values before column k, i.e. the
+    # "before" segment of a split at k.
+    def cumsum(a):
+        return np.concatenate([np.zeros((len(a), 1)), np.cumsum(a, axis=1)], axis=1)
+
+    n_before = cumsum(valid)
+    sum_before = cumsum(x)
+    sumsq_before = cumsum(x * x)
+    n, total, total_sq = n_before[:, -1:], sum_before[:, -1:], sumsq_before[:, -1:]
+    n_after = n - n_before
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_before = sum_before / n_before
+        mean_after = (total - sum_before) / n_after
+        # The pooled variance, with a floor corresponding to 1% noise, so that
+        # constant durations do not give infinite statistics.
+        variance = np.maximum(
+            (total_sq - n_before * mean_before**2 - n_after * mean_after**2) / (n - 2),
+            0.01**2,
+        )
+        t = (mean_after - mean_before) / np.sqrt(
+            variance * (1 / n_before + 1 / n_after)
+        )
+    t[(n_before < min_segment) | (n_after < min_segment)] = -np.inf
+
+    split = np.argmax(t, axis=1)
+    tests = np.arange(len(test_ids))
+    best_t = t[tests, split]
+    ratio = np.exp(mean_after[tests, split] - mean_before[tests, split])
+    regressed = np.flatnonzero((best_t >= min_t) & (ratio >= min_ratio))
+    regressed = regressed[np.argsort(-ratio[regressed], kind="stable")][:limit]
+    if not len(regressed):
+        return Report(regressions=[])
+
+    # The first run after the change point is the one at the split column, since
+    # a series is contiguous from its first value.
+    first_run_ids = {int(test_ids[i]): int(run_ids[i, split[i]]) for i in regressed}
+    rows = db.connection.execute(
+        f"""
+        select r.test_id, t.classname, t.name, r.run_id, run.sha, run.branch,
+            r.suite_time
+        from result r
+        join run using (run_id)
+        join test_case t using (test_id)
+        where r.run_id in ({", ".join(map(str, set(first_run_ids.values())))})
+            and r.test_id in ({", ".join(map(str, first_run_ids))})
+        """
+    ).fetchall()
+    first_runs = {
+        test_id: (classname, name, run_id, sha, branch, suite_time)
+        for test_id, classname, name, run_id, sha, branch, suite_time in rows
+        if first_run_ids[test_id] == run_id
+    }
+    regressions = []
+    for i in regressed:
+        k = split[i]
+        classname, name, run_id, sha, branch, suite_time = first_runs[int(test_ids[i])]
+        regressions.append(
+            Regression(
+                repo=repo,
+                classname=classname,
+                name=name,
+                before=float(np.exp(mean_before[i, k])),
+                after=float(np.exp(mean_after[i, k])),
+                runs_before=int(n_before[i, k]),
+                runs_after=int(n_after[i, k]),
+                t=float(best_t[i]),
+                run_id=run_id,
+                sha=sha,
+                branch=branch,
+                suite_time=suite_time,
+            )
+        )
+    return Report(regressions=regressions)
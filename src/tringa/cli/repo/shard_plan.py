@@ -0,0 +1,181 @@
+import heapq
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from enum import StrEnum
+from pathlib import Path
+from typing import Optional
+
+from rich.console import Console, ConsoleOptions, RenderResult
+from rich.table import Table
+
+from tringa import scoped_db
+from tringa.cli import reports
+from tringa.db import DB
+from tringa.models import SerializableDict
+
+
+class Unit(StrEnum):
+    """What is assigned to workers: whole test modules, or individual tests."""
+
+    MODULE = "module"
+    TEST = "test"
+
+
+@dataclass
+class Worker(reports.Report):
+    index: int
+    # The predicted duration of the worker: the sum of the durations of its units.
+    duration: float
+    # pytest arguments selecting the worker's units: module paths or node IDs.
+    units: list[str]
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "index": self.index,
+            "duration": self.duration,
+            "units": self.units,
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        yield from self.units
+
+
+@dataclass
+class Report(reports.Report):
+    unit: Unit
+    workers: list[Worker]
+    # The total duration of all units, and the least possible makespan: the
+    # larger of an equal split of the total and the longest unit.
+    total_duration: float
+    lower_bound: float
+
+    @property
+    def makespan(self) -> float:
+        return max((w.duration for w in self.workers), default=0.0)
+
+    def write_pytest_args(self, dir: Path) -> list[Path]:
+        """
+        Write the units of each worker to `worker-<index>.txt` in dir, one per
+        line, for use as e.g. `pytest @worker-0.txt`.
+        """
+        dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for worker in self.workers:
+            path = dir / f"worker-{worker.index}.txt"
+            path.write_text("".join(f"{unit}\n" for unit in worker.units))
+            paths.append(path)
+        return paths
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "unit": str(self.unit),
+            "makespan": self.makespan,
+            "total_duration": self.total_duration,
+            "lower_bound": self.lower_bound,
+            "workers": [w.to_dict() for w in self.workers],
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        table = Table()
+        table.add_column("Worker", justify="right")
+        table.add_column("Predicted", justify="right", style="bold")
+        table.add_column(f"{self.unit.capitalize()}s", justify="right")
+        table.add_column("Longest", style="blue")
+        for w in self.workers:
+            table.add_row(
+                str(w.index),
+                f"{w.duration:.1f}s",
+                str(len(w.units)),
+                w.units[0] if w.units else "",
+            )
+        yield table
+        yield (
+            f"Predicted makespan: [bold]{self.makespan:.1f}s[/] "
+            f"(lower bound {self.lower_bound:.1f}s, "
+            f"total {self.total_duration:.1f}s)"
+        )
+
+
+def make_report(
+    db: DB,
+    repo: str,
+    workers: int,
+    artifact: Optional[str] = None,
+    unit: Unit = Unit.MODULE,
+    since: Optional[date] = None,
+) -> Report:
+    """
+    Assign the repo's test modules, or tests, to workers so that the workers
+    finish at about the same time.
+
+    A test's duration is estimated by its median duration over the results in
+    artifacts matching the artifact glob, so that a few runs that were slowed by
+    timeouts or a busy runner do not affect it. Units are assigned by the
+    longest processing time rule: longest first, each to the worker with the
+    least work so far. The makespan of the plan is at most 4/3 of the best
+    possible.
+    """
+    in_window = scoped_db.in_window("r.suite_time", since)
+    params: list = [repo]
+    in_artifact = "true"
+    if artifact is not None:
+        in_artifact = (
+            "r.artifact_id in (select artifact_id from artifact where name glob ?)"
+        )
+        params.append(artifact)
+    rows = db.connection.execute(
+        f"""
+        select t.classname, t.name, median(r.duration)
+        from result r
+        join run using (run_id)
+        join test_case t using (test_id)
+        where not r.skipped and run.repo = ? and {in_artifact} and {in_window}
+        group by r.test_id, t.classname, t.name
+        """,
+        params,
+    ).fetchall()
+
+    durations: dict[str, float] = defaultdict(float)
+    for classname, name, duration in rows:
+        module, node_id = pytest_module_and_node_id(classname, name)
+        durations[module if unit == Unit.MODULE else node_id] += duration or 0.0
+
+    loads = [(0.0, i) for i in range(workers)]
+    units: list[list[str]] = [[] for _ in range(workers)]
+    for key, duration in sorted(durations.items(), key=lambda kv: (-kv[1], kv[0])):
+        load, i = heapq.heappop(loads)
+        units[i].append(key)
+        heapq.heappush(loads, (load + duration, i))
+    worker_durations = {i: load for load, i in loads}
+
+    total = sum(durations.values())
+    return Report(
+        unit=unit,
+        workers=[
+            Worker(index=i, duration=worker_durations[i], units=units[i])
+            for i in range(workers)
+        ],
+        total_duration=total,
+        lower_bound=max(total / workers, max(durations.values(), default=0.0)),
+    )
+
+
+def pytest_module_and_node_id(classname: str, name: str) -> tuple[str, str]:
+    """
+    The path of a test's module, and its pytest node ID.
+
+    pytest's JUnit XML gives the module and class of a test as a dotted
+    classname, e.g. `tests.test_db.TestInsert`. The module is taken to end before
+    the first capitalized part, since test classes are capitalized, and modules
+    almost never are.
+    """
+    parts = classname.split(".") if classname else []
+    n = next((i for i, p in enumerate(parts) if p[:1].isupper()), len(parts))
+    module = "/".join(parts[:n]) + ".py" if n else ""
+    node_id = "::".join([module, *parts[n:], name] if module else [*parts[n:], name])
+    return module or node_id, node_id
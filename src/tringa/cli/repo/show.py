@@ -1,11 +1,12 @@
 from dataclasses import dataclass
+from typing import Optional, Union
 
 from rich.console import Console, ConsoleOptions, RenderResult
 from rich.table import Table
 from rich.text import Text
 
 from tringa.cli import reports
-from tringa.cli.reports import flaky_tests, slow_tests
+from tringa.cli.reports import flaky_tests, sections, slow_tests
 from tringa.db import DB
 from tringa.models import SerializableDict
 from tringa.queries import EmptyParams, Query
@@ -15,7 +16,7 @@ from tringa.queries import EmptyParams, Query
 class Report(reports.Report):
     repo: str
     prs: int
-    flaky_tests: flaky_tests.Report
+    flaky_tests: Union[flaky_tests.Report, flaky_tests.Summary]
     slow_tests: slow_tests.Report
 
     def to_dict(self) -> SerializableDict:
@@ -55,18 +56,29 @@ class Report(reports.Report):
         yield make_summary()
 
 
-def make_report(db: DB, repo: str) -> Report:
-    prs = Query[tuple[int], EmptyParams](
-        """
-        select count(*) from (
-            select distinct pr from test
-        );
-        """
-    ).fetchone(db, {})[0]
+def make_report(db: DB, repo: str, limit: Optional[int] = None) -> Report:
+    """
+    Summarize the tests of the repo. The sections of the summary are made
+    concurrently.
 
-    return Report(
-        repo=repo,
-        prs=prs,
-        flaky_tests=flaky_tests.make_report(db),
-        slow_tests=slow_tests.make_report(db, limit=10),
+    With a limit, the flaky tests section holds only the first limit tests, which
+    is all that is shown of it; otherwise it is the full report, as output by
+    --json.
+    """
+    made = sections.gather(
+        db,
+        prs=lambda db: Query[tuple[int], EmptyParams](
+            """
+            select count(*) from (
+                select distinct pr from run_summary
+            );
+            """
+        ).fetchone(db, {})[0],
+        flaky_tests=(
+            flaky_tests.make_report
+            if limit is None
+            else lambda db: flaky_tests.make_summary(db, limit)
+        ),
+        slow_tests=lambda db: slow_tests.make_report(db, limit=10),
     )
+    return Report(repo=repo, **made)
@@ -0,0 +1,85 @@
+"""
+A cache of reports, so that a command whose data has not changed since it was
+last run does not have to query the DB again.
+
+A cached report is keyed by the command, its scope, and the data version of the
+DB (see DB.data_version), so that any insert invalidates it, and by the version
+of tringa, so that reports are not read by code that has changed their classes.
+Reports are stored as pickles in the user's cache directory.
+"""
+
+import hashlib
+import importlib.metadata
+import os
+import pickle
+import tempfile
+from pathlib import Path
+from typing import Callable, Sequence
+
+import xdg_base_dirs
+
+from tringa.db import DBConfig
+from tringa.models import Serializable
+from tringa.msg import debug
+
+# Increment when a change to a report class means that reports cached by earlier
+# versions of the code cannot be output, or output differently.
+CACHE_VERSION = 2
+
+
+def get[
+    R: Serializable
+](db_config: DBConfig, key: Sequence[object], make_report: Callable[[], R]) -> R:
+    """
+    Return the cached report for key, calling make_report to create it if the
+    cache holds no report for the current data.
+
+    The elements of key are identified by their repr.
+    """
+    if not db_config.path or not db_config.path.exists():
+        return make_report()
+    with db_config.connect(read_only=True) as db:
+        (db_id, version) = db.data_version
+    prefix = _digest(CACHE_VERSION, importlib.metadata.version("tringa"), db_id, *key)
+    path = _cache_dir() / f"{prefix}-{version}.pickle"
+    try:
+        with open(path, "rb") as f:
+            report = pickle.load(f)
+        debug(f"Using cached report {path}")
+        return report
+    except FileNotFoundError:
+        pass
+    except Exception as err:
+        # E.g. written by a different version of tringa.
+        debug(f"Ignoring unreadable cached report {path}: {err}")
+
+    report = make_report()
+    _write(path, report)
+    # Reports for earlier versions of the data will never be read again.
+    for stale_path in path.parent.glob(f"{prefix}-*.pickle"):
+        if stale_path != path:
+            stale_path.unlink(missing_ok=True)
+    return report
+
+
+def _write(path: Path, report: Serializable) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file that replaces the cache entry, so that concurrent
+    # tringa processes never read a partially written report.
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(report, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    debug(f"Cached report {path}")
+
+
+def _digest(*parts: object) -> str:
+    return hashlib.sha256("\0".join(map(repr, parts)).encode()).hexdigest()[:32]
+
+
+def _cache_dir() -> Path:
+    return xdg_base_dirs.xdg_cache_home() / "tringa" / "reports"
@@ -1,9 +1,10 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Optional
 
 from rich.console import Console, ConsoleOptions, RenderResult
 from rich.table import Table
 
-from tringa import cli
+from tringa import cli, search
 from tringa.cli import reports
 from tringa.db import DB
 from tringa.models import TestResult
@@ -13,6 +14,58 @@ from tringa.queries import EmptyParams, Query
 @dataclass
 class Report(reports.Report):
     tests: list[TestResult]
+    # Failure texts are not fetched with the tests; they are read from the DB
+    # when needed.
+    db: Optional[DB] = field(default=None, repr=False, compare=False)
+
+    def text(self, test: TestResult) -> Optional[str]:
+        if test.text is None and test.text_hash is not None and self.db is not None:
+            return self.db.blobs([test.text_hash]).get(test.text_hash)
+        return test.text
+
+    def search(self, query: str) -> list[TestResult]:
+        """
+        The tests whose failure message or text matches the query.
+        """
+        terms = set(search.tokens(query))
+        if not terms:
+            return list(self.tests)
+        if self.db is not None:
+            hashes = search.search(self.db, query)
+            return [
+                t
+                for t in self.tests
+                if t.text_hash in hashes or t.message_hash in hashes
+            ]
+        # Without a DB, the texts held by the tests are searched.
+        return [
+            t
+            for t in self.tests
+            if terms <= set(search.tokens(f"{t.message or ''}\n{t.text or ''}"))
+        ]
+
+    def load_texts(self) -> None:
+        """
+        Read the failure texts from the DB into the tests, so that the report can
+        be output once the DB is closed.
+        """
+        if self.db is None:
+            return
+        texts = self.db.blobs(
+            t.text_hash
+            for t in self.tests
+            if t.text is None and t.text_hash is not None
+        )
+        self.tests = [
+            t._replace(text=texts[t.text_hash]) if t.text_hash in texts else t
+            for t in self.tests
+        ]
+
+    def __getstate__(self) -> dict:
+        # The DB connection cannot be pickled by the report cache, so the texts
+        # are pickled instead.
+        self.load_texts()
+        return self.__dict__ | {"db": None}
 
     def summary(self) -> "Summary":
         return Summary(names=sorted({t.name for t in self.tests}))
@@ -25,9 +78,14 @@ class Report(reports.Report):
     def __rich_console__(
         self, console: Console, options: ConsoleOptions
     ) -> RenderResult:
+        texts = (
+            self.db.blobs(t.text_hash for t in self.tests if t.text_hash is not None)
+            if self.db is not None
+            else {}
+        )
         for test in sorted(self.tests, key=lambda x: x.name):
             table = Table(f"[bold red]{test.name}[/]")
-            table.add_row(test.text or "")
+            table.add_row(test.text or texts.get(test.text_hash, ""))  # type: ignore
             yield table
 
 
@@ -53,10 +111,10 @@ class Summary(reports.Report):
 def make_report(db: DB) -> Report:
     failed_test_results = Query[TestResult, EmptyParams](
         """
-    select * from test
+    select * replace (null as message, null as text) from test
     where passed = false and skipped = false
     order by file, flaky desc, duration desc;
     """
     ).fetchall(db, {})
 
-    return Report(tests=failed_test_results)
+    return Report(tests=failed_test_results, db=db)
@@ -1,6 +1,8 @@
-from collections import defaultdict
 from dataclasses import dataclass
-from typing import DefaultDict
+from datetime import datetime
+from functools import cached_property
+from itertools import groupby
+from typing import NamedTuple, Optional
 
 from rich.console import Console, ConsoleOptions, RenderResult
 from rich.table import Table
@@ -8,8 +10,7 @@ from rich.table import Table
 from tringa import cli
 from tringa.cli import reports
 from tringa.db import DB
-from tringa.models import Run, SerializableDict, TestResult
-from tringa.queries import EmptyParams, Query
+from tringa.models import PR, Run, SerializableDict
 
 
 @dataclass
@@ -55,22 +56,90 @@ class FlakyTestPR(reports.Report):
         }
 
 
+class LatestFailure(NamedTuple):
+    branch: str
+    file: str
+    repo: str
+    run_id: int
+    sha: str
+    pr: Optional[int]
+    pr_title: Optional[str]
+    suite_time: Optional[datetime]
+
+    def run(self) -> Run:
+        return Run(
+            repo=self.repo,
+            id=self.run_id,
+            branch=self.branch,
+            sha=self.sha,
+            pr=(
+                PR(
+                    repo=self.repo,
+                    number=self.pr,
+                    title=self.pr_title,
+                    branch=self.branch,
+                    status_checks=[],
+                )
+                if self.pr is not None and self.pr_title is not None
+                else None
+            ),
+            created_at=self.suite_time,
+        )
+
+
 @dataclass
 class FlakyTest(reports.Report):
     name: str
-    prs_with_failures: list[FlakyTestPR]
+    # The latest failure of the test in each file, for each branch, ordered by
+    # branch and file. The objects describing them are constructed when first
+    # needed, since a summary shows only a few tests.
+    failures: list[LatestFailure]
+    # The number of commits at which the test both passed and failed, and the
+    # fraction of the commits at which it ran more than once that those are.
+    flips: int = 0
+    flip_rate: float = 0.0
+    # The fraction of the test's results that are failures, estimated from the
+    # results weighted by the weights of their runs, and its 95% confidence
+    # interval if some of the runs were synced as a sample.
+    failure_rate: float = 0.0
+    failure_rate_ci: Optional[tuple[float, float]] = None
+
+    @cached_property
+    def prs_with_failures(self) -> list[FlakyTestPR]:
+        prs_with_failures = []
+        for _, failures in groupby(self.failures, key=lambda f: f.branch):
+            failed_builds = [Build(f.file, f.run()) for f in failures]
+            # FIXME
+            run = next(b.run for b in failed_builds)
+            prs_with_failures.append(FlakyTestPR(run=run, failed_builds=failed_builds))
+        return prs_with_failures
 
     def __rich_console__(
         self, console: Console, options: ConsoleOptions
     ) -> RenderResult:
-        table = Table(title=self.name, show_header=False)
+        table = Table(
+            title=f"{self.name} ({self.flips} flips, {self.flip_rate:.0%})",
+            show_header=False,
+        )
         for pr in self.prs_with_failures:
             table.add_row(pr.run.pr, "\n".join(b.__rich__() for b in pr.failed_builds))
         yield table
+        if self.failure_rate_ci is not None:
+            low, high = self.failure_rate_ci
+            yield (
+                f"Estimated failure rate {self.failure_rate:.1%} "
+                f"(95% CI {low:.1%} to {high:.1%})"
+            )
 
     def to_dict(self) -> SerializableDict:
         return {
             "name": self.name,
+            "flips": self.flips,
+            "flip_rate": self.flip_rate,
+            "failure_rate": self.failure_rate,
+            "failure_rate_ci": (
+                list(self.failure_rate_ci) if self.failure_rate_ci else None
+            ),
             "failed_runs": [r.to_dict() for r in self.prs_with_failures],
         }
 
@@ -78,6 +147,9 @@ class FlakyTest(reports.Report):
 @dataclass
 class Summary(reports.Report):
     tests: list[FlakyTest]
+    # The number of flaky tests, if tests holds only the first of them by name:
+    # see make_summary.
+    total: Optional[int] = None
 
     def to_dict(self) -> dict:
         return {"test_names": sorted({t.name for t in self.tests})}
@@ -88,7 +160,8 @@ class Summary(reports.Report):
         seen = set()
         for i, test in enumerate(sorted(self.tests, key=lambda x: x.name)):
             if i + 1 == cli.options.table_row_limit:
-                yield f"...[{len(self.tests) - i} more]"
+                total = self.total if self.total is not None else len(self.tests)
+                yield f"...[{total - i} more]"
                 break
             if test.name in seen:
                 continue
@@ -117,59 +190,145 @@ class Report(reports.Report):
 
 
 def make_report(db: DB) -> Report:
-    test_results = Query[TestResult, EmptyParams](
+    # Data should be unique on (branch, run, run_attempt, file, name) but
+    # run_attempt is not in the table because it is not returned by the GitHub
+    # artifacts API. So, we take the latest failure for each file.
+    #
+    # The rows are grouped by test in Python rather than aggregated into lists by
+    # DuckDB, which converts nested values to Python objects much more slowly.
+    rows = db.connection.execute(
         """
-        select * from test
+        select name, branch, file, repo, run_id, sha, pr, pr_title, suite_time
+        from test
         where flaky = true and passed = false and skipped = false
-        order by name, branch, file, suite_time desc;
+        qualify row_number() over (
+            partition by name, branch, file order by suite_time desc
+        ) = 1
+        order by name, branch, file
         """
-    ).fetchall(db, {})
-
-    name_to_branch_to_file_to_latest_failure: DefaultDict[
-        str, DefaultDict[str, dict[str, TestResult]]
-    ] = defaultdict(lambda: defaultdict(lambda: defaultdict()))
-    for tr in test_results:
-        file_to_latest_failure = name_to_branch_to_file_to_latest_failure[tr.name][
-            tr.branch
+    ).fetchall()
+    flips = {
+        name: (flips, flips / retried)
+        for name, flips, retried in db.connection.execute(
+            """
+            select t.name, sum(f.flips)::BIGINT, sum(f.retried)::BIGINT
+            from flaky_test f
+            join test_case t using (test_id)
+            group by t.name
+            """
+        ).fetchall()
+    }
+    failure_rates = _failure_rates(db)
+    return Report(
+        tests=[
+            FlakyTest(
+                name,
+                [LatestFailure(*row[1:]) for row in test_rows],
+                *flips.get(name, (0, 0.0)),
+                *failure_rates.get(name, (0.0, None)),
+            )
+            for name, test_rows in groupby(rows, key=lambda row: row[0])
         ]
-        # Data should be unique on (branch, run, run_attempt, file, name)
-        # but run_attempt is not in the table because it is not returned by
-        # the GitHub artifacts API. So, we take the first for each file.
-        file_to_latest_failure.setdefault(tr.file, tr)
-
-    def flaky_tests():
-        for (
-            name,
-            branch_to_file_to_latest_failure,
-        ) in name_to_branch_to_file_to_latest_failure.items():
-            prs_with_failures = []
-            for (
-                branch,
-                file_to_latest_failure,
-            ) in branch_to_file_to_latest_failure.items():
-                failed_builds = [
-                    Build(
-                        file,
-                        Run(
-                            repo=tr.repo,
-                            id=tr.run_id,
-                            branch=branch,
-                            sha=tr.sha,
-                            pr=tr.make_pr(),
-                            created_at=tr.suite_time,
-                        ),
-                    )
-                    for file, tr in file_to_latest_failure.items()
-                ]
-                # FIXME
-                run = next(b.run for b in failed_builds)
-
-                prs_with_failures.append(
-                    FlakyTestPR(
-                        run=run,
-                        failed_builds=failed_builds,
-                    )
-                )
-            yield FlakyTest(name, prs_with_failures)
+    )
+
+
+def make_summary(db: DB, limit: int) -> Summary:
+    """
+    The summary of the flaky tests, holding only the first limit of them by name,
+    each with its first latest failure, which is all that the summary shows.
 
-    return Report(tests=list(flaky_tests()))
+    The flaky tests that failed in the scope are found from the daily rollups,
+    so that only the failures of the tests that are shown are read.
+    """
+    test_ids: dict[str, list[int]] = {}
+    for name, test_id in db.connection.execute(
+        """
+        select name, test_id from test_daily
+        where failures > 0 and test_id in (select test_id from flaky_test)
+        group by name, test_id
+        order by name
+        """
+    ).fetchall():
+        test_ids.setdefault(name, []).append(test_id)
+    names = list(test_ids)[:limit]
+    shown = [test_id for name in names for test_id in test_ids[name]]
+    # IDs are written into the SQL as literals, rather than passed as parameters,
+    # so that DuckDB can push the filter down to the scan of the results.
+    rows = db.connection.execute(
+        f"""
+        select name, branch, file, repo, run_id, sha, pr, pr_title, suite_time
+        from test
+        where flaky and not passed and not skipped
+            and test_id in ({", ".join(map(str, shown)) or "null"})
+        qualify row_number() over (
+            partition by name order by branch, file, suite_time desc
+        ) = 1
+        order by name
+        """
+    ).fetchall()
+    return Summary(
+        tests=[FlakyTest(row[0], [LatestFailure(*row[1:])]) for row in rows],
+        total=len(test_ids),
+    )
+
+
+def _failure_rates(db: DB) -> dict[str, tuple[float, Optional[tuple[float, float]]]]:
+    """
+    The failure rate of each flaky test, with its 95% confidence interval if some
+    of the runs in the scope were synced as a sample.
+    """
+    (sampled,) = db.fetchone(
+        """
+        select coalesce(bool_or(weight <> 1), false) from run
+        where run_id in (select run_id from run_summary)
+        """
+    )
+    if not sampled:
+        # The rate is exact, and is read from the daily rollups.
+        return {
+            name: (rate, None)
+            for name, rate in db.connection.execute(
+                """
+                select name, sum(failures) / sum(passes + failures)
+                from test_daily
+                where test_id in (select test_id from flaky_test)
+                group by name
+                having sum(passes + failures) > 0
+                """
+            ).fetchall()
+        }
+    # A run that was synced as part of a sample stands for `weight` runs. The
+    # variance of the estimated failure rate is approximated as if each run had
+    # been sampled independently, with probability 1 / weight.
+    return {
+        name: (rate, (max(rate - 1.96 * se, 0.0), min(rate + 1.96 * se, 1.0)))
+        for name, rate, se in db.connection.execute(
+            """
+            with
+            per_run as (
+                select
+                    t.name,
+                    any_value(run.weight) as w,
+                    count(*) as results,
+                    count(*) filter (where not t.passed) as failures
+                from test t
+                join run using (run_id)
+                where t.flaky and not t.skipped
+                group by t.name, t.run_id
+            ),
+            rates as (
+                select name, sum(w * failures) / sum(w * results) as rate
+                from per_run
+                group by name
+            )
+            select
+                name,
+                rate,
+                sqrt(sum(w * (w - 1) * pow(failures - rate * results, 2)))
+                / sum(w * results)
+            from per_run
+            join rates using (name)
+            group by name, rate
+            """
+        ).fetchall()
+    }
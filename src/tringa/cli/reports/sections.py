@@ -0,0 +1,34 @@
+"""
+Reports made of sections, such as `repo show`, make their sections concurrently,
+each on its own connection to the DB, so that they take about as long as their
+slowest section, rather than the sum of them.
+"""
+
+import concurrent.futures
+from contextlib import ExitStack
+from typing import Any, Callable
+
+from tringa.db import DB
+
+
+def gather(db: DB, **sections: Callable[[DB], Any]) -> dict[str, Any]:
+    """
+    Call the function of each section with a connection to db, concurrently, and
+    return what they return by section name.
+
+    The first section is made on db itself, in this thread, so that what it
+    returns may go on using db. The others are made on cursors of db, in other
+    threads, and the cursors are closed when they are done.
+    """
+    (first, make_first), *rest = sections.items()
+    with ExitStack() as stack:
+        cursors = [stack.enter_context(db.cursor()) for _ in rest]
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(len(rest), 1)
+        ) as executor:
+            futures = {
+                name: executor.submit(make, cursor)
+                for (name, make), cursor in zip(rest, cursors)
+            }
+            made = {first: make_first(db)}
+            return made | {name: future.result() for name, future in futures.items()}
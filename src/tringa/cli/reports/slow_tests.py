@@ -1,4 +1,3 @@
-from collections import defaultdict
 from dataclasses import dataclass
 from typing import Optional
 
@@ -6,21 +5,32 @@ from rich.console import Console, ConsoleOptions, RenderResult
 from rich.table import Table
 
 from tringa.cli import reports
-from tringa.db import DB
+from tringa.db import DB, DURATION_SKETCH_GAMMA
 from tringa.queries import EmptyParams, Query
 
 
 @dataclass
 class SlowTest(reports.Report):
     name: str
-    max_successful_duration: Optional[float]
-    max_failed_duration: Optional[float]
+    runs: int
+    # Total duration of the test in all runs: the CI time that it costs.
+    total_duration: float
+    # Duration quantiles, read from the daily duration sketches, so within 1% of
+    # the true values.
+    p50: Optional[float]
+    p95: Optional[float]
+    p99: Optional[float]
+    max_duration: Optional[float]
 
     def to_dict(self) -> dict:
         return {
             "name": self.name,
-            "max_successful_duration": self.max_successful_duration,
-            "max_failed_duration": self.max_failed_duration,
+            "runs": self.runs,
+            "total_duration": self.total_duration,
+            "p50": self.p50,
+            "p95": self.p95,
+            "p99": self.p99,
+            "max_duration": self.max_duration,
         }
 
     def __rich_console__(
@@ -41,69 +51,98 @@ class Report(reports.Report):
     def __rich_console__(
         self, console: Console, options: ConsoleOptions
     ) -> RenderResult:
+        def seconds(duration: Optional[float]) -> str:
+            return f"{duration:.1f}s" if duration is not None else ""
+
         table = Table()
         table.add_column("Name", style="blue")
-        table.add_column("Max Duration (success)", style="green")
-        table.add_column("Max Duration (failure)", style="red")
+        table.add_column("Runs", justify="right")
+        table.add_column("Total", justify="right", style="bold")
+        table.add_column("p50", justify="right")
+        table.add_column("p95", justify="right")
+        table.add_column("p99", justify="right")
+        table.add_column("Max", justify="right", style="red")
 
         for test in self.tests:
             table.add_row(
                 test.name,
-                (
-                    f"{test.max_successful_duration:.1f}s"
-                    if test.max_successful_duration is not None
-                    else ""
-                ),
-                (
-                    f"{test.max_failed_duration:.1f}s"
-                    if test.max_failed_duration is not None
-                    else ""
-                ),
+                str(test.runs),
+                seconds(test.total_duration),
+                seconds(test.p50),
+                seconds(test.p95),
+                seconds(test.p99),
+                seconds(test.max_duration),
             )
 
         yield table
 
 
-def make_report(db: DB, threshold: float = 0.0, limit: int = 30) -> Report:
-    successful_tests = Query[tuple[str, float], EmptyParams](
-        f"""
-        select name, max(duration) from test
-        where duration > {threshold} and passed = true
-        group by name
-        order by max(duration) desc
-        limit {limit};
-        """
-    ).fetchall(db, {})
+def make_report(db: DB, limit: int = 30) -> Report:
+    """
+    The tests that take the most CI time in total, with their duration quantiles.
 
-    failed_tests = Query[tuple[str, float], EmptyParams](
+    The daily rollups hold a sketch of each test's durations on each day, so the
+    quantiles are computed by summing the bucket counts of the sketches, rather
+    than by sorting all durations.
+    """
+    # A bucket b of the sketch holds durations in (γ^(b-1), γ^b]; its midpoint in
+    # relative terms is 2γ^b / (γ + 1).
+    gamma = DURATION_SKETCH_GAMMA
+    tests = Query[SlowTest, EmptyParams](
         f"""
-        select name, max(duration) from test
-        where duration > {threshold} and passed = false and skipped = false
-        group by name
-        order by max(duration) desc
-        limit {limit};
+        with
+        top as (
+            select
+                name,
+                sum(runs) as runs,
+                sum(duration_sum) as total_duration,
+                max(duration_max) as max_duration
+            from test_daily
+            group by name
+            having total_duration > 0
+            order by total_duration desc
+            limit {limit}
+        ),
+        bucket as (
+            select name, bucket, sum(n) as n from (
+                select
+                    name,
+                    unnest(map_keys(duration_sketch)) as bucket,
+                    unnest(map_values(duration_sketch)) as n
+                from test_daily
+                where name in (select name from top)
+            )
+            group by name, bucket
+        ),
+        cumulative as (
+            select
+                name,
+                bucket,
+                sum(n) over (partition by name order by bucket) as below,
+                sum(n) over (partition by name) as n
+            from bucket
+        ),
+        quantiles as (
+            select
+                name,
+                min(bucket) filter (where below >= 0.50 * n) as p50,
+                min(bucket) filter (where below >= 0.95 * n) as p95,
+                min(bucket) filter (where below >= 0.99 * n) as p99
+            from cumulative
+            group by name
+        )
+        select
+            name,
+            runs,
+            total_duration,
+            least(2 * pow({gamma}, p50) / ({gamma} + 1), max_duration),
+            least(2 * pow({gamma}, p95) / ({gamma} + 1), max_duration),
+            least(2 * pow({gamma}, p99) / ({gamma} + 1), max_duration),
+            max_duration
+        from top
+        left join quantiles using (name)
+        order by total_duration desc;
         """
     ).fetchall(db, {})
 
-    slow_tests = defaultdict(
-        lambda: dict[str, Optional[float]](
-            max_successful_duration=None, max_failed_duration=None
-        )
-    )
-
-    for name, duration in successful_tests:
-        slow_tests[name]["max_successful_duration"] = duration
-
-    for name, duration in failed_tests:
-        slow_tests[name]["max_failed_duration"] = duration
-
-    return Report(
-        tests=[
-            SlowTest(
-                name=name,
-                max_successful_duration=t["max_successful_duration"],
-                max_failed_duration=t["max_failed_duration"],
-            )
-            for name, t in slow_tests.items()
-        ]
-    )
+    return Report(tests=tests)
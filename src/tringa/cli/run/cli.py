@@ -1,5 +1,5 @@
 import asyncio
-from typing import NoReturn, Optional
+from typing import ContextManager, NoReturn, Optional
 
 import tringa.cli.reports.failed_tests
 import tringa.cli.reports.flaky_tests
@@ -10,23 +10,28 @@ import tringa.tui.tui
 from tringa import cli, gh, scoped_db
 from tringa.annotations import flaky as flaky
 from tringa.cli.output import tringa_print
+from tringa.db import DB
 from tringa.models import Run
 
 reports = tringa.cli.reports
 
 
 def failed(run: Run) -> None:
-    with scoped_db.connect(cli.options.db_config, repo=run.repo, run_id=run.id) as db:
+    with _scoped_db(run) as db:
         tringa_print(reports.failed_tests.make_report(db))
 
 
 def flakes(run: Run) -> None:
-    with scoped_db.connect(cli.options.db_config, repo=run.repo, run_id=run.id) as db:
-        tringa_print(reports.flaky_tests.make_report(db))
+    tringa_print(flakes_report(run))
+
+
+def flakes_report(run: Run) -> reports.flaky_tests.Report:
+    with _scoped_db(run) as db:
+        return reports.flaky_tests.make_report(db)
 
 
 def repl(run: Run, repl: Optional[tringa.repl.Repl]) -> NoReturn:
-    with scoped_db.connect(cli.options.db_config, repo=run.repo, run_id=run.id) as db:
+    with _scoped_db(run) as db:
         tringa.repl.repl(db, repl)
 
 
@@ -35,18 +40,34 @@ def rerun(run: Run) -> None:
 
 
 def show(run: Run) -> None:
-    with scoped_db.connect(cli.options.db_config, repo=run.repo, run_id=run.id) as db:
-        tringa_print(tringa.cli.run.show.make_report(db, run))
+    tringa_print(show_report(run))
+
+
+def show_report(run: Run) -> tringa.cli.run.show.Report:
+    with _scoped_db(run) as db:
+        report = tringa.cli.run.show.make_report(db, run, cli.options.summary_limit)
+        # The report outlives the DB connection, e.g. in the report cache.
+        report.failed_tests.load_texts()
+        return report
 
 
 def sql(run: Run, query: str) -> None:
     """
     Execute a SQL query against the database.
     """
-    with scoped_db.connect(cli.options.db_config, repo=run.repo, run_id=run.id) as db:
+    with _scoped_db(run) as db:
         tringa_print(db.connection.sql(query))
 
 
 def tui(run: Run) -> NoReturn:  # type: ignore
-    with scoped_db.connect(cli.options.db_config, repo=run.repo, run_id=run.id) as db:
+    with _scoped_db(run) as db:
         tringa.tui.tui.tui(run_result=tringa.cli.run.show.make_report(db, run))
+
+
+def _scoped_db(run: Run) -> ContextManager[DB]:
+    return scoped_db.connect(
+        cli.options.db_config,
+        repo=run.repo,
+        run_id=run.id,
+        since=cli.options.window_start,
+    )
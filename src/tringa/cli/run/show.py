@@ -1,11 +1,12 @@
 from dataclasses import dataclass
+from typing import Optional, Union
 
 import humanize
 from rich.console import Console, ConsoleOptions, RenderResult
 from rich.table import Table
 
 from tringa.cli import reports
-from tringa.cli.reports import failed_tests, flaky_tests, status_checks
+from tringa.cli.reports import failed_tests, flaky_tests, sections, status_checks
 from tringa.db import DB
 from tringa.models import Run
 
@@ -14,7 +15,7 @@ from tringa.models import Run
 class Report(reports.Report):
     run: Run
     failed_tests: failed_tests.Report
-    flaky_tests: flaky_tests.Report
+    flaky_tests: Union[flaky_tests.Report, flaky_tests.Summary]
     status_checks: status_checks.Report
 
     def to_dict(self) -> dict:
@@ -57,10 +58,26 @@ class Report(reports.Report):
         yield table
 
 
-def make_report(db: DB, run: Run) -> Report:
+def make_report(db: DB, run: Run, limit: Optional[int] = None) -> Report:
+    """
+    Summarize the tests of the run. The sections of the summary are made
+    concurrently.
+
+    With a limit, the flaky tests section holds only the first limit tests, which
+    is all that is shown of it; otherwise it is the full report, as output by
+    --json. The failed tests are always read in full, for the TUI.
+    """
+    made = sections.gather(
+        db,
+        failed_tests=failed_tests.make_report,
+        flaky_tests=(
+            flaky_tests.make_report
+            if limit is None
+            else lambda db: flaky_tests.make_summary(db, limit)
+        ),
+    )
     return Report(
         run=run,
-        failed_tests=failed_tests.make_report(db),
-        flaky_tests=flaky_tests.make_report(db),
         status_checks=status_checks.make_report(run.pr.status_checks if run.pr else []),
+        **made,
     )
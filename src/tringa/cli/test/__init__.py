@@ -0,0 +1 @@
+from tringa.cli.test.cli import app as app
@@ -0,0 +1,198 @@
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import humanize
+from rich.console import Console, ConsoleOptions, RenderResult
+from rich.table import Table
+
+from tringa import cli
+from tringa.cli import reports
+from tringa.db import DB
+from tringa.fetch import fetch_data_for_run
+from tringa.models import Run, SerializableDict
+
+
+@dataclass
+class Probe(reports.Report):
+    run: Run
+    # Whether a matching test failed in the run, or None if none of them ran.
+    failed: Optional[bool]
+    # Whether the run's artifacts were downloaded, rather than read from the DB.
+    downloaded: bool
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "run": self.run.to_dict(),
+            "failed": self.failed,
+            "downloaded": self.downloaded,
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        yield f"{self.run.id} {_outcome(self.failed)}"
+
+
+@dataclass
+class Report(reports.Report):
+    pattern: str
+    branch: str
+    # The number of runs of the branch that were listed.
+    runs: int
+    # The runs whose results were looked at, in the order in which they were.
+    probes: list[Probe]
+    # The first run in which a matching test failed, after a run in which they
+    # passed. If the tests fail in the latest run and the earliest, there is no
+    # last passing run; if they pass in the latest run, there is no first
+    # failing run.
+    first_failing: Optional[Run]
+    last_passing: Optional[Run]
+
+    @property
+    def downloads(self) -> int:
+        return sum(p.downloaded for p in self.probes)
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "pattern": self.pattern,
+            "branch": self.branch,
+            "runs": self.runs,
+            "downloads": self.downloads,
+            "first_failing": (
+                self.first_failing.to_dict() if self.first_failing else None
+            ),
+            "last_passing": self.last_passing.to_dict() if self.last_passing else None,
+            "probes": [p.to_dict() for p in self.probes],
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        table = Table()
+        table.add_column("Run")
+        table.add_column("Created")
+        table.add_column("SHA")
+        table.add_column("Status")
+        table.add_column("Source")
+        for p in sorted(self.probes, key=lambda p: p.run.id):
+            table.add_row(
+                f"[link={p.run.url}]{p.run.id}[/link]",
+                humanize.naturaltime(p.run.created_at) if p.run.created_at else "",
+                p.run.sha[:8],
+                _outcome(p.failed),
+                "downloaded" if p.downloaded else "DB",
+            )
+        yield table
+        yield (
+            f"Looked at {len(self.probes)} of {self.runs} runs of {self.branch}, "
+            f"downloading {self.downloads}"
+        )
+        if self.first_failing is None:
+            yield f"[green]{self.pattern} is not failing in the latest run[/]"
+        elif self.last_passing is None:
+            yield (
+                f"[red]{self.pattern} fails in the earliest run, "
+                f"[link={self.first_failing.url}]{self.first_failing.id}[/link][/]"
+            )
+        else:
+            yield (
+                f"[red]{self.pattern} first failed in run "
+                f"[link={self.first_failing.url}]{self.first_failing.id}[/link] "
+                f"at {self.first_failing.sha}[/], after passing in run "
+                f"[link={self.last_passing.url}]{self.last_passing.id}[/link] "
+                f"at {self.last_passing.sha}"
+            )
+
+
+def make_report(
+    pattern: str, branch: str, runs: list[Run], probe: Callable[[Run], Probe]
+) -> Report:
+    """
+    Find the run in which tests matching pattern started failing, by a binary
+    search over the runs, oldest first, looking at the results of as few of them
+    as possible.
+
+    The search looks at the latest run and the earliest, and then at about
+    log2(len(runs)) runs in between. A run in which none of the tests ran, e.g.
+    because it has no test artifacts, is dropped from the search, as `git
+    bisect skip` does. A flaky test can send the search to the wrong run.
+    """
+    runs = list(runs)
+    probes: list[Probe] = []
+
+    def look_at(i: int) -> Optional[bool]:
+        probes.append(p := probe(runs[i]))
+        return p.failed
+
+    def report(first_failing: Optional[int], last_passing: Optional[int]) -> Report:
+        return Report(
+            pattern=pattern,
+            branch=branch,
+            runs=n_runs,
+            probes=probes,
+            first_failing=runs[first_failing] if first_failing is not None else None,
+            last_passing=runs[last_passing] if last_passing is not None else None,
+        )
+
+    n_runs = len(runs)
+    latest = None
+    while runs and (latest := look_at(len(runs) - 1)) is None:
+        runs.pop()
+    if not latest:
+        return report(None, None)
+    while (earliest := look_at(0)) is None:
+        runs.pop(0)
+    if earliest:
+        return report(0, None)
+
+    # The tests passed in runs[lo] and failed in runs[hi].
+    lo, hi = 0, len(runs) - 1
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        match look_at(mid):
+            case None:
+                runs.pop(mid)
+                hi -= 1
+            case True:
+                hi = mid
+            case False:
+                lo = mid
+    return report(hi, lo)
+
+
+def probe(run: Run, pattern: str) -> Probe:
+    """
+    Look at the results of tests matching pattern in a run, downloading the
+    run's artifacts only if it is not stored.
+    """
+    with cli.options.db_config.connect(read_only=True) as db:
+        (stored,) = db.fetchone(f"select count(*) from run where run_id = {run.id}")
+    downloaded = not stored and not cli.options.nosync
+    if downloaded:
+        fetch_data_for_run(run)
+    with cli.options.db_config.connect(read_only=True) as db:
+        return Probe(run=run, failed=failed(db, run.id, pattern), downloaded=downloaded)
+
+
+def failed(db: DB, run_id: int, pattern: str) -> Optional[bool]:
+    """
+    Whether a test matching pattern failed in the run, or None if none of them
+    ran in it.
+    """
+    (any_failed,) = db.connection.execute(
+        f"""
+        select bool_or(not r.passed)
+        from result r
+        join test_case t using (test_id)
+        where r.run_id = {run_id} and not r.skipped
+            and (t.name glob ? or t.classname || '.' || t.name glob ?)
+        """,
+        [pattern, pattern],
+    ).fetchone()
+    return any_failed
+
+
+def _outcome(failed: Optional[bool]) -> str:
+    if failed is None:
+        return "[yellow]no results[/]"
+    return "[red]failed[/]" if failed else "[green]passed[/]"
@@ -0,0 +1,89 @@
+import asyncio
+from typing import Annotated, Optional
+
+import typer
+
+from tringa import cli, gh
+from tringa.cli import repo as _repo
+from tringa.cli.output import print_json_lines, tringa_print
+from tringa.cli.test import bisect as _bisect
+from tringa.cli.test import history as _history
+
+app = typer.Typer(rich_markup_mode="rich")
+
+PatternArgument = Annotated[
+    str,
+    typer.Argument(
+        help=(
+            "Test name, or `classname.name`. "
+            "May contain glob wildcards, e.g. `test_foo*`."
+        )
+    ),
+]
+
+
+@app.command()
+def bisect(
+    pattern: PatternArgument,
+    repo: _repo.RepoOption = None,
+    branch: Annotated[str, typer.Option(help="Branch whose runs to search.")] = "main",
+    max_runs: Annotated[
+        int,
+        typer.Option(help="Maximum number of the latest runs of the branch to search."),
+    ] = 2000,
+    workflow_id: Annotated[
+        Optional[int],
+        typer.Option(help="Search only the runs of the workflow that runs the tests."),
+    ] = None,
+) -> None:
+    """
+    Find the run of a branch in which matching tests started failing.
+
+    The branch's runs are listed, and the artifacts of only about log2 of them are
+    downloaded, in binary search order. Runs that are already stored are not
+    downloaded again. A run of another workflow has no results, so nothing is
+    stored for it, and it is downloaded again by each search: pass --workflow-id
+    to search only the runs of the workflow that runs the tests.
+    """
+    repo = _repo.resolve(repo)
+    runs = asyncio.run(
+        gh.runs(repo, cli.options.since, branch, workflow_id, limit=max_runs)
+    )
+    # gh lists runs newest first.
+    runs.reverse()
+    # The runs that are downloaded are published to a shared DB at once.
+    with cli.options.db_config.batch():
+        report = _bisect.make_report(
+            pattern, branch, runs, lambda run: _bisect.probe(run, pattern)
+        )
+    tringa_print(report)
+
+
+@app.command()
+def history(
+    pattern: PatternArgument,
+    repo: _repo.RepoOption = None,
+    limit: Annotated[
+        int,
+        typer.Option(help="Number of latest results to show for each test."),
+    ] = 200,
+) -> None:
+    """
+    Show the latest results of matching tests: status, duration, branch, SHA and run.
+
+    With --json, results are written as they are read, one JSON object per line.
+    """
+    repo = _repo.sync(repo)
+    with cli.options.db_config.connect(read_only=True) as db:
+        if cli.options.json:
+            print_json_lines(
+                _history.results(
+                    db, repo, pattern, limit, since=cli.options.window_start
+                )
+            )
+        else:
+            tringa_print(
+                _history.make_report(
+                    db, repo, pattern, limit, since=cli.options.window_start
+                )
+            )
@@ -0,0 +1,155 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Iterator, Optional
+
+import humanize
+from rich.console import Console, ConsoleOptions, RenderResult
+from rich.table import Table
+
+from tringa import scoped_db
+from tringa.cli import reports
+from tringa.db import DB
+from tringa.models import SerializableDict, run_url
+
+STATUS_STYLES = {"passed": "green", "failed": "red", "skipped": "yellow"}
+
+
+@dataclass
+class Result(reports.Report):
+    repo: str
+    classname: str
+    name: str
+    run_id: int
+    suite_time: Optional[datetime]
+    branch: str
+    sha: str
+    status: str
+    duration: float
+
+    @property
+    def run_url(self) -> str:
+        return run_url(self.repo, self.run_id)
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "repo": self.repo,
+            "classname": self.classname,
+            "name": self.name,
+            "run_id": self.run_id,
+            "run_url": self.run_url,
+            "time": self.suite_time.isoformat() if self.suite_time else None,
+            "branch": self.branch,
+            "sha": self.sha,
+            "status": self.status,
+            "duration": self.duration,
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        yield f"[{STATUS_STYLES[self.status]}]{self.name} {self.status}[/]"
+
+
+@dataclass
+class Report(reports.Report):
+    results: list[Result]
+
+    def to_dict(self) -> SerializableDict:
+        return {
+            "results": [r.to_dict() for r in self.results],
+        }
+
+    def __rich_console__(
+        self, console: Console, options: ConsoleOptions
+    ) -> RenderResult:
+        table = Table()
+        table.add_column("Test", style="blue")
+        table.add_column("Run")
+        table.add_column("Time")
+        table.add_column("Branch")
+        table.add_column("SHA")
+        table.add_column("Status")
+        table.add_column("Duration", justify="right")
+        for r in self.results:
+            table.add_row(
+                f"{r.classname}.{r.name}" if r.classname else r.name,
+                f"[link={r.run_url}]{r.run_id}[/link]",
+                humanize.naturaltime(r.suite_time) if r.suite_time else "",
+                r.branch,
+                r.sha[:8],
+                f"[{STATUS_STYLES[r.status]}]{r.status}[/]",
+                f"{r.duration:.1f}s",
+            )
+        yield table
+
+
+def results(
+    db: DB,
+    repo: str,
+    pattern: str,
+    limit: int,
+    since: Optional[date] = None,
+) -> Iterator[Result]:
+    """
+    Yield the latest `limit` results of each test in the repo matching pattern,
+    newest first.
+
+    The pattern is a glob matched against the test name, and against
+    `classname.name`. A test's history is found without scanning all results:
+    its daily rollups give the earliest day holding its latest results, and the
+    result table, being clustered by time, is read only from that day on.
+    """
+    test_ids = [
+        test_id
+        for (test_id,) in db.connection.execute(
+            """
+            select test_id from test_case
+            where repo = ? and (name glob ? or classname || '.' || name glob ?)
+            """,
+            [repo, pattern, pattern],
+        ).fetchall()
+    ]
+    if not test_ids:
+        return
+    # IDs are written into the SQL as literals, like the window's date, so that
+    # DuckDB can use them to skip row groups.
+    in_test_ids = f"test_id in ({', '.join(map(str, test_ids))})"
+    (start,) = db.fetchone(
+        f"""
+        select min(day) from (
+            select day, sum(runs) over (partition by test_id order by day desc) - runs
+                as later_runs
+            from test_daily
+            where {in_test_ids} and day is not null
+        )
+        where later_runs < {limit}
+        """
+    )
+    if since is not None:
+        start = max(start, since) if start is not None else since
+    in_window = scoped_db.in_window("suite_time", start)
+
+    cursor = db.connection.execute(
+        f"""
+        select
+            repo, classname, name, run_id, suite_time, branch, sha,
+            case when passed then 'passed' when skipped then 'skipped'
+                else 'failed' end,
+            duration
+        from test
+        where repo = '{repo}' and {in_test_ids} and {in_window}
+        qualify row_number() over (
+            partition by test_id order by suite_time desc nulls last
+        ) <= {limit}
+        order by classname, name, suite_time desc nulls last
+        """
+    )
+    while rows := cursor.fetchmany(1000):
+        for row in rows:
+            yield Result(*row)
+
+
+def make_report(
+    db: DB, repo: str, pattern: str, limit: int, since: Optional[date] = None
+) -> Report:
+    return Report(results=list(results(db, repo, pattern, limit, since)))
@@ -1,54 +1,346 @@
-from contextlib import contextmanager
-from dataclasses import dataclass
+import fcntl
+import hashlib
+import os
+import shutil
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import (
     Any,
+    Callable,
     Iterable,
     Iterator,
+    Mapping,
     Optional,
     Sequence,
 )
 
 import duckdb
-import pandas as pd
 
-from tringa.exceptions import TringaQueryException
+from tringa.exceptions import TringaException, TringaQueryException
 from tringa.models import TestResult
-from tringa.msg import debug
+from tringa.msg import debug, info
 
-CREATE_SCHEMA_SQL = """
-CREATE TABLE test (
+# Increment when a change to the schema means that existing DBs cannot be used.
+SCHEMA_VERSION = 11
+
+# Test data is stored in a fact table, `result`, that refers to dimension tables
+# by integer ids. The `test` view joins them back together, with one row per
+# test result.
+CREATE_SCHEMA_SQL = f"""
+CREATE TABLE meta (
+    key VARCHAR PRIMARY KEY,
+    value VARCHAR,
+);
+INSERT INTO meta VALUES ('schema_version', '{SCHEMA_VERSION}');
+-- Identifies the data in the DB: see DB.data_version.
+INSERT INTO meta VALUES ('db_id', uuid()::VARCHAR);
+INSERT INTO meta VALUES ('data_version', '0');
+
+CREATE TABLE run (
+    run_id INT64 PRIMARY KEY,
     repo VARCHAR,
-    artifact VARCHAR,
     branch VARCHAR,
-    run_id INT64,
     sha VARCHAR,
     pr INT64,
     pr_title VARCHAR,
+    -- The workflow that the run is of, if known.
+    workflow_id INT64,
+    workflow_name VARCHAR,
+    -- The number of runs that the run stands for, if it was synced as part of a
+    -- sample of the runs: see fetch.Sample. Otherwise 1.
+    weight DOUBLE DEFAULT 1,
+);
+
+CREATE TABLE artifact (
+    artifact_id UBIGINT PRIMARY KEY,  -- stable_hash(repo, name)
+    run_id INT64,
+    name VARCHAR,
+);
+
+CREATE TABLE suite (
+    suite_id UBIGINT PRIMARY KEY,  -- stable_hash(repo, file, name)
+    repo VARCHAR,
     file VARCHAR,
-    suite VARCHAR,
-    suite_time TIMESTAMP,
-    suite_duration FLOAT,
+    name VARCHAR,
+);
+
+CREATE TABLE test_case (
+    test_id UBIGINT PRIMARY KEY,  -- stable_hash(repo, classname, name)
+    repo VARCHAR,
     classname VARCHAR,
     name VARCHAR,
+);
+
+-- Failure messages and texts, stored once per distinct content. DuckDB
+-- compresses the content when it checkpoints the table.
+CREATE TABLE blob (
+    hash UBIGINT PRIMARY KEY,  -- stable_hash(content)
+    content VARCHAR USING COMPRESSION fsst,
+);
+
+-- An inverted index over blob content, maintained by DB.insert_rows: the
+-- number of occurrences of each token in each blob. See SEARCH_TOKEN_PATTERN.
+CREATE TABLE blob_token (
+    token_id UBIGINT,  -- stable_hash(token)
+    hash UBIGINT,
+    count INTEGER,
+);
+
+CREATE TABLE result (
+    run_id INT64,
+    artifact_id UBIGINT,
+    suite_id UBIGINT,
+    test_id UBIGINT,
+    suite_time TIMESTAMP,
+    suite_duration FLOAT,
     duration FLOAT,
     passed BOOLEAN,
     skipped BOOLEAN,
-    flaky BOOLEAN,
-    message VARCHAR,
-    text VARCHAR,
+    message_hash UBIGINT,
+    text_hash UBIGINT,
+    -- Failures with the same signature are taken to have the same cause: the
+    -- stable_hash of the failure's message, or of its text if it has no message,
+    -- normalized by normalize_failure_sql. NULL unless the test failed.
+    signature UBIGINT,
+    -- The numbers of attempts of the test in the run that passed and that
+    -- failed, including those superseded by this result: see below.
+    attempts_passed INTEGER,
+    attempts_failed INTEGER,
 
     -- A run may have multiple run attempts. The artifact name typically includes
     -- the run attempt number, in order to avoid artifact name conflicts. However,
     -- GitHub does not expose the run attempt number in the metadata associated with
-    -- an artifact, and we follow suite: i.e. we demand uniqueness on the following
-    -- tuple, which means that multiple artifacts for the same run may not coexist
-    -- in the table.
-    PRIMARY KEY (repo, run_id, file, suite, classname, name),
-
+    -- an artifact, and we follow suite: i.e. we demand uniqueness on
+    -- (run_id, suite_id, test_id), which means that multiple artifacts for the
+    -- same run may not coexist in the table. Run IDs are unique across repos, and
+    -- the suite and test IDs include the repo, so this is uniqueness on
+    -- (repo, run_id, file, suite, classname, name).
+    --
+    -- This is not declared as a constraint, since maintaining an index on every
+    -- insert is costly. Instead, the parser keeps only the latest attempt of each
+    -- test in a run, counting the outcomes of all of them, and DB.insert_rows
+    -- replaces runs as a whole.
+    --
     -- The following should be true also.
-    -- UNIQUE (repo, artifact, file, suite, classname, name)
+    -- UNIQUE (artifact_id, suite_id, test_id)
+);
+
+CREATE VIEW test AS
+SELECT
+    run.repo,
+    artifact.name AS artifact,
+    run.branch,
+    run_id,
+    run.sha,
+    run.pr,
+    run.pr_title,
+    suite.file,
+    suite.name AS suite,
+    result.suite_time,
+    result.suite_duration,
+    test_case.classname,
+    test_case.name,
+    result.duration,
+    result.passed,
+    result.skipped,
+    false AS flaky,
+    message_blob.content AS message,
+    text_blob.content AS text,
+    test_id,
+    result.message_hash,
+    result.text_hash,
+    result.signature,
+FROM result
+JOIN run USING (run_id)
+JOIN artifact USING (artifact_id)
+JOIN suite USING (suite_id)
+JOIN test_case USING (test_id)
+LEFT JOIN blob message_blob ON message_blob.hash = result.message_hash
+LEFT JOIN blob text_blob ON text_blob.hash = result.text_hash;
+
+-- Rollups of the result table, maintained by DB.insert_rows. Reports read these
+-- instead of the test table when their filters allow.
+
+-- Keyed by (test_id, day).
+CREATE TABLE test_daily (
+    test_id UBIGINT,
+    day DATE,
+    runs BIGINT,
+    passes BIGINT,
+    failures BIGINT,
+    skips BIGINT,
+    duration_sum DOUBLE,
+    duration_min FLOAT,
+    duration_max FLOAT,
+    passed_duration_max FLOAT,
+    failed_duration_max FLOAT,
+    -- Counts of durations in logarithmic buckets: see DURATION_SKETCH_BUCKET.
+    duration_sketch MAP(INTEGER, UBIGINT),
+);
+
+-- Keyed by run_id.
+CREATE TABLE run_summary (
+    repo VARCHAR,
+    run_id INT64,
+    branch VARCHAR,
+    sha VARCHAR,
+    pr INT64,
+    pr_title VARCHAR,
+    started_at TIMESTAMP,
+    tests BIGINT,
+    passes BIGINT,
+    failures BIGINT,
+    skips BIGINT,
+    duration DOUBLE,
+);
+
+-- Keyed by (run_id, artifact_id, suite_id).
+CREATE TABLE suite_summary (
+    repo VARCHAR,
+    run_id INT64,
+    artifact_id UBIGINT,
+    suite_id UBIGINT,
+    started_at TIMESTAMP,
+    tests BIGINT,
+    -- The sum of the durations of the suite's tests, and the duration of the
+    -- suite as reported by the test runner, which may include setup.
+    duration DOUBLE,
+    suite_duration DOUBLE,
 );
+
+-- Keyed by (test_id, sha): the outcomes of a test at a commit, over all runs, run
+-- attempts and matrix jobs. A test that both passed and failed at the same
+-- commit flipped there, which is the strongest evidence that it is flaky.
+CREATE TABLE sha_outcome (
+    test_id UBIGINT,
+    sha VARCHAR,
+    passes BIGINT,
+    failures BIGINT,
+    first_time TIMESTAMP,
+    last_time TIMESTAMP,
+);
+"""
+
+
+def stable_hash(*parts: str) -> int:
+    """
+    A 64-bit hash that does not depend on the DuckDB version, so that IDs agree
+    across DB files. Equal to the SQL expression returned by `stable_hash_sql`.
+    """
+    return int(hashlib.md5("\0".join(parts).encode()).hexdigest()[:16], 16)
+
+
+def stable_hash_sql(*columns: str) -> str:
+    return f"('0x' || md5(concat_ws(chr(0), {', '.join(columns)}))[:16])::UBIGINT"
+
+
+# Durations are sketched by counting them in buckets whose boundaries grow
+# geometrically, so that a quantile read from the sketch is within 1% of the
+# true value. Sketches of different days are merged by summing bucket counts.
+DURATION_SKETCH_GAMMA = 1.02
+DURATION_SKETCH_BUCKET = (
+    f"ceil(ln(greatest(duration, 0.001)) / ln({DURATION_SKETCH_GAMMA}))::INTEGER"
+)
+
+# Parts of a failure message or text that vary between occurrences of the same
+# failure, and their replacements: addresses, UUIDs, timestamps, temporary paths,
+# and numbers such as line numbers, ports and durations.
+FAILURE_NORMALIZATIONS = [
+    (r"0x[0-9a-fA-F]+", "<addr>"),
+    (
+        r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-"
+        r"[0-9a-fA-F]{12}",
+        "<uuid>",
+    ),
+    (
+        r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(\.\d+)?(Z|[+-]\d{2}:?\d{2})?",
+        "<time>",
+    ),
+    (r"(/private)?(/tmp|/var/folders|/var/tmp)/[^\s:'\"]*", "<tmp>"),
+    (r"\b\d+", "N"),
+    (r"\s+", " "),
+]
+
+
+def normalize_failure_sql(column: str) -> str:
+    """
+    SQL for the content of column, with the parts that vary between occurrences
+    of the same failure replaced by placeholders.
+    """
+    sql = column
+    for pattern, replacement in FAILURE_NORMALIZATIONS:
+        pattern = pattern.replace("'", "''")
+        sql = f"regexp_replace({sql}, '{pattern}', '{replacement}', 'g')"
+    return f"trim({sql})"
+
+
+# Tokens of blob content that are indexed for search, after lowercasing: words
+# and identifiers, such as exception and function names.
+SEARCH_TOKEN_PATTERN = "[a-z_][a-z0-9_]+"
+
+TEST_DAILY_SQL = f"""
+select
+    test_id,
+    suite_time::DATE as day,
+    count(*) as runs,
+    count(*) filter (where passed) as passes,
+    count(*) filter (where not passed and not skipped) as failures,
+    count(*) filter (where skipped) as skips,
+    sum(duration) as duration_sum,
+    min(duration) as duration_min,
+    max(duration) as duration_max,
+    max(duration) filter (where passed) as passed_duration_max,
+    max(duration) filter (where not passed and not skipped) as failed_duration_max,
+    histogram({DURATION_SKETCH_BUCKET}) as duration_sketch
+from {{source}}
+group by test_id, day
+"""
+
+RUN_SUMMARY_SQL = """
+select
+    repo,
+    run_id,
+    any_value(branch) as branch,
+    any_value(sha) as sha,
+    any_value(pr) as pr,
+    any_value(pr_title) as pr_title,
+    min(suite_time) as started_at,
+    count(*) as tests,
+    count(*) filter (where passed) as passes,
+    count(*) filter (where not passed and not skipped) as failures,
+    count(*) filter (where skipped) as skips,
+    sum(duration) as duration
+from {source}
+group by repo, run_id
+"""
+
+SUITE_SUMMARY_SQL = """
+select
+    run.repo,
+    run_id,
+    artifact_id,
+    suite_id,
+    min(suite_time) as started_at,
+    count(*) as tests,
+    sum(duration) as duration,
+    max(suite_duration) as suite_duration
+from {source}
+join run using (run_id)
+group by run.repo, run_id, artifact_id, suite_id
+"""
+
+SHA_OUTCOME_SQL = """
+select
+    test_id,
+    run.sha,
+    sum(attempts_passed) as passes,
+    sum(attempts_failed) as failures,
+    min(suite_time) as first_time,
+    max(suite_time) as last_time
+from {source}
+join run using (run_id)
+group by test_id, run.sha
 """
 
 
@@ -56,35 +348,386 @@ CREATE TABLE test (
 class DB:
     connection: duckdb.DuckDBPyConnection
     path: Optional[Path]
+    # True if the tables visible through the connection are restricted to a
+    # scope by scoped_db.
+    scoped: bool = False
+    # Recreates the connection-local state of the connection, such as the views
+    # of a scope, on a cursor: see DB.cursor.
+    setup_cursor: Optional[Callable[["DB"], None]] = field(
+        default=None, repr=False, compare=False
+    )
 
     @staticmethod
     @contextmanager
-    def _connect(path: Optional[Path]) -> Iterator[duckdb.DuckDBPyConnection]:
-        yield duckdb.connect(str(path)) if path else duckdb.connect()
+    def _connect(
+        path: Optional[Path], read_only: bool = False
+    ) -> Iterator[duckdb.DuckDBPyConnection]:
+        conn = (
+            duckdb.connect(str(path), read_only=read_only) if path else duckdb.connect()
+        )
+        try:
+            yield conn
+        finally:
+            conn.close()
 
     def create_schema(self) -> None:
         self.connection.execute(CREATE_SCHEMA_SQL)
 
-    def insert_rows(self, rows: Iterable[TestResult]) -> None:
+    def check_schema(self) -> None:
+        try:
+            (version,) = self.fetchone(
+                "SELECT value FROM meta WHERE key = 'schema_version'"
+            )
+        except (duckdb.CatalogException, TringaQueryException):
+            version = None
+        if version != str(SCHEMA_VERSION):
+            raise TringaException(
+                f"{self} was created by an incompatible version of tringa. "
+                "Use `tringa dropdb` to delete it."
+            )
+
+    def insert_rows(
+        self,
+        rows: Iterable[TestResult],
+        run_weights: Optional[Mapping[int, float]] = None,
+    ) -> None:
+        """
+        Insert test results, replacing any stored results of the same runs.
+
+        The rows must hold all results of each run that they contain, with at
+        most one result per (file, suite, classname, name) in a run, as kept by
+        fetch._latest_attempts. Runs are stored with their weights in run_weights,
+        or with weight 1.
+        """
         # Inserting columns from a dataframe is more efficient than inserting
-        # rows from a SQL INSERT statement.
+        # rows from a SQL INSERT statement. pandas is imported here since it is
+        # slow to import, and commands that only read the DB do not need it.
+        import pandas as pd
+
         n_rows = str(len(rows)) if isinstance(rows, Sequence) else "<iterator>"
 
         df = pd.DataFrame(rows)
         if df.empty:
             return
+        weights = run_weights or {}
+        weights_df = pd.DataFrame(
+            {
+                "run_id": pd.Series(list(weights.keys()), dtype="int64"),
+                "weight": pd.Series(list(weights.values()), dtype="float64"),
+            }
+        )
         debug(f"Inserting {n_rows} rows into {self}")
-        # Sort by time so that rows from later run attempts (that match on the
-        # uniqueness constraints) replace those from earlier run attempts.
+        with self.transaction():
+            self.connection.execute(
+                f"""
+                CREATE OR REPLACE TEMP TABLE _batch AS
+                SELECT
+                    * EXCLUDE (
+                        test_id, message_hash, text_hash, signature,
+                        attempts_passed, attempts_failed
+                    ),
+                    coalesce(attempts_passed::INTEGER, passed::INTEGER)
+                        AS attempts_passed,
+                    coalesce(
+                        attempts_failed::INTEGER, (NOT passed AND NOT skipped)::INTEGER
+                    ) AS attempts_failed,
+                    {stable_hash_sql("repo", "artifact")} AS artifact_id,
+                    {stable_hash_sql("repo", "file", "suite")} AS suite_id,
+                    {stable_hash_sql("repo", "classname", "name")} AS test_id,
+                    CASE WHEN message IS NOT NULL
+                        THEN {stable_hash_sql("message")} END AS message_hash,
+                    CASE WHEN text IS NOT NULL
+                        THEN {stable_hash_sql("text")} END AS text_hash,
+                FROM df;
+                """
+            )
+            self._touch_runs(runs="_batch", results="_batch")
+            self.connection.execute(
+                """
+                INSERT OR REPLACE INTO run
+                SELECT DISTINCT ON (run_id)
+                    run_id, repo, branch, sha, pr, pr_title, workflow_id,
+                    workflow_name, coalesce(w.weight, 1)
+                FROM _batch
+                LEFT JOIN weights_df w USING (run_id);
+
+                -- An artifact name is usually shared by the runs of a workflow, so
+                -- the artifact row records one of them.
+                INSERT OR IGNORE INTO artifact
+                SELECT DISTINCT ON (artifact_id) artifact_id, run_id, artifact
+                FROM _batch;
+
+                INSERT OR IGNORE INTO suite
+                SELECT DISTINCT suite_id, repo, file, suite FROM _batch;
+
+                INSERT OR IGNORE INTO test_case
+                SELECT DISTINCT test_id, repo, classname, name FROM _batch;
+                """
+            )
+            self.connection.execute(
+                f"""
+                -- Each distinct failure message or text is normalized once.
+                CREATE OR REPLACE TEMP TABLE _signature AS
+                SELECT hash, {stable_hash_sql(normalize_failure_sql("content"))}
+                    AS signature
+                FROM (
+                    SELECT DISTINCT ON (hash)
+                        coalesce(message_hash, text_hash) AS hash,
+                        coalesce(message::VARCHAR, text::VARCHAR) AS content
+                    FROM _batch
+                    WHERE NOT passed AND NOT skipped
+                )
+                WHERE hash IS NOT NULL;
+
+                DELETE FROM result WHERE run_id IN (SELECT run_id FROM _touched_runs);
+                -- Results are appended in time order, so that the table stays
+                -- roughly clustered by time: see scoped_db.connect.
+                INSERT INTO result
+                SELECT
+                    run_id, artifact_id, suite_id, test_id, suite_time, suite_duration,
+                    duration, passed, skipped, message_hash, text_hash,
+                    CASE WHEN NOT passed AND NOT skipped THEN signature END,
+                    attempts_passed, attempts_failed,
+                FROM _batch
+                LEFT JOIN _signature
+                ON _signature.hash = coalesce(message_hash, text_hash)
+                ORDER BY suite_time;
+
+                DROP TABLE _signature;
+                """
+            )
+            self.insert_blobs(
+                """
+                (SELECT message_hash AS hash, message AS content FROM _batch
+                 UNION ALL
+                 SELECT text_hash, text FROM _batch)
+                """
+            )
+            self.connection.execute("DROP TABLE _batch")
+            self._update_rollups()
+            self.increment_data_version()
+
+    def insert_blobs(self, source: str) -> None:
+        """
+        Insert the blobs of source, a relation of (hash, content), that are not
+        already stored, and add them to the search index.
+        """
+        self.connection.execute(
+            f"""
+            CREATE OR REPLACE TEMP TABLE _new_blob AS
+            SELECT DISTINCT ON (hash) hash, content::VARCHAR AS content FROM {source}
+            WHERE hash IS NOT NULL AND hash NOT IN (SELECT hash FROM blob);
+
+            INSERT INTO blob SELECT hash, content FROM _new_blob;
+
+            -- Tokens are counted per blob, and hashed once per distinct token.
+            CREATE OR REPLACE TEMP TABLE _blob_token AS
+            SELECT token, hash, count(*)::INTEGER AS count FROM (
+                SELECT hash, unnest(
+                    regexp_extract_all(lower(content), '{SEARCH_TOKEN_PATTERN}')
+                ) AS token
+                FROM _new_blob
+            )
+            GROUP BY token, hash;
+
+            INSERT INTO blob_token
+            SELECT token_id, hash, count FROM _blob_token
+            JOIN (
+                SELECT token, {stable_hash_sql("token")} AS token_id
+                FROM (SELECT DISTINCT token FROM _blob_token)
+            ) USING (token);
+
+            DROP TABLE _new_blob;
+            DROP TABLE _blob_token;
+            """
+        )
+
+    @contextmanager
+    def replacing_runs(self, runs: str, results: str) -> Iterator[None]:
+        """
+        Update the rollups for a block that replaces the stored results of the runs
+        in runs, a relation with run_id and sha columns, by results, a relation
+        with run_id, test_id and suite_time columns.
+        """
+        self._touch_runs(runs, results)
+        yield
+        self._update_rollups()
+
+    def _touch_runs(self, runs: str, results: str) -> None:
+        # The rollup partitions touched by replacing the runs: those of the new
+        # rows, and those of the rows that they replace.
         self.connection.execute(
+            f"""
+            CREATE OR REPLACE TEMP TABLE _touched_runs AS
+            SELECT DISTINCT run_id FROM {runs};
+
+            CREATE OR REPLACE TEMP TABLE _touched_days AS
+            SELECT DISTINCT test_id, suite_time::DATE AS day FROM {results}
+            UNION
+            SELECT DISTINCT test_id, suite_time::DATE FROM result
+            JOIN _touched_runs USING (run_id);
+
+            CREATE OR REPLACE TEMP TABLE _touched_shas AS
+            SELECT DISTINCT sha FROM {runs}
+            UNION
+            SELECT sha FROM run JOIN _touched_runs USING (run_id);
             """
-            INSERT OR REPLACE INTO test
-            SELECT DISTINCT ON (repo, run_id, file, suite, classname, name) *
-            FROM df
-            ORDER BY repo, run_id, file, suite, classname, name, suite_time DESC
+        )
+
+    def _update_rollups(self) -> None:
+        # Rollup partitions touched by the batch are recomputed from the result
+        # table. The time range predicate lets DuckDB skip row groups that cannot
+        # contain the touched days.
+        lo, hi, has_null_day = self.fetchone(
+            "SELECT min(day), max(day), bool_or(day IS NULL) FROM _touched_days"
+        )
+        time_range = (
+            f"suite_time >= '{lo}' AND suite_time < DATE '{hi}' + 1"
+            if lo is not None
+            else "false"
+        )
+        if has_null_day:
+            time_range = f"({time_range} OR suite_time IS NULL)"
+        touched_result_rows = f"""
+            (SELECT result.* FROM result
+             JOIN _touched_days t
+             ON result.test_id = t.test_id
+             AND result.suite_time::DATE IS NOT DISTINCT FROM t.day
+             WHERE {time_range})
+        """
+        # A commit's results may be in runs outside the batch, such as those of
+        # other workflows, or of a branch pushed earlier.
+        touched_sha_rows = """
+            (SELECT * FROM result WHERE run_id IN (
+                SELECT run_id FROM run WHERE sha IN (SELECT sha FROM _touched_shas)
+            ))
+        """
+        self.connection.execute(
+            f"""
+            DELETE FROM test_daily WHERE EXISTS (
+                SELECT 1 FROM _touched_days t
+                WHERE t.test_id = test_daily.test_id
+                AND t.day IS NOT DISTINCT FROM test_daily.day
+            );
+            INSERT INTO test_daily {TEST_DAILY_SQL.format(source=touched_result_rows)};
+
+            DELETE FROM run_summary
+            WHERE run_id IN (SELECT run_id FROM _touched_runs);
+            INSERT INTO run_summary {RUN_SUMMARY_SQL.format(
+                source="(SELECT * FROM test WHERE run_id IN (SELECT run_id FROM _touched_runs))"
+            )};
+
+            DELETE FROM suite_summary
+            WHERE run_id IN (SELECT run_id FROM _touched_runs);
+            INSERT INTO suite_summary {SUITE_SUMMARY_SQL.format(
+                source="(SELECT * FROM result WHERE run_id IN (SELECT run_id FROM _touched_runs))"
+            )};
+
+            DELETE FROM sha_outcome WHERE sha IN (SELECT sha FROM _touched_shas);
+            INSERT INTO sha_outcome {SHA_OUTCOME_SQL.format(source=touched_sha_rows)};
+
+            DROP TABLE _touched_runs;
+            DROP TABLE _touched_days;
+            DROP TABLE _touched_shas;
+            """
+        )
+
+    def rebuild_rollups(self) -> None:
+        self.connection.execute(
+            f"""
+            DELETE FROM test_daily;
+            INSERT INTO test_daily {TEST_DAILY_SQL.format(source="result")};
+            DELETE FROM run_summary;
+            INSERT INTO run_summary {RUN_SUMMARY_SQL.format(source="test")};
+            DELETE FROM suite_summary;
+            INSERT INTO suite_summary {SUITE_SUMMARY_SQL.format(source="result")};
+            DELETE FROM sha_outcome;
+            INSERT INTO sha_outcome {SHA_OUTCOME_SQL.format(source="result")};
             """
         )
 
+    def blobs(self, hashes: Iterable[int]) -> dict[int, str]:
+        """
+        Fetch the content of failure messages and texts by hash.
+        """
+        hashes = list(hashes)
+        if not hashes:
+            return {}
+        return dict(
+            self.connection.execute(
+                "SELECT hash, content FROM blob WHERE hash IN (SELECT unnest(?))",
+                [hashes],
+            ).fetchall()
+        )
+
+    def increment_data_version(self) -> None:
+        """
+        Record that the data has changed. Call this in the transaction that changes
+        it.
+        """
+        self.connection.execute(
+            """
+            UPDATE meta SET value = (value::BIGINT + 1)::VARCHAR
+            WHERE key = 'data_version'
+            """
+        )
+
+    @property
+    def data_version(self) -> tuple[str, int]:
+        """
+        The (db_id, version) of the data in the DB. The version is incremented by
+        each insert, and db_id is new for each DB file that is created, so that the
+        data is unchanged for as long as data_version is.
+        """
+        (db_id, version) = self.fetchone(
+            """
+            SELECT
+                any_value(value) FILTER (WHERE key = 'db_id'),
+                any_value(value) FILTER (WHERE key = 'data_version'),
+            FROM meta
+            """
+        )
+        return (db_id, int(version))
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        self.connection.begin()
+        try:
+            yield
+        except BaseException:
+            self.connection.rollback()
+            raise
+        else:
+            self.connection.commit()
+
+    @contextmanager
+    def cursor(self) -> Iterator["DB"]:
+        """
+        Another connection to the same DB, on which queries can run concurrently
+        with those on this one, e.g. from another thread. Temp tables and views
+        are local to a connection, so those of a scope are recreated on it.
+        """
+        cursor = DB(
+            self.connection.cursor(),
+            self.path,
+            scoped=self.scoped,
+            setup_cursor=self.setup_cursor,
+        )
+        try:
+            if self.setup_cursor is not None:
+                self.setup_cursor(cursor)
+            yield cursor
+        finally:
+            cursor.connection.close()
+
+    @property
+    def catalog(self) -> str:
+        """
+        Name of the database holding the stored tables. Use it to refer to a stored
+        table that is shadowed by a scoped view of the same name.
+        """
+        return self.connection.execute("SELECT current_database()").fetchone()[0]  # type: ignore
+
     def fetchone(self, sql: str) -> Any:
         rows = self.connection.execute(sql).fetchall()
         if not rows:
@@ -100,12 +743,128 @@ class DB:
 @dataclass
 class DBConfig:
     path: Optional[Path]
+    # A shared DB may be used by several tringa processes at once. Readers open a
+    # read-only snapshot of the DB. Writers take turns to write to a staging copy
+    # of the DB, which atomically replaces it when they are done. Thus readers
+    # never wait for, or conflict with, a writer.
+    shared: bool = False
+    # The writes of a batch, and the staging copy that they are made to, if the
+    # DB is shared: see DBConfig.batch.
+    _batch: Optional[ExitStack] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _staging: Optional[DB] = field(default=None, init=False, repr=False, compare=False)
 
     @contextmanager
-    def connect(self) -> Iterator[DB]:
-        new_db = not self.path or not self.path.exists()
-        with DB._connect(self.path) as conn:
-            db = DB(conn, self.path)
+    def connect(self, read_only: bool = False) -> Iterator[DB]:
+        """
+        Connect to the DB. A read-only connection is a snapshot if the DB is shared;
+        otherwise it may still be used to write.
+        """
+        if not (self.shared and self.path):
+            with self._connect(self.path) as db:
+                yield db
+        elif self._batch is not None and (self._staging is not None or not read_only):
+            # In a batch, connections are to the staging copy once it has been
+            # written to, so that reads see the batch's writes.
+            if self._staging is None:
+                self._staging = self._batch.enter_context(self._stage())
+            with self._staging.cursor() as db:
+                yield db
+        elif read_only and self.path.exists():
+            with self._connect(self.path, read_only=True) as db:
+                yield db
+        else:
+            with self.batch():
+                with self.connect() as db:
+                    yield db
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """
+        Publish the writes to a shared DB made in the block at once, at its end,
+        rather than copying the DB for each of them. The writer lock is taken at
+        the first write, and held until the end of the block.
+        """
+        if not (self.shared and self.path) or self._batch is not None:
+            yield
+            return
+        with ExitStack() as batch:
+            # The staging copy, if any, is published as the stack unwinds, and
+            # then the batch is over.
+            batch.callback(self._end_batch)
+            self._batch = batch
+            yield
+
+    def _end_batch(self) -> None:
+        self._batch = None
+        self._staging = None
+
+    @contextmanager
+    def _stage(self) -> Iterator[DB]:
+        """
+        Copy the DB to a staging file, and replace the DB with it when done.
+        """
+        assert self.path is not None
+        wal_path = _wal(self.path)
+        with self.write_lock():
+            staging_path = self.path.with_name(f"{self.path.name}.staging")
+            _remove_db_file(staging_path)
+            if self.path.exists():
+                shutil.copyfile(self.path, staging_path)
+                # A write-ahead log next to the DB holds writes that were not
+                # checkpointed, e.g. by a process that crashed while using the DB
+                # without --shared. It is replayed into the staging copy.
+                if wal_path.exists():
+                    info(f"Recovering uncheckpointed writes from {wal_path}")
+                    shutil.copyfile(wal_path, _wal(staging_path))
+            with self._connect(staging_path) as db:
+                yield db
+                db.connection.execute("CHECKPOINT")
+            debug(f"Publishing {staging_path} to {self.path}")
+            # The log is removed before the DB is replaced, so that it is never
+            # replayed into the copy that already holds its writes.
+            wal_path.unlink(missing_ok=True)
+            os.replace(staging_path, self.path)
+
+    @contextmanager
+    def write_lock(self) -> Iterator[None]:
+        """
+        Wait for other writers to finish, if the DB is shared.
+        """
+        if not (self.shared and self.path):
+            yield
+            return
+        with open(self.path.with_name(f"{self.path.name}.lock"), "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                info(
+                    f"Waiting for another tringa process to finish writing {self.path}"
+                )
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    @contextmanager
+    def _connect(path: Optional[Path], read_only: bool = False) -> Iterator[DB]:
+        new_db = not path or not path.exists()
+        with DB._connect(path, read_only) as conn:
+            db = DB(conn, path)
             if new_db:
                 db.create_schema()
+            else:
+                db.check_schema()
             yield db
+
+
+def _remove_db_file(path: Path) -> None:
+    path.unlink(missing_ok=True)
+    _wal(path).unlink(missing_ok=True)
+
+
+def _wal(path: Path) -> Path:
+    return path.with_name(f"{path.name}.wal")
@@ -1,23 +1,39 @@
 import asyncio
 import concurrent.futures
+import math
 import tempfile
 import xml.etree.ElementTree
 import xml.sax
-from collections import namedtuple
+from collections import Counter, defaultdict, namedtuple
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from itertools import chain
 from pathlib import Path
-from typing import AsyncIterator, Iterator, List, Optional, TypedDict
+from typing import (
+    AsyncIterator,
+    Callable,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TypedDict,
+)
 
 import junitparser.xunit2 as jup
 
 from tringa import cli, gh
-from tringa.db import TestResult
+from tringa.db import TestResult, stable_hash
 from tringa.models import PR, Run
-from tringa.msg import debug, warn
+from tringa.msg import debug, info, warn
 from tringa.utils import async_iterator_to_list
 
 
+# The number of the latest runs of a branch that are listed when looking for
+# those with test results.
+LATEST_RUNS_LIMIT = 50
+
+
 class Artifact(TypedDict):
     repo: str
     name: str
@@ -28,20 +44,111 @@ class Artifact(TypedDict):
     commit: str
 
 
+@dataclass(frozen=True)
+class Shard:
+    """
+    Shard `index` (1-based) of `count` disjoint shards of the runs of a repo.
+
+    Runs are assigned to shards by a hash of the run ID, so every host syncing a
+    shard agrees on the assignment without coordinating.
+    """
+
+    index: int
+    count: int
+
+    @staticmethod
+    def parse(value: str) -> "Shard":
+        try:
+            index, count = map(int, value.split("/"))
+        except ValueError:
+            raise ValueError(f"Expected i/N, e.g. 1/4, but got {value!r}")
+        if not 1 <= index <= count:
+            raise ValueError(f"Shard index must be between 1 and {count}: {value!r}")
+        return Shard(index, count)
+
+    def __contains__(self, run_id: int) -> bool:
+        return stable_hash(str(run_id)) % self.count == self.index - 1
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+
+@dataclass(frozen=True)
+class Sample:
+    """
+    A sample of the runs of a repo, for estimating rates such as failure rates
+    without downloading the artifacts of every run.
+
+    Runs are sampled in two phases. First, at most max_runs_per_branch runs of
+    each branch are kept. Then the kept runs are stratified by workflow and day,
+    and `fraction` of each stratum, rounded up, is sampled. Within a branch or
+    stratum, runs are taken in order of a hash of the run ID, so that every host
+    samples the same runs without coordinating.
+    """
+
+    fraction: float = 1.0
+    max_runs_per_branch: Optional[int] = None
+
+    def weights(self, runs: Iterable[Run]) -> dict[int, float]:
+        """
+        The IDs of the sampled runs, with their weights: the number of runs that
+        each of them stands for, which is the inverse of the probability that it
+        was sampled.
+        """
+
+        def take(
+            runs: Iterable[Run], key: Callable[[Run], Hashable], n: Callable[[int], int]
+        ) -> dict[int, float]:
+            strata: dict[Hashable, list[Run]] = defaultdict(list)
+            for run in runs:
+                strata[key(run)].append(run)
+            weights = {}
+            for stratum in strata.values():
+                stratum.sort(key=lambda run: stable_hash(str(run.id)))
+                k = min(n(len(stratum)), len(stratum))
+                for run in stratum[:k]:
+                    weights[run.id] = len(stratum) / k
+            return weights
+
+        runs = {run.id: run for run in runs}
+        branch_weights = take(
+            runs.values(),
+            key=lambda run: run.branch,
+            n=lambda size: self.max_runs_per_branch or size,
+        )
+        stratum_weights = take(
+            [runs[run_id] for run_id in branch_weights],
+            key=lambda run: (
+                run.workflow_id,
+                run.created_at.date() if run.created_at else None,
+            ),
+            n=lambda size: math.ceil(self.fraction * size),
+        )
+        return {
+            run_id: branch_weights[run_id] * weight
+            for run_id, weight in stratum_weights.items()
+        }
+
+
 def fetch_data_for_repo(
     repo: str,
     since: timedelta,
     branch: Optional[str] = None,
     workflow_id: Optional[int] = None,
+    shard: Optional[Shard] = None,
+    skip_run_ids: Iterable[int] = (),
+    sample: Optional[Sample] = None,
 ) -> None:
+    fetcher = Fetcher(shard, skip_run_ids, sample)
     if branch:
-        rows = Fetcher()._fetch_and_parse_artifacts_for_branch(
+        rows = fetcher._fetch_and_parse_artifacts_for_branch(
             repo, since, branch, workflow_id
         )
     else:
-        rows = Fetcher()._fetch_and_parse_artifacts_for_repo(repo, since)
+        rows = fetcher._fetch_and_parse_artifacts_for_repo(repo, since)
+    rows = async_iterator_to_list(rows)
     with cli.options.db_config.connect() as db:
-        db.insert_rows(async_iterator_to_list(rows))
+        db.insert_rows(rows, run_weights=fetcher.run_weights)
 
 
 def fetch_data_for_pr(pr: PR) -> None:
@@ -53,6 +160,35 @@ def fetch_data_for_pr(pr: PR) -> None:
             db.insert_rows(rows)
 
 
+def fetch_data_for_run(run: Run) -> None:
+    with cli.console.status(f"Fetching XML artifacts for run {run.id}"):
+        rows = asyncio.run(Fetcher()._fetch_and_parse_artifacts_for_run(run))
+        with cli.options.db_config.connect() as db:
+            db.insert_rows(rows)
+
+
+def fetch_latest_runs_for_branch(repo: str, branch: str, n_runs: int) -> None:
+    """
+    Fetch the latest n_runs completed runs of the branch that have test results,
+    and no others. Runs that are already stored count towards n_runs.
+    """
+    with cli.options.db_config.connect(read_only=True) as db:
+        stored_run_ids = {
+            run_id
+            for (run_id,) in db.connection.execute(
+                "select run_id from run where repo = ? and branch = ?", [repo, branch]
+            ).fetchall()
+        }
+    with cli.console.status(f"Fetching the latest runs of {branch}"):
+        rows = asyncio.run(
+            Fetcher(skip_run_ids=stored_run_ids)._fetch_and_parse_latest_runs(
+                repo, branch, n_runs, stored_run_ids
+            )
+        )
+        with cli.options.db_config.connect() as db:
+            db.insert_rows(rows)
+
+
 class Fetcher:
     """
     Fetch, parse, and load test data from junit XML artifacts from GitHub CI.
@@ -61,17 +197,44 @@ class Fetcher:
     fetches from the GitHub API, and one for parsing the XML.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        shard: Optional[Shard] = None,
+        skip_run_ids: Iterable[int] = (),
+        sample: Optional[Sample] = None,
+    ):
         self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
         self.artifact_globs = cli.options.artifact_globs
+        # If set, artifacts are downloaded only for runs in this shard.
+        self.shard = shard
+        # A run may be listed more than once, e.g. for PRs with the same branch name.
+        # Runs in skip_run_ids, e.g. those already stored, are treated as fetched.
+        self.fetched_run_ids: set[int] = set(skip_run_ids)
+        # If set, artifacts are downloaded only for a sample of the runs, and the
+        # weight of each sampled run is recorded, to be stored with it.
+        self.sample = sample
+        self.run_weights: dict[int, float] = {}
 
     async def _fetch_and_parse_artifacts_for_repo(
         self, repo: str, since: timedelta
     ) -> AsyncIterator[TestResult]:
         prs = await gh.prs(repo, since=since)
-        for test_results_fut in asyncio.as_completed(
-            self._fetch_and_parse_artifacts_for_pr(pr, since) for pr in prs
-        ):
+        if self.sample is None:
+            fetches = [self._fetch_and_parse_artifacts_for_pr(pr, since) for pr in prs]
+        else:
+            # The strata of a sample span PRs, so the runs of all PRs are listed
+            # before any are sampled.
+            runs_of_prs = await asyncio.gather(
+                *[gh.runs_via_workflows(pr.repo, since, pr.branch) for pr in prs]
+            )
+            pr_runs = [(run, pr) for pr, runs in zip(prs, runs_of_prs) for run in runs]
+            sampled = {run.id for run in self._sampled([run for run, _ in pr_runs])}
+            fetches = [
+                self._fetch_and_parse_artifacts_for_run(run, pr)
+                for run, pr in pr_runs
+                if run.id in sampled
+            ]
+        for test_results_fut in asyncio.as_completed(fetches):
             for test_result in await test_results_fut:
                 yield test_result
 
@@ -82,7 +245,7 @@ class Fetcher:
         branch: str,
         workflow_id: Optional[int] = None,
     ) -> AsyncIterator[TestResult]:
-        runs = await gh.runs(repo, since, branch, workflow_id)
+        runs = self._sampled(await gh.runs(repo, since, branch, workflow_id))
 
         for test_results_fut in asyncio.as_completed(
             self._fetch_and_parse_artifacts_for_run(run) for run in runs
@@ -90,6 +253,35 @@ class Fetcher:
             for test_result in await test_results_fut:
                 yield test_result
 
+    async def _fetch_and_parse_latest_runs(
+        self, repo: str, branch: str, n_runs: int, stored_run_ids: set[int]
+    ) -> list[TestResult]:
+        # Some runs, e.g. those of workflows that do not run tests, have no test
+        # artifacts. The latest runs are tried n_runs at a time, newest first (the
+        # order in which they are listed), until n_runs runs with test results
+        # have been found.
+        runs = await gh.runs(repo, cli.options.since, branch, limit=LATEST_RUNS_LIMIT)
+        rows: list[TestResult] = []
+        found = 0
+        while runs and found < n_runs:
+            batch, runs = runs[: n_runs - found], runs[n_runs - found :]
+            found += sum(1 for run in batch if run.id in stored_run_ids)
+            for run_rows in await asyncio.gather(
+                *[self._fetch_and_parse_artifacts_for_run(run) for run in batch]
+            ):
+                if run_rows:
+                    rows.extend(run_rows)
+                    found += 1
+        return rows
+
+    def _sampled(self, runs: list[Run]) -> list[Run]:
+        if self.sample is None:
+            return runs
+        weights = self.sample.weights(runs)
+        self.run_weights.update(weights)
+        info(f"Sampled {len(weights)} of {len({run.id for run in runs})} runs")
+        return [run for run in runs if run.id in weights]
+
     async def _fetch_and_parse_artifacts_for_pr(
         self, pr: gh.PR, since: timedelta
     ) -> list[TestResult]:
@@ -108,6 +300,12 @@ class Fetcher:
     async def _fetch_and_parse_artifacts_for_run(
         self, run: Run, pr: Optional[PR] = None
     ) -> List[TestResult]:
+        if run.id in self.fetched_run_ids:
+            return []
+        self.fetched_run_ids.add(run.id)
+        if self.shard is not None and run.id not in self.shard:
+            debug(f"Skipping run {run.id}: not in shard {self.shard}")
+            return []
         with tempfile.TemporaryDirectory() as dir:
             dir = Path(dir)
             if not await gh.run_download(run, dir, patterns=self.artifact_globs):
@@ -134,7 +332,47 @@ def _parse_artifacts_for_run(
                 assert file.is_file()
                 yield from _parse_xml_file(artifact_name, file, run, pr)
 
-    return list(test_results())
+    return _latest_attempts(test_results())
+
+
+def _latest_attempts(test_results: Iterable[TestResult]) -> List[TestResult]:
+    """
+    Keep one result per test in a run: the one from the latest run attempt.
+
+    Run attempts are not identified in the artifact metadata, so the latest
+    attempt is the one with the latest suite time.
+
+    The outcomes of all attempts are counted in the result that is kept, so that
+    a test that passed in one attempt and failed in another, or in one matrix job
+    and not in another, is seen to have flipped: see annotations.flaky. Each
+    attempt and matrix job uploads its own artifact.
+    """
+    latest: dict[tuple[str, str, str, str], TestResult] = {}
+    # Whether each test passed, and whether it failed, in each artifact.
+    outcomes: dict[tuple[tuple[str, str, str, str], str], tuple[bool, bool]] = {}
+    for tr in test_results:
+        key = (tr.file, tr.suite, tr.classname, tr.name)
+        if (prev := latest.get(key)) is None or (
+            tr.suite_time is not None
+            and (prev.suite_time is None or tr.suite_time > prev.suite_time)
+        ):
+            latest[key] = tr
+        passed, failed = outcomes.get((key, tr.artifact), (False, False))
+        outcomes[(key, tr.artifact)] = (
+            passed or tr.passed,
+            failed or not (tr.passed or tr.skipped),
+        )
+    attempts_passed: Counter[tuple[str, str, str, str]] = Counter()
+    attempts_failed: Counter[tuple[str, str, str, str]] = Counter()
+    for (key, _), (passed, failed) in outcomes.items():
+        attempts_passed[key] += passed
+        attempts_failed[key] += failed
+    return [
+        tr._replace(
+            attempts_passed=attempts_passed[key], attempts_failed=attempts_failed[key]
+        )
+        for key, tr in latest.items()
+    ]
 
 
 def _parse_xml_file(
@@ -182,6 +420,8 @@ def _parse_xml_file(
                         skipped=test_case.is_skipped,
                         message=result.message,
                         text=text,
+                        workflow_id=run.workflow_id,
+                        workflow_name=run.workflow_name,
                     )
     except (xml.etree.ElementTree.ParseError, xml.sax.SAXParseException) as e:
         warn(f"Skipping malformed XML file {file}: {e}")
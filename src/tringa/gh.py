@@ -35,7 +35,8 @@ async def prs(repo: str, since: timedelta) -> list[PR]:
         "pr",
         "list",
         "--json",
-        "headRefName,headRepository,headRepositoryOwner,title,number,statusCheckRollup",
+        "headRefName,baseRefName,headRepository,headRepositoryOwner,title,number,"
+        "statusCheckRollup",
     ]
     if since is not None:
         then = datetime.now() - since
@@ -51,7 +52,8 @@ async def pr(pr_identifier: Optional[str] = None, repo: Optional[str] = None) ->
         "pr",
         "view",
         "--json",
-        "headRefName,headRepository,headRepositoryOwner,title,number,statusCheckRollup",
+        "headRefName,baseRefName,headRepository,headRepositoryOwner,title,number,"
+        "statusCheckRollup",
     ]
     if pr_identifier is not None:
         cmd.append(pr_identifier)
@@ -66,6 +68,7 @@ def _pr(data: dict) -> PR:
         number=data["number"],
         title=data["title"],
         branch=data["headRefName"],
+        base_branch=data.get("baseRefName"),
         status_checks=[
             StatusCheck(
                 name=d["name"],
@@ -121,7 +124,12 @@ async def runs(
     since: timedelta,
     branch: str,
     workflow_id: Optional[int] = None,
+    limit: Optional[int] = None,
 ) -> list[Run]:
+    """
+    The completed runs of the branch created within `since`, newest first: at
+    most `limit` of them, or as many as `gh run list` returns by default.
+    """
     then = datetime.now(timezone.utc) - since
     cmd = [
         "run",
@@ -135,10 +143,12 @@ async def runs(
         "--branch",
         branch,
         "--json",
-        "databaseId,headBranch,headSha,createdAt",
+        "databaseId,headBranch,headSha,createdAt,workflowDatabaseId,workflowName",
     ]
     if workflow_id is not None:
         cmd.extend(["--workflow", str(workflow_id)])
+    if limit is not None:
+        cmd.extend(["--limit", str(limit)])
 
     runs = [
         Run(
@@ -148,6 +158,8 @@ async def runs(
             sha=data["headSha"],
             created_at=datetime.fromisoformat(data["createdAt"]),
             pr=None,
+            workflow_id=data.get("workflowDatabaseId"),
+            workflow_name=data.get("workflowName"),
         )
         for data in json.loads(await _gh(*cmd))
     ]
@@ -76,6 +76,8 @@ class PR(Serializable):
     title: str
     branch: str
     status_checks: list[StatusCheck]
+    # The branch that the PR would be merged into, if known.
+    base_branch: Optional[str] = None
 
     @property
     def url(self) -> str:
@@ -93,6 +95,10 @@ class PR(Serializable):
         }
 
 
+def run_url(repo: str, run_id: int) -> str:
+    return f"https://github.com/{repo}/actions/runs/{run_id}"
+
+
 @dataclass
 class Run(Serializable):
     repo: str
@@ -101,10 +107,13 @@ class Run(Serializable):
     branch: str
     sha: str
     pr: Optional[PR]
+    # The workflow that the run is of, if known.
+    workflow_id: Optional[int] = None
+    workflow_name: Optional[str] = None
 
     @property
     def url(self) -> str:
-        return f"https://github.com/{self.repo}/actions/runs/{self.id}"
+        return run_url(self.repo, self.id)
 
     def to_dict(self) -> SerializableDict:
         return {
@@ -147,6 +156,23 @@ class TestResult(NamedTuple):
     message: Optional[str]  # Failure message
     text: Optional[str]  # Stack trace or code context of failure
 
+    # Stable hashes of (repo, classname, name), message and text, and the failure
+    # signature (see db.normalize_failure_sql), assigned when the row is stored.
+    test_id: Optional[int] = None
+    message_hash: Optional[int] = None
+    text_hash: Optional[int] = None
+    signature: Optional[int] = None
+
+    # The numbers of attempts of the test in the run that passed and that failed,
+    # including those superseded by this one: see fetch._latest_attempts. If
+    # None, this is the only attempt.
+    attempts_passed: Optional[int] = None
+    attempts_failed: Optional[int] = None
+
+    # The workflow that the run is of, if known: a run-level field.
+    workflow_id: Optional[int] = None
+    workflow_name: Optional[str] = None
+
     def __str__(self) -> str:
         return f"{self.__class__.__name__}({self.repo}, {self.artifact}, {self.branch}, {self.run_id}, {self.file}, {self.name})"
 
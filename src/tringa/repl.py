@@ -3,8 +3,7 @@ import shutil
 from enum import StrEnum
 from typing import NoReturn, Optional
 
-import IPython
-
+from tringa import scoped_db
 from tringa.db import DB
 from tringa.msg import fatal, warn
 
@@ -31,9 +30,12 @@ def repl(db: DB, repl: Optional[Repl]) -> NoReturn:
 
 
 def sql(db: DB) -> NoReturn:
+    # The duckdb CLI is a separate process, so it cannot see the views of a
+    # scoped connection.
+    path = scoped_db.materialize(db) if db.scoped else db.path
     db.connection.close()
     try:
-        os.execvp("duckdb", ["duckdb", str(db.path)])
+        os.execvp("duckdb", ["duckdb", str(path)])
     except FileNotFoundError as err:
         if not shutil.which("duckdb"):
             fatal(
@@ -60,5 +62,7 @@ def python(db: DB) -> NoReturn:
     for q in example_queries:
         print(q)
     print("https://duckdb.org/docs/api/python/dbapi.html")
+    import IPython
+
     IPython.start_ipython(argv=[], user_ns={"conn": db.connection, "sql": sql})
     assert False
@@ -1,5 +1,7 @@
 import tempfile
 from contextlib import contextmanager
+from datetime import date
+from functools import cache
 from pathlib import Path
 from typing import (
     Iterator,
@@ -7,26 +9,106 @@ from typing import (
 )
 
 from tringa.annotations import flaky
-from tringa.db import DB, DBConfig
+from tringa.db import DB, TEST_DAILY_SQL, DBConfig
 from tringa.msg import debug
 
+# Tables that are visible, restricted to the scope, through a scoped connection.
+SCOPED_TABLES = ["test", "test_daily", "run_summary", "suite_summary"]
+
+
+def in_window(column: str, since: Optional[date]) -> str:
+    """
+    A SQL predicate that holds for rows whose column is on or after since, or for
+    all rows if since is None.
+
+    The date is written into the SQL as a literal, rather than passed as a
+    parameter, so that DuckDB can use it to skip row groups.
+    """
+    return f"{column} >= DATE '{since}'" if since is not None else "true"
+
 
 @contextmanager
 def connect(
-    dbconfig: DBConfig, repo: str, run_id: Optional[int] = None
+    dbconfig: DBConfig,
+    repo: str,
+    run_id: Optional[int] = None,
+    since: Optional[date] = None,
 ) -> Iterator[DB]:
-    debug(f"Creating scoped db for repo: {repo}, run_id: {run_id}")
-    with dbconfig.connect() as db:
-        query = f"select * from test where repo = '{repo}'"
+    """
+    Connect to the DB with its tables restricted to the given scope: the results
+    of a repo, or of one of its runs, optionally only those since a date.
+
+    The scope is implemented by connection-local views that shadow the stored
+    tables, so no data is copied. The time window is a filter on suite_time,
+    which lets DuckDB skip row groups of the result table outside the window.
+    The views are recreated on each cursor of the connection: see DB.cursor.
+    """
+    debug(f"Creating scoped db for repo: {repo}, run_id: {run_id}, since: {since}")
+    with dbconfig.connect(read_only=True) as db:
+        main = f'"{db.catalog}".main'
+        where = f"repo = '{repo}'"
         if run_id:
-            query += f" and run_id = '{run_id}'"
+            where += f" and run_id = {run_id}"
+
+        def window(column: str) -> str:
+            return f" and {in_window(column, since)}" if since is not None else ""
+
+        # The stored daily rollups cannot be restricted to a single run, so for a
+        # run scope they are computed from the scoped test rows.
+        test_daily = (
+            f"({TEST_DAILY_SQL.format(source='test')})"
+            if run_id
+            else f"{main}.test_daily"
+        )
+        views_sql = f"""
+            create temp view test as
+            select t.* replace (f.test_id is not null as flaky)
+            from {main}.test t
+            left join flaky_test f using (test_id)
+            where {where}{window("suite_time")};
+
+            create temp view run_summary as
+            select * from {main}.run_summary where {where}{window("started_at")};
+
+            create temp view suite_summary as
+            select * from {main}.suite_summary where {where}{window("started_at")};
+
+            create temp view test_daily as
+            select t.repo, t.classname, t.name, d.*
+            from {test_daily} d
+            join {main}.test_case t using (test_id)
+            where t.repo = '{repo}'{window("d.day")};
+        """
+        flaky.annotate(db, repo, since)
+        db.connection.execute(views_sql)
+
+        @cache
+        def flaky_test_df():
+            # pandas is imported, by DuckDB, only when a cursor is made.
+            return db.connection.sql("select * from flaky_test").df()
+
+        def setup_cursor(cursor: DB) -> None:
+            # The flaky tests are judged once, on this connection, and copied to
+            # each cursor from a dataframe registered for the copy.
+            cursor.connection.register("flaky_test_df", flaky_test_df())
+            cursor.connection.execute(
+                "create temp table flaky_test as select * from flaky_test_df"
+            )
+            cursor.connection.unregister("flaky_test_df")
+            cursor.connection.execute(views_sql)
+
+        db.setup_cursor = setup_cursor
+        db.scoped = True
+        yield db
 
-        _df = db.connection.execute(query).df()
 
-        with tempfile.NamedTemporaryFile() as f:
-            path = Path(f.name)
-            path.unlink()
-            with DBConfig(path).connect() as db2:
-                db2.connection.execute("insert into test select * from _df")
-                flaky.annotate(db, db2)
-                yield db2
+def materialize(db: DB) -> Path:
+    """
+    Write the scoped tables to a new DB file, for use by another process.
+    """
+    path = Path(tempfile.mkdtemp()) / "tringa.db"
+    db.connection.execute(f"attach '{path}' as scoped (read_write)")
+    for table in SCOPED_TABLES:
+        db.connection.execute(f"create table scoped.{table} as select * from {table}")
+    db.connection.execute("detach scoped")
+    return path
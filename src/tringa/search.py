@@ -0,0 +1,78 @@
+"""
+Full-text search over failure messages and texts.
+
+Blobs are indexed by the tokens they contain (see db.SEARCH_TOKEN_PATTERN) in
+the blob_token table, which DB.insert_rows maintains. A query matches the blobs
+that contain all of its tokens, ranked by tf-idf.
+"""
+
+import re
+from typing import Optional
+
+from rich.text import Text
+
+from tringa.db import DB, SEARCH_TOKEN_PATTERN, stable_hash
+
+
+def tokens(query: str) -> list[str]:
+    return list(dict.fromkeys(re.findall(SEARCH_TOKEN_PATTERN, query.lower())))
+
+
+def search_sql(query: str) -> Optional[str]:
+    """
+    SQL for a relation of (hash, score) holding the blobs that match the query,
+    or None if the query has no tokens.
+    """
+    terms = tokens(query)
+    if not terms:
+        return None
+    # Token IDs are written into the SQL as literals, so that the filter is pushed
+    # down into the scan of blob_token. The document frequency of each token is
+    # computed in the same scan.
+    token_ids = ", ".join(str(stable_hash(term)) for term in terms)
+    return f"""
+        select hash, sum((1 + ln(count)) * ln(n_blobs / df)) as score
+        from (
+            select hash, count, count(*) over (partition by token_id) as df
+            from blob_token
+            where token_id in ({token_ids})
+        ), (select count(*) as n_blobs from blob)
+        group by hash
+        having count(*) = {len(terms)}
+    """
+
+
+def search(db: DB, query: str) -> dict[int, float]:
+    """
+    The hashes of the blobs that match the query, with their scores.
+    """
+    sql = search_sql(query)
+    if sql is None:
+        return {}
+    return dict(db.connection.execute(sql).fetchall())
+
+
+def snippet(content: str, query: str, context: int = 60) -> str:
+    """
+    The part of content around the first match of a query token, on one line.
+    """
+    match = _pattern(query).search(content)
+    start, end = (match.start(), match.end()) if match else (0, 0)
+    start = max(0, start - context)
+    end = min(len(content), end + context)
+    return (
+        ("..." if start > 0 else "")
+        + " ".join(content[start:end].split())
+        + ("..." if end < len(content) else "")
+    )
+
+
+def highlight(text: str, query: str) -> Text:
+    rich_text = Text(text)
+    rich_text.highlight_regex(_pattern(query), style="bold reverse")
+    return rich_text
+
+
+def _pattern(query: str) -> re.Pattern:
+    terms = "|".join(map(re.escape, tokens(query))) or "(?!)"
+    return re.compile(rf"(?<![a-z_])(?:{terms})(?![a-z0-9_])", re.IGNORECASE)
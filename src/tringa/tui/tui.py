@@ -1,6 +1,6 @@
 from collections import defaultdict
 from datetime import datetime
-from typing import Iterator
+from typing import Callable, Iterator, Optional
 
 import humanize
 from rich.table import Table
@@ -8,7 +8,14 @@ from rich.text import Text
 from textual.app import App, ComposeResult, RenderResult
 from textual.binding import Binding
 from textual.css.query import NoMatches
-from textual.widgets import Collapsible, ListItem, ListView, RichLog, Static
+from textual.widgets import (
+    Collapsible,
+    Input,
+    ListItem,
+    ListView,
+    RichLog,
+    Static,
+)
 from textual.widgets._collapsible import CollapsibleTitle
 
 import tringa.cli.run.show
@@ -51,15 +58,27 @@ class RunResultsWidget(Static):
 
 
 class FailedTestWidget(Collapsible):
-    def __init__(self, test: TestResult):
+    def __init__(
+        self, test: TestResult, load_text: Callable[[TestResult], Optional[str]]
+    ):
         title = test.name
         if test.flaky:
             title = f"{title} [bold yellow]FLAKY[/]"
 
-        rich_log = RichLog()
-        rich_log.write(test.text)
+        self.test = test
+        self.load_text = load_text
+        self.rich_log = RichLog()
+        self.text_loaded = False
 
-        super().__init__(rich_log, title=title)
+        super().__init__(self.rich_log, title=title)
+
+    def watch_collapsed(self, collapsed: bool) -> None:
+        # The failure text is fetched from the DB when it is first shown.
+        if not collapsed and not self.text_loaded:
+            # A failure may have no text stored, e.g. when it has only a message.
+            if (text := self.load_text(self.test)) is not None:
+                self.rich_log.write(text)
+            self.text_loaded = True
 
 
 class RunResultApp(App):
@@ -68,6 +87,7 @@ class RunResultApp(App):
     BINDINGS = [
         Binding("right", "show_test_output", "Show test output"),
         Binding("left", "hide_test_output", "Hide test output"),
+        Binding("slash", "focus_search", "Search test output"),
     ]
 
     def __init__(self, run_result: tringa.cli.run.show.Report):
@@ -76,6 +96,10 @@ class RunResultApp(App):
 
     def compose(self) -> ComposeResult:
         yield RunResultsWidget(self.run_result)
+        yield Input(
+            placeholder="Search failure messages and output: press / to focus",
+            id="search",
+        )
 
         def per_file_results() -> Iterator[tuple[str, ListView]]:
             tests_by_file = defaultdict(list[TestResult])
@@ -86,14 +110,24 @@ class RunResultApp(App):
                 n_flaky = sum(1 for test in tests if test.flaky)
                 yield (
                     f"{name} [bold red]{len(tests)} failed[/] ([bold yellow]{n_flaky} flaky[/])",
-                    ListView(*[ListItem(FailedTestWidget(test)) for test in tests]),
+                    ListView(
+                        *[
+                            ListItem(
+                                FailedTestWidget(
+                                    test, self.run_result.failed_tests.text
+                                )
+                            )
+                            for test in tests
+                        ]
+                    ),
                 )
 
         yield ListView(
             *[
                 ListItem(Collapsible(list_view, title=title))
                 for title, list_view in per_file_results()
-            ]
+            ],
+            id="files",
         )
 
     def action_open_url(self, url: str) -> None:
@@ -121,6 +155,26 @@ class RunResultApp(App):
             if collapsible := item.query_one(Collapsible):
                 collapsible.collapsed = not collapsible.collapsed
 
+    def action_focus_search(self) -> None:
+        self.query_one("#search", Input).focus()
+
+    def on_input_submitted(self, event: Input.Submitted) -> None:
+        """
+        Show only the tests whose failure message or text matches the query, or
+        all tests if the query is empty.
+        """
+        query = event.value.strip()
+        matching = set(self.run_result.failed_tests.search(query)) if query else None
+        for widget in self.query(FailedTestWidget):
+            if item := widget.parent:
+                item.display = matching is None or widget.test in matching
+        for file_item in self.query_one("#files", ListView).children:
+            file_item.display = any(
+                widget.parent is not None and widget.parent.display
+                for widget in file_item.query(FailedTestWidget)
+            )
+        self.query_one("#files", ListView).focus()
+
     def action_show_test_output(self) -> None:
         self._set_test_output_visibility(True)
 
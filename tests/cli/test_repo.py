@@ -1,7 +1,21 @@
+from datetime import datetime, timedelta
+
 import pytest
 from typer import BadParameter
 
+from tringa import scoped_db
+from tringa.cli.repo import (
+    clusters,
+    cofailures,
+    cost,
+    failure_first,
+    regressions,
+    shard_plan,
+    show,
+)
 from tringa.cli.repo.cli import _validate_repo_arg
+from tringa.cli.reports import flaky_tests
+from tringa.db import DBConfig
 
 
 @pytest.mark.parametrize(
@@ -23,3 +37,212 @@ def test_validate_repo_arg(input, expected_output):
             _validate_repo_arg(input)
     else:
         assert _validate_repo_arg(input) == expected_output
+
+
+def test_failures_differing_in_addresses_and_numbers_share_a_signature(
+    db, make_test_result
+):
+    db.insert_rows(
+        [
+            make_test_result(
+                1,
+                "test_a",
+                passed=False,
+                message="ConnectionError: <Conn at 0x7f3a> localhost:54321",
+            ),
+            make_test_result(
+                2,
+                "test_b",
+                passed=False,
+                message="ConnectionError: <Conn at 0x9b2c> localhost:40001",
+            ),
+            make_test_result(2, "test_c", passed=False, text="assert 1 == 2"),
+            make_test_result(2, "test_d", message="ignored: passed"),
+        ]
+    )
+
+    report = clusters.make_report(db, "owner/repo")
+    assert [(c.failures, c.tests, c.runs, c.example) for c in report.clusters] == [
+        (2, 2, 2, "ConnectionError: <Conn at <addr>> localhost:N"),
+        (1, 1, 1, "assert N == N"),
+    ]
+
+
+def test_cofailures_clusters_tests_that_fail_together(db, make_test_result):
+    failures = {
+        "test_a": [1, 2, 3, 4],
+        "test_b": [1, 2, 3, 4, 5],
+        "test_c": [2, 3, 4],
+        "test_d": [6, 7, 8],
+    }
+    db.insert_rows(
+        [
+            make_test_result(run_id, name, passed=run_id not in failures[name])
+            for run_id in range(1, 9)
+            for name in failures
+        ]
+    )
+
+    report = cofailures.make_report(db, "owner/repo", min_runs=3, min_jaccard=0.6)
+    assert [(c.tests, c.runs, c.min_jaccard) for c in report.clusters] == [
+        (["test_module.test_a", "test_module.test_b", "test_module.test_c"], 4, 0.6)
+    ]
+
+
+def test_regressions_finds_the_run_in_which_a_test_became_slower(db, make_test_result):
+    def noise(run_id: int) -> float:
+        return 1 + 0.02 * (run_id * 7 % 5 - 2)
+
+    db.insert_rows(
+        [
+            make_test_result(
+                run_id,
+                "test_a",
+                duration=(3.0 if run_id >= 21 else 1.0) * noise(run_id),
+            )
+            for run_id in range(1, 41)
+        ]
+        + [
+            make_test_result(run_id, "test_b", duration=noise(run_id))
+            for run_id in range(1, 41)
+        ]
+    )
+
+    (regression,) = regressions.make_report(db, "owner/repo").regressions
+    assert (regression.name, regression.run_id) == ("test_a", 21)
+    assert (regression.runs_before, regression.runs_after) == (20, 20)
+    assert regression.ratio == pytest.approx(3, rel=0.01)
+
+
+def test_shard_plan_balances_modules_between_workers(db, make_test_result):
+    durations = {
+        "tests.test_a": [3.0, 3.0, 30.0],
+        "tests.test_b": [3.0],
+        "tests.test_c": [2.0],
+        "tests.test_d": [2.0],
+        "tests.test_e.TestE": [2.0],
+    }
+    db.insert_rows(
+        [
+            make_test_result(run_id, "test_x", classname=classname, duration=duration)
+            for classname, runs in durations.items()
+            for run_id, duration in enumerate(runs, start=1)
+        ]
+    )
+
+    report = shard_plan.make_report(db, "owner/repo", workers=2)
+    assert [w.units for w in report.workers] == [
+        ["tests/test_a.py", "tests/test_c.py", "tests/test_e.py"],
+        ["tests/test_b.py", "tests/test_d.py"],
+    ]
+    assert (report.makespan, report.lower_bound) == (7.0, 6.0)
+
+    report = shard_plan.make_report(
+        db, "owner/repo", workers=2, unit=shard_plan.Unit.TEST
+    )
+    assert "tests/test_e.py::TestE::test_x" in report.workers[0].units
+
+    report = shard_plan.make_report(db, "owner/repo", workers=2, artifact="other-*")
+    assert report.workers[0].units == report.workers[1].units == []
+
+
+def test_failure_first_orders_by_recent_failure_rate_per_second(db, make_test_result):
+    # Run 100 is ten weeks after run 1, so the failures of test_old count for
+    # little.
+    failures = {
+        "test_old": [1, 2, 3, 4],
+        "test_new": [99],
+        "test_slow": [99],
+        "test_fast": [],
+    }
+    durations = {"test_old": 1.0, "test_new": 1.0, "test_slow": 10.0, "test_fast": 1.0}
+    db.insert_rows(
+        [
+            make_test_result(
+                run_id,
+                name,
+                suite_time=datetime(2024, 9, 1) + timedelta(days=0.7 * run_id),
+                duration=durations[name],
+                passed=run_id not in failures[name],
+            )
+            for run_id in range(1, 101)
+            for name in failures
+        ]
+    )
+
+    report = failure_first.make_report(db, "owner/repo")
+    assert [t.node_id for t in report.tests] == [
+        "test_module.py::test_new",
+        "test_module.py::test_slow",
+        "test_module.py::test_old",
+        "test_module.py::test_fast",
+    ]
+    assert report.tests[2].failures == 4
+
+
+def test_cost_breaks_down_test_time_with_week_over_week_change(
+    tmp_path, make_test_result
+):
+    db_config = DBConfig(tmp_path / "tringa.db")
+    with db_config.connect() as db:
+        db.insert_rows(
+            [
+                make_test_result(
+                    run_id,
+                    name,
+                    artifact=f"junit-{run_id % 2}",
+                    file=f"{name}.xml",
+                    suite_time=datetime(2024, 9, 1) + timedelta(days=run_id),
+                    # The first week's runs are of a nightly workflow.
+                    workflow_id=2 if run_id <= 7 else 1,
+                    workflow_name="Nightly" if run_id <= 7 else "CI",
+                    # test_b doubles in duration in the latest week.
+                    duration=(
+                        2 * duration if name == "test_b" and run_id > 14 else duration
+                    ),
+                )
+                for run_id in range(1, 22)
+                for name, duration in [("test_a", 100.0), ("test_b", 50.0)]
+            ]
+        )
+    with scoped_db.connect(db_config, "owner/repo") as db:
+        report = cost.make_report(db, limit=1)
+
+    assert sum(total for _, total in report.weekly) == 21 * 150 + 7 * 50
+    workflows, artifacts, suites, files, tests = report.breakdowns
+    assert [(c.name, c.total) for c in workflows.top] == [("CI", 2450.0)]
+    assert [(c.name, c.total) for c in artifacts.top] == [("junit-1", 1850.0)]
+    assert [c.name for c in suites.top] == ["test_a.xml:suite"]
+    assert [c.name for c in files.growth] == ["test_b.xml"]
+    (growth,) = tests.growth
+    assert (growth.name, growth.last_week, growth.this_week) == (
+        "test_module.test_b",
+        350.0,
+        700.0,
+    )
+
+
+def test_repo_show_reads_only_the_flaky_tests_that_are_shown(
+    tmp_path, make_test_result
+):
+    db_config = DBConfig(tmp_path / "tringa.db")
+    with db_config.connect() as db:
+        db.insert_rows(
+            [
+                make_test_result(run_id, f"test_{i}", passed=run_id == 1)
+                for run_id in [1, 2]
+                for i in range(5)
+            ]
+        )
+    with scoped_db.connect(db_config, "owner/repo") as db:
+        full = show.make_report(db, "owner/repo")
+        shown = show.make_report(db, "owner/repo", limit=2)
+
+    assert isinstance(full.flaky_tests, flaky_tests.Report)
+    assert isinstance(shown.flaky_tests, flaky_tests.Summary)
+    assert [t.name for t in shown.flaky_tests.tests] == ["test_0", "test_1"]
+    assert shown.flaky_tests.total == len(full.flaky_tests.tests) == 5
+    assert [t.failures for t in shown.flaky_tests.tests] == [
+        t.failures[:1] for t in full.flaky_tests.tests[:2]
+    ]
+    assert shown.slow_tests == full.slow_tests
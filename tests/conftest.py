@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+from typing import Callable
+
+import pytest
+
+from tringa import models
+from tringa.db import DBConfig
+
+
+@pytest.fixture
+def make_test_result() -> Callable[..., models.TestResult]:
+    """
+    A function making a test result of a run, with fields that may be overridden
+    by keyword arguments. Each run has its own artifact.
+    """
+
+    def make_test_result(run_id: int, name: str, **kwargs) -> models.TestResult:
+        fields = dict(
+            repo="owner/repo",
+            artifact=f"junit-xml--{run_id}--1",
+            branch="main",
+            run_id=run_id,
+            sha="sha",
+            pr=None,
+            pr_title=None,
+            file="junit.xml",
+            suite="suite",
+            suite_time=datetime(2024, 9, 1) + timedelta(hours=run_id),
+            suite_duration=1.0,
+            classname="test_module",
+            name=name,
+            duration=1.0,
+            passed=True,
+            skipped=False,
+            flaky=False,
+            message=None,
+            text=None,
+        )
+        return models.TestResult(**(fields | kwargs))  # type: ignore
+
+    return make_test_result
+
+
+@pytest.fixture
+def db(tmp_path):
+    with DBConfig(tmp_path / "tringa.db").connect() as db:
+        yield db
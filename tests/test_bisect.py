@@ -0,0 +1,29 @@
+from tringa import models
+from tringa.cli.test import bisect
+
+
+def test_bisect_finds_the_first_failing_run_looking_at_few_runs(db, make_test_result):
+    # Run 500 has no results of the test, e.g. because it ran another workflow.
+    db.insert_rows(
+        [
+            make_test_result(run_id, "test_a", passed=run_id < 700)
+            for run_id in range(1, 1001)
+            if run_id != 500
+        ]
+    )
+    runs = [
+        models.Run(
+            repo="owner/repo", id=i, created_at=None, branch="main", sha="sha", pr=None
+        )
+        for i in range(1, 1001)
+    ]
+
+    def probe(run: models.Run) -> bisect.Probe:
+        return bisect.Probe(
+            run=run, failed=bisect.failed(db, run.id, "test_*"), downloaded=False
+        )
+
+    report = bisect.make_report("test_*", "main", runs, probe)
+    assert report.first_failing is not None and report.first_failing.id == 700
+    assert report.last_passing is not None and report.last_passing.id == 699
+    assert len(report.probes) <= 13
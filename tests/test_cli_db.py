@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta
+
+from tringa.cli.db import compact, snapshot
+from tringa.cli.db.merge import merge
+from tringa.db import DBConfig
+from tringa.fetch import Shard
+
+
+def test_merge_takes_each_run_from_the_last_input_holding_it(
+    tmp_path, make_test_result
+):
+    shards = [Shard(1, 2), Shard(2, 2)]
+    results = [make_test_result(run_id, "test_a") for run_id in range(1, 11)]
+    paths = [tmp_path / "1.db", tmp_path / "2.db", tmp_path / "3.db"]
+    for path, shard in zip(paths, shards):
+        with DBConfig(path).connect() as db:
+            db.insert_rows([r for r in results if r.run_id in shard])
+    with DBConfig(paths[2]).connect() as db:
+        db.insert_rows([make_test_result(1, "test_a", passed=False)])
+
+    report = merge(paths, tmp_path / "merged.db")
+
+    assert (report.runs, report.results) == (10, 10)
+    with DBConfig(report.path).connect(read_only=True) as db:
+        assert db.connection.sql(
+            "select sum(runs), sum(failures) from test_daily"
+        ).fetchall() == [(10, 1)]
+
+
+def test_compact_applies_retention_policies(tmp_path, make_test_result):
+    def days_ago(days: int) -> datetime:
+        return datetime.now() - timedelta(days=days)
+
+    db_config = DBConfig(tmp_path / "tringa.db")
+    with db_config.connect() as db:
+        db.insert_rows(
+            [
+                # Run 1 is older than both retention windows.
+                make_test_result(1, "test_a", suite_time=days_ago(100)),
+                make_test_result(
+                    1, "test_old", suite_time=days_ago(100), passed=False, text="old"
+                ),
+                # Run 2 is older than the window for passing results, but not
+                # than the window for failures.
+                make_test_result(2, "test_a", suite_time=days_ago(45)),
+                make_test_result(
+                    2, "test_b", suite_time=days_ago(45), passed=False, text="boom"
+                ),
+                make_test_result(3, "test_a", suite_time=days_ago(1), text="output"),
+            ]
+        )
+
+    report = compact.compact(
+        db_config, keep_days=30, keep_failure_days=60, drop_passing_text=True
+    )
+
+    assert (report.results_deleted, report.texts_dropped) == (3, 1)
+    with db_config.connect() as db:
+        assert db.connection.sql(
+            "select run_id, name, passed, text from test order by all"
+        ).fetchall() == [(2, "test_b", False, "boom"), (3, "test_a", True, None)]
+        # Dimension and blob rows that only run 1 referenced are not kept.
+        for table, expected in [
+            ("run", [2, 3]),
+            ("artifact", ["junit-xml--2--1", "junit-xml--3--1"]),
+            ("test_case", ["test_a", "test_b"]),
+            ("blob", ["boom"]),
+        ]:
+            column = {"run": "run_id", "blob": "content"}.get(table, "name")
+            assert [
+                value
+                for (value,) in db.connection.sql(
+                    f"select {column} from {table} order by all"
+                ).fetchall()
+            ] == expected
+        assert db.connection.sql(
+            "select count(*) from blob_token where hash not in (select hash from blob)"
+        ).fetchall() == [(0,)]
+
+        rollups = ["test_daily", "run_summary", "suite_summary", "sha_outcome"]
+
+        def read_rollups():
+            return {
+                table: db.connection.sql(
+                    f"select * from {table} order by all"
+                ).fetchall()
+                for table in rollups
+            }
+
+        compacted = read_rollups()
+        db.rebuild_rollups()
+        assert read_rollups() == compacted
+        assert db.connection.sql(
+            "select run_id, tests, passes, failures from run_summary order by run_id"
+        ).fetchall() == [(2, 1, 0, 1), (3, 1, 1, 0)]
+
+
+def test_snapshot_import_replaces_runs(tmp_path, make_test_result):
+    exported = DBConfig(tmp_path / "exported.db")
+    with exported.connect() as db:
+        db.insert_rows([make_test_result(run_id, "test_a") for run_id in [1, 2]])
+    snapshot.export(exported, tmp_path / "snapshot")
+
+    imported = DBConfig(tmp_path / "imported.db")
+    with imported.connect() as db:
+        db.insert_rows(
+            [
+                make_test_result(1, "test_b", passed=False),
+                make_test_result(3, "test_a", passed=False),
+            ]
+        )
+    report = snapshot.import_(imported, tmp_path / "snapshot")
+
+    assert report.manifest.runs == {"owner/repo": [1, 2]}
+    with imported.connect() as db:
+        assert db.connection.sql(
+            "select run_id, name, passed from test order by all"
+        ).fetchall() == [(1, "test_a", True), (2, "test_a", True), (3, "test_a", False)]
+
+        # The rollups of the imported runs, and of run 3, which shares their
+        # commit, are updated as a full rebuild would.
+        def read_rollups():
+            return {
+                table: db.connection.sql(
+                    f"select * from {table} order by all"
+                ).fetchall()
+                for table in [
+                    "test_daily",
+                    "run_summary",
+                    "suite_summary",
+                    "sha_outcome",
+                ]
+            }
+
+        imported_rollups = read_rollups()
+        db.rebuild_rollups()
+        assert read_rollups() == imported_rollups
+        assert db.connection.sql(
+            "select passes, failures from sha_outcome"
+        ).fetchall() == [(2, 1)]
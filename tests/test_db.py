@@ -0,0 +1,140 @@
+import shutil
+import threading
+import time
+from datetime import datetime
+
+from tringa.db import DBConfig
+
+
+def test_rollups_track_replaced_rows(db, make_test_result):
+    db.insert_rows(
+        [
+            make_test_result(1, "test_a", duration=2.0),
+            make_test_result(1, "test_b", passed=False),
+            make_test_result(30, "test_a", duration=3.0),
+        ]
+    )
+    # A later attempt of run 1, on the following day, in which test_b passed.
+    db.insert_rows(
+        [
+            make_test_result(1, "test_a", suite_time=datetime(2024, 9, 2, 12)),
+            make_test_result(1, "test_b", suite_time=datetime(2024, 9, 2, 12)),
+        ]
+    )
+
+    assert db.connection.sql(
+        "select day::VARCHAR, name, runs, passes, failures, duration_max "
+        "from test_daily join test_case using (test_id) order by all"
+    ).fetchall() == [
+        ("2024-09-02", "test_a", 2, 2, 0, 3.0),
+        ("2024-09-02", "test_b", 1, 1, 0, 1.0),
+    ]
+    assert db.connection.sql(
+        "select run_id, tests, passes, failures from run_summary order by run_id"
+    ).fetchall() == [(1, 2, 2, 0), (30, 1, 1, 0)]
+
+
+def test_runs_of_a_workflow_share_artifact_names(db, make_test_result):
+    db.insert_rows(
+        [
+            make_test_result(run_id, name, artifact="junit-xml")
+            for run_id in [1, 2]
+            for name in ["test_a", "test_b"]
+        ]
+    )
+    db.insert_rows([make_test_result(3, "test_a", artifact="junit-xml")])
+
+    assert db.connection.sql("select count(*) from artifact").fetchall() == [(1,)]
+    assert db.connection.sql(
+        "select run_id, count(*) from test where artifact = 'junit-xml' "
+        "group by run_id order by run_id"
+    ).fetchall() == [(1, 2), (2, 2), (3, 1)]
+
+
+def test_failure_text_is_stored_once(db, make_test_result):
+    db.insert_rows(
+        [
+            make_test_result(run_id, "test_a", passed=False, text="Traceback")
+            for run_id in [1, 2, 3]
+        ]
+    )
+    assert db.connection.sql("select count(*) from blob").fetchall() == [(1,)]
+    assert db.connection.sql(
+        "select count(distinct text_hash), any_value(text) from test"
+    ).fetchall() == [(1, "Traceback")]
+
+
+def test_data_version_changes_with_data(db, make_test_result):
+    (db_id, version) = db.data_version
+    db.insert_rows([make_test_result(1, "test_a")])
+    assert db.data_version == (db_id, version + 1)
+    db.insert_rows([])
+    assert db.data_version == (db_id, version + 1)
+
+
+def count_runs(db_config: DBConfig) -> int:
+    with db_config.connect(read_only=True) as db:
+        return db.fetchone("select count(*) from run")[0]
+
+
+def test_shared_db_readers_see_the_last_published_snapshot(tmp_path, make_test_result):
+    db_config = DBConfig(tmp_path / "tringa.db", shared=True)
+    with db_config.connect() as db:
+        db.insert_rows([make_test_result(1, "test_a")])
+
+    with DBConfig(db_config.path, shared=True).connect(read_only=True) as reader:
+        with db_config.batch():
+            with db_config.connect() as db:
+                db.insert_rows([make_test_result(2, "test_a")])
+            # The writes of a batch are seen by its reads, and by no others
+            # until the batch is published.
+            assert count_runs(db_config) == 2
+            assert reader.fetchone("select count(*) from run") == (1,)
+            assert count_runs(DBConfig(db_config.path, shared=True)) == 1
+        # A reader that was open during the publish goes on reading its snapshot.
+        assert reader.fetchone("select count(*) from run") == (1,)
+    assert count_runs(db_config) == 2
+
+
+def test_shared_db_writers_queue_on_the_lock(tmp_path, make_test_result):
+    path = tmp_path / "tringa.db"
+    first_wrote, first_may_publish = threading.Event(), threading.Event()
+
+    def write(run_id: int, wait: bool) -> None:
+        db_config = DBConfig(path, shared=True)
+        with db_config.batch():
+            with db_config.connect() as db:
+                db.insert_rows([make_test_result(run_id, "test_a")])
+            if wait:
+                first_wrote.set()
+                first_may_publish.wait()
+
+    first = threading.Thread(target=write, args=(1, True))
+    first.start()
+    first_wrote.wait()
+    second = threading.Thread(target=write, args=(2, False))
+    second.start()
+    time.sleep(0.2)
+    assert second.is_alive()
+    first_may_publish.set()
+    first.join()
+    second.join()
+
+    # The second writer copied the DB after the first had published it.
+    assert count_runs(DBConfig(path, shared=True)) == 2
+
+
+def test_shared_db_writer_recovers_a_stale_wal(tmp_path, make_test_result):
+    # A copy of a DB and its write-ahead log, as left by a process that crashed
+    # while writing to the DB without --shared.
+    with DBConfig(tmp_path / "crashed.db").connect() as db:
+        db.insert_rows([make_test_result(1, "test_a")])
+        shutil.copyfile(tmp_path / "crashed.db", tmp_path / "tringa.db")
+        shutil.copyfile(tmp_path / "crashed.db.wal", tmp_path / "tringa.db.wal")
+
+    db_config = DBConfig(tmp_path / "tringa.db", shared=True)
+    with db_config.connect() as db:
+        db.insert_rows([make_test_result(2, "test_a")])
+
+    assert not (tmp_path / "tringa.db.wal").exists()
+    assert count_runs(db_config) == 2
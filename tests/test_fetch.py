@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from tringa.fetch import _latest_attempts
+
+
+def test_latest_attempts_keeps_latest_result_of_each_test(make_test_result):
+    attempt_1, attempt_2 = datetime(2024, 9, 1, 10), datetime(2024, 9, 1, 11)
+
+    def attempt(suite_time: datetime, name: str, passed: bool, **kwargs):
+        artifact = f"junit-xml--1--{1 if suite_time == attempt_1 else 2}"
+        return make_test_result(
+            1, name, suite_time=suite_time, passed=passed, artifact=artifact, **kwargs
+        )
+
+    results = _latest_attempts(
+        [
+            attempt(attempt_1, "test_a", False),
+            attempt(attempt_1, "test_b", False, message="first"),
+            # A test case may have more than one failure element.
+            attempt(attempt_1, "test_b", False, message="second"),
+            attempt(attempt_2, "test_a", True),
+        ]
+    )
+    assert sorted(
+        (r.name, r.passed, r.attempts_passed, r.attempts_failed) for r in results
+    ) == [
+        ("test_a", True, 1, 1),
+        ("test_b", False, 0, 1),
+    ]
@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from tringa.cli.test import history
+from tringa.db import DBConfig
+
+
+def test_history_returns_latest_results_of_matching_tests(tmp_path, make_test_result):
+    with DBConfig(tmp_path / "tringa.db").connect() as db:
+        db.insert_rows(
+            [
+                make_test_result(
+                    run_id,
+                    name,
+                    suite_time=datetime(2024, 9, run_id),
+                    passed=run_id != 2,
+                )
+                for run_id in [1, 2, 3]
+                for name in ["test_foo", "test_foo_bar", "test_baz"]
+            ]
+        )
+        results = list(history.results(db, "owner/repo", "test_foo*", limit=2))
+
+    assert [(r.name, r.run_id, r.status) for r in results] == [
+        ("test_foo", 3, "passed"),
+        ("test_foo", 2, "failed"),
+        ("test_foo_bar", 3, "passed"),
+        ("test_foo_bar", 2, "failed"),
+    ]
@@ -0,0 +1,27 @@
+from tringa import models
+from tringa.cli.pr import diff
+
+
+def test_pr_diff_labels_failures_by_their_results_on_the_base_branch(
+    db, make_test_result
+):
+    base = {"test_new": True, "test_old": False, "test_fixed": False}
+    pr_failed = {"test_new", "test_old"}
+    db.insert_rows(
+        [make_test_result(1, name, passed=passed) for name, passed in base.items()]
+        + [
+            make_test_result(2, name, branch="feature", passed=name not in pr_failed)
+            for name in [*base, "test_added"]
+        ]
+    )
+    run = models.Run(
+        repo="owner/repo", id=2, created_at=None, branch="feature", sha="sha", pr=None
+    )
+
+    report = diff.make_report(db, run, "main")
+    assert report.base_run_ids == [1]
+    assert [(t.name, t.status) for t in report.tests] == [
+        ("test_fixed", diff.Status.FIXED),
+        ("test_new", diff.Status.NEW),
+        ("test_old", diff.Status.PRE_EXISTING),
+    ]
@@ -0,0 +1,50 @@
+import io
+from dataclasses import replace
+
+from rich.console import Console
+
+from tringa import cli, models, scoped_db
+from tringa.cli.repo import show
+from tringa.cli.reports import cache
+from tringa.cli.run import cli as run_cli
+from tringa.db import DBConfig
+
+
+def test_reports_cached_by_another_cache_version_are_remade(
+    tmp_path, monkeypatch, make_test_result
+):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    db_config = DBConfig(tmp_path / "tringa.db")
+    with db_config.connect() as db:
+        db.insert_rows([make_test_result(1, "test_a")])
+
+    def make_report() -> show.Report:
+        with scoped_db.connect(db_config, "owner/repo") as db:
+            return show.make_report(db, "owner/repo")
+
+    report = cache.get(db_config, ["repo show"], make_report)
+    assert cache.get(db_config, ["repo show"], lambda: None) == report
+    monkeypatch.setattr(cache, "CACHE_VERSION", cache.CACHE_VERSION + 1)
+    assert cache.get(db_config, ["repo show"], lambda: None) is None
+
+
+def test_cached_run_reports_hold_the_failure_texts(
+    tmp_path, monkeypatch, make_test_result
+):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    db_config = DBConfig(tmp_path / "tringa.db")
+    monkeypatch.setattr(cli, "options", replace(cli.options, db_config=db_config))
+    with db_config.connect() as db:
+        db.insert_rows(
+            [make_test_result(1, "test_a", passed=False, text="AssertionError: boom")]
+        )
+    run = models.Run(
+        repo="owner/repo", id=1, created_at=None, branch="main", sha="sha", pr=None
+    )
+
+    cache.get(db_config, ["pr show"], lambda: run_cli.show_report(run))
+    report = cache.get(db_config, ["pr show"], lambda: None)
+
+    console = Console(file=io.StringIO(), width=80)
+    console.print(report.failed_tests)
+    assert "AssertionError: boom" in console.file.getvalue()
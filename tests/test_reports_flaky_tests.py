@@ -0,0 +1,159 @@
+from datetime import datetime
+from typing import Optional
+
+from tringa import models, scoped_db
+from tringa.cli.reports import flaky_tests
+from tringa.db import DBConfig
+from tringa.fetch import Sample, _latest_attempts
+
+
+def test_tests_that_pass_and_fail_at_the_same_sha_are_flaky(tmp_path, make_test_result):
+    db_config = DBConfig(tmp_path / "tringa.db")
+    with db_config.connect() as db:
+        # test_a fails at sha1 on main, and passes at sha1 in a later run. test_b
+        # fails on two branches, but never passes at the sha at which it fails.
+        db.insert_rows(
+            [
+                make_test_result(1, "test_a", sha="sha1", passed=False),
+                make_test_result(1, "test_b", sha="sha1", passed=False),
+                make_test_result(2, "test_a", sha="sha2", branch="b", passed=False),
+                make_test_result(2, "test_b", sha="sha2", branch="b", passed=False),
+            ]
+        )
+        db.insert_rows(
+            [
+                make_test_result(3, "test_a", sha="sha1"),
+                make_test_result(3, "test_b", sha="sha1", passed=False),
+            ]
+        )
+    with scoped_db.connect(db_config, "owner/repo") as db:
+        report = flaky_tests.make_report(db)
+
+    (test,) = report.tests
+    assert (test.name, test.flips, test.flip_rate) == ("test_a", 1, 1.0)
+
+
+def test_sampled_runs_are_weighted_to_estimate_failure_rates(
+    tmp_path, make_test_result
+):
+    # 100 runs of a workflow, over two days, in which test_a fails in every
+    # fourth run.
+    runs = [
+        models.Run(
+            repo="owner/repo",
+            id=i,
+            created_at=datetime(2024, 9, 1 + i % 2),
+            branch="main",
+            sha="sha",
+            pr=None,
+            workflow_id=1,
+        )
+        for i in range(1, 101)
+    ]
+    assert sorted(Sample(max_runs_per_branch=20).weights(runs).values()) == [5.0] * 20
+    weights = Sample(fraction=0.1).weights(runs)
+    assert sorted(weights.values()) == [10.0] * 10
+    assert len({i % 2 for i in weights}) == 2
+
+    db_config = DBConfig(tmp_path / "tringa.db")
+    with db_config.connect() as db:
+        db.insert_rows(
+            [make_test_result(i, "test_a", passed=i % 4 != 0) for i in weights],
+            run_weights=weights,
+        )
+        assert db.fetchone("select sum(weight) from run") == (100.0,)
+    with scoped_db.connect(db_config, "owner/repo") as db:
+        report = flaky_tests.make_report(db)
+
+    (test,) = report.tests
+    assert test.failure_rate_ci is not None
+    low, high = test.failure_rate_ci
+    assert low <= test.failure_rate <= high
+    assert high > low
+
+
+def test_tests_whose_run_attempts_disagree_are_flaky(tmp_path, make_test_result):
+    # Run 1 was re-run, and test_a passed in the second attempt, having failed
+    # in the first. Only the second attempt's results are stored.
+    db_config = DBConfig(tmp_path / "tringa.db")
+    with db_config.connect() as db:
+        db.insert_rows(
+            _latest_attempts(
+                [
+                    make_test_result(
+                        1,
+                        name,
+                        artifact=f"junit-xml--1--{attempt}",
+                        suite_time=datetime(2024, 9, 1, attempt),
+                        passed=attempt == 2 or name == "test_b",
+                    )
+                    for attempt in [1, 2]
+                    for name in ["test_a", "test_b"]
+                ]
+            )
+        )
+        assert db.connection.sql(
+            "select name, passed from test order by name"
+        ).fetchall() == [("test_a", True), ("test_b", True)]
+    with scoped_db.connect(db_config, "owner/repo") as db:
+        assert db.connection.sql(
+            "select name, flaky, flips from test left join flaky_test using (test_id) "
+            "order by name"
+        ).fetchall() == [("test_a", True, 1), ("test_b", False, None)]
+
+
+def test_flaky_report_holds_the_latest_failure_in_each_branch_and_file(
+    tmp_path, make_test_result
+):
+    def result(run_id: int, name: str, file: str, passed: bool, **kwargs):
+        return make_test_result(
+            run_id, name, file=file, passed=passed, sha="sha1", **kwargs
+        )
+
+    feature = dict(branch="feature", sha="sha2", pr=7, pr_title="Fix")
+    db_config = DBConfig(tmp_path / "tringa.db")
+    with db_config.connect() as db:
+        db.insert_rows(
+            [
+                result(1, "test_a", "a.xml", False),
+                result(1, "test_a", "b.xml", True),
+                result(1, "test_b", "a.xml", False),
+                result(1, "test_c", "a.xml", False),
+                result(2, "test_a", "a.xml", False),
+                result(2, "test_a", "b.xml", False),
+                result(2, "test_b", "a.xml", True),
+            ]
+            + [
+                make_test_result(run_id, name, passed=run_id == 4, **feature)
+                for run_id in [3, 4]
+                for name in ["test_a", "test_b"]
+            ]
+        )
+    with scoped_db.connect(db_config, "owner/repo") as db:
+        report = flaky_tests.make_report(db)
+
+    def failed_run(run_id: int, pr: Optional[dict], files: list[str]) -> dict:
+        return {
+            "run": {
+                "repo": "owner/repo",
+                "id": run_id,
+                "created_at": datetime(2024, 9, 1, run_id).isoformat(),
+                "pr": pr,
+            },
+            "failed_builds": [{"name": file} for file in files],
+        }
+
+    pr = {"repo": "owner/repo", "number": 7, "title": "Fix", "branch": "feature"}
+    assert [(t["name"], t["failed_runs"]) for t in report.to_dict()["tests"]] == [
+        (
+            "test_a",
+            [
+                failed_run(3, pr, ["junit.xml"]),
+                failed_run(2, None, ["a.xml", "b.xml"]),
+            ],
+        ),
+        (
+            "test_b",
+            [failed_run(3, pr, ["junit.xml"]), failed_run(1, None, ["a.xml"])],
+        ),
+    ]
@@ -0,0 +1,32 @@
+import pytest
+
+from tringa import scoped_db
+from tringa.cli.reports import slow_tests
+from tringa.db import DBConfig
+
+
+def test_slow_tests_quantiles_are_read_from_daily_sketches(tmp_path, make_test_result):
+    db_config = DBConfig(tmp_path / "tringa.db")
+    with db_config.connect() as db:
+        db.insert_rows(
+            [
+                make_test_result(run_id, "test_a", duration=float(run_id))
+                for run_id in range(1, 101)
+            ]
+            + [make_test_result(1, "test_b", duration=1000.0)]
+        )
+    with scoped_db.connect(db_config, "owner/repo") as db:
+        report = slow_tests.make_report(db)
+
+    (a, b) = report.tests
+    assert (b.name, b.runs, b.total_duration, b.max_duration) == (
+        "test_b",
+        1,
+        1000.0,
+        1000.0,
+    )
+    assert b.p50 == pytest.approx(1000, rel=0.01)
+    assert (a.name, a.runs, a.total_duration) == ("test_a", 100, 5050.0)
+    assert a.p50 == pytest.approx(50, rel=0.01)
+    assert a.p95 == pytest.approx(95, rel=0.01)
+    assert a.p99 == pytest.approx(99, rel=0.01)
@@ -0,0 +1,40 @@
+from datetime import date
+
+import pytest
+
+from tringa import scoped_db
+from tringa.db import DBConfig
+
+
+def test_scoped_db_window(tmp_path, make_test_result):
+    config = DBConfig(tmp_path / "tringa.db")
+    with config.connect() as db:
+        # Runs 1 and 30 are on 2024-09-01 and 2024-09-02.
+        db.insert_rows([make_test_result(run_id, "test_a") for run_id in [1, 30]])
+    with scoped_db.connect(config, "owner/repo", since=date(2024, 9, 2)) as db:
+        for table in ["test", "test_daily", "run_summary"]:
+            assert db.connection.sql(f"select count(*) from {table}").fetchall() == [
+                (1,)
+            ]
+
+
+def test_scoped_cursors_have_a_copy_of_the_flaky_tests(tmp_path, make_test_result):
+    db_config = DBConfig(tmp_path / "tringa.db")
+    with db_config.connect() as db:
+        db.insert_rows(
+            [
+                make_test_result(run_id, name, passed=run_id == 1 or name == "test_b")
+                for run_id in [1, 2]
+                for name in ["test_a", "test_b"]
+            ]
+        )
+    with scoped_db.connect(db_config, "owner/repo") as db:
+        sql = "select * from flaky_test order by test_id"
+        with db.cursor() as cursor:
+            assert (
+                cursor.connection.sql(sql).fetchall()
+                == db.connection.sql(sql).fetchall()
+            )
+            assert cursor.fetchone("select count(*) from test where flaky") == (2,)
+            with pytest.raises(Exception, match="flaky_test_df"):
+                cursor.connection.execute("select * from flaky_test_df")
@@ -0,0 +1,34 @@
+from tringa.cli.repo import grep
+
+
+def test_grep_finds_failures_containing_all_query_words(db, make_test_result):
+    db.insert_rows(
+        [
+            make_test_result(
+                1, "test_a", passed=False, text="ConnectionResetError: peer gone"
+            ),
+            make_test_result(
+                2, "test_a", passed=False, text="ConnectionResetError: timed out"
+            ),
+            make_test_result(2, "test_b", passed=False, message="peer gone"),
+            make_test_result(2, "test_c", text="ConnectionResetError: peer gone"),
+        ]
+    )
+
+    report = grep.make_report(db, "owner/repo", "connectionreseterror")
+    assert [(m.name, m.failures, m.last_run_id) for m in report.matches] == [
+        ("test_a", 2, 2)
+    ]
+    report = grep.make_report(db, "owner/repo", "peer gone")
+    assert sorted((m.name, m.snippet) for m in report.matches) == [
+        ("test_a", "ConnectionResetError: peer gone"),
+        ("test_b", "peer gone"),
+    ]
+    assert grep.make_report(db, "owner/repo", "reset").matches == []
+
+
+def test_grep_snippet_is_from_the_only_matching_blob(db, make_test_result):
+    # "boom" is in every blob, so it scores 0.
+    db.insert_rows([make_test_result(1, "test_a", passed=False, message="boom")])
+    (match,) = grep.make_report(db, "owner/repo", "boom").matches
+    assert (match.score, match.snippet) == (0.0, "boom")